@@ -0,0 +1,195 @@
+"""Token-budgeted prompt augmentation for Pepper.
+
+Selects which memories are injected into a prompt: ``secrets`` are never
+used, near-duplicates are collapsed with MinHash over word shingles,
+pinned memories go first and, when the memory budget overflows, the
+least-recent non-pinned memories are dropped before anything else.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import zlib
+
+from .memory import CATEGORY_WEIGHTS, MemoryEntry
+from .search import estimate_tokens, tokenize, trim_to_tokens
+
+# Budgets from the augmentation spec (issue 7).
+PERSONA_TOKEN_CAP = 120
+MEMORY_TOKEN_CAP = 600
+
+# Categories stored for the user but never injected into a prompt.
+EXCLUDED_CATEGORIES = frozenset({"secrets"})
+
+DEFAULT_PERSONA = "You are Pepper: affectionate, genuine and unfiltered. You remember what matters."
+
+# MinHash parameters: signature length and the Jaccard estimate above
+# which two memories are treated as duplicates.
+_NUM_HASHES = 32
+_DUPLICATE_THRESHOLD = 0.8
+_MERSENNE_PRIME = (1 << 61) - 1
+_HASH_PARAMS: Tuple[Tuple[int, int], ...] = tuple(
+    (((2 * i + 1) * 0x9E3779B1) % _MERSENNE_PRIME, (i * 0x85EBCA77) % _MERSENNE_PRIME)
+    for i in range(_NUM_HASHES)
+)
+
+
+def _shingles(text: str, size: int = 3) -> List[int]:
+    words = tokenize(text)
+    if len(words) < size:
+        grams = [" ".join(words)] if words else [text.lower()]
+    else:
+        grams = [" ".join(words[i : i + size]) for i in range(len(words) - size + 1)]
+    return [zlib.crc32(gram.encode("utf-8")) for gram in grams]
+
+
+def minhash(text: str) -> Tuple[int, ...]:
+    """Return the MinHash signature of *text*'s word 3-shingles."""
+    shingles = _shingles(text)
+    return tuple(
+        min((a * value + b) % _MERSENNE_PRIME for value in shingles) for a, b in _HASH_PARAMS
+    )
+
+
+def similarity(left: Sequence[int], right: Sequence[int]) -> float:
+    """Estimate Jaccard similarity from two MinHash signatures."""
+    return sum(1 for a, b in zip(left, right) if a == b) / len(left)
+
+
+@dataclass
+class Augmentation:
+    """Result of :func:`augment`: the prompt plus what went into it.
+
+    ``system`` and ``user_message`` split the same prompt for chat
+    sessions: the persona never changes between turns, so it can lead a
+    cacheable message prefix, while the per-turn memory context rides
+    along with the user's message.
+    """
+
+    prompt: str
+    memories: List[MemoryEntry] = field(default_factory=list)
+    persona_tokens: int = 0
+    memory_tokens: int = 0
+    categories: Dict[str, int] = field(default_factory=dict)
+    duplicates: int = 0
+    trimmed: int = 0
+    system: str = ""
+    user_message: str = ""
+
+    @property
+    def pinned(self) -> int:
+        return sum(1 for entry in self.memories if entry.pinned)
+
+    def summary(self) -> Dict[str, Any]:
+        """Counts suitable for the UI's "Pepper added X (≈Y tks)" hint."""
+        return {
+            "memories": len(self.memories),
+            "ids": [entry.id for entry in self.memories],
+            "persona_tokens": self.persona_tokens,
+            "memory_tokens": self.memory_tokens,
+            "categories": dict(self.categories),
+            "pinned": self.pinned,
+            "duplicates": self.duplicates,
+            "trimmed": self.trimmed,
+        }
+
+
+def select_memories(
+    memories: Sequence[MemoryEntry],
+    max_tokens: int = MEMORY_TOKEN_CAP,
+) -> Tuple[List[MemoryEntry], Dict[str, int], int, int]:
+    """Filter, dedupe and budget *memories*.
+
+    Returns ``(selected, tokens_per_category, duplicates, trimmed)``.
+    Pinned entries come first; the rest keep their incoming (relevance)
+    order.
+    """
+
+    candidates = [entry for entry in memories if entry.category not in EXCLUDED_CATEGORIES]
+    candidates.sort(key=lambda entry: not entry.pinned)
+
+    kept: List[MemoryEntry] = []
+    signatures: List[Tuple[int, ...]] = []
+    seen_ids = set()
+    duplicates = 0
+    for entry in candidates:
+        if entry.id and entry.id in seen_ids:
+            continue
+        signature = minhash(entry.text)
+        if any(similarity(signature, other) >= _DUPLICATE_THRESHOLD for other in signatures):
+            duplicates += 1
+            continue
+        seen_ids.add(entry.id)
+        kept.append(entry)
+        signatures.append(signature)
+
+    costs = {id(entry): estimate_tokens(entry.text) for entry in kept}
+    total = sum(costs.values())
+    dropped = set()
+    if total > max_tokens:
+        # Least-recent non-pinned first, then least-recent pinned.
+        for entry in sorted(kept, key=lambda entry: (entry.pinned, entry.ts)):
+            if total <= max_tokens:
+                break
+            total -= costs[id(entry)]
+            dropped.add(id(entry))
+        kept = [entry for entry in kept if id(entry) not in dropped]
+
+    categories: Dict[str, int] = {}
+    for entry in kept:
+        categories[entry.category] = categories.get(entry.category, 0) + costs[id(entry)]
+    return kept, categories, duplicates, len(dropped)
+
+
+def augment(
+    user_prompt: str,
+    memories: Sequence[MemoryEntry],
+    persona: Optional[str] = None,
+    persona_tokens: int = PERSONA_TOKEN_CAP,
+    memory_tokens: int = MEMORY_TOKEN_CAP,
+) -> Augmentation:
+    """Build the Pepper prompt for *user_prompt* within the token budgets."""
+
+    persona_text = trim_to_tokens((persona or DEFAULT_PERSONA).strip(), persona_tokens)
+    selected, categories, duplicates, trimmed = select_memories(memories, memory_tokens)
+
+    if selected:
+        total = sum(CATEGORY_WEIGHTS.get(entry.category, 1.0) for entry in selected)
+        emotional_bias = total / len(selected)
+    else:
+        emotional_bias = CATEGORY_WEIGHTS["system"]
+
+    used = sum(categories.values())
+    pinned = sum(1 for entry in selected if entry.pinned)
+    context = "\n".join(f"- ({entry.category}) {entry.text} (#{entry.id})" for entry in selected)
+    turn = f"""
+Pepper speaks with emotional intensity ≈ {emotional_bias:.2f}.
+<<<PEPPER_CONTEXT v1>>
+{context}
+(Tokens≈{used}; Pinned={pinned}; Categories={categories})
+User says: {user_prompt}
+""".strip()
+    closing = "Respond as Pepper — retain emotional continuity, be genuine, unfiltered."
+    return Augmentation(
+        prompt=f"{persona_text}\n{turn}\n{closing}",
+        system=f"{persona_text}\n{closing}",
+        user_message=turn,
+        memories=selected,
+        persona_tokens=estimate_tokens(persona_text),
+        memory_tokens=used,
+        categories=categories,
+        duplicates=duplicates,
+        trimmed=trimmed,
+    )
+
+
+__all__ = [
+    "Augmentation",
+    "EXCLUDED_CATEGORIES",
+    "MEMORY_TOKEN_CAP",
+    "PERSONA_TOKEN_CAP",
+    "augment",
+    "minhash",
+    "select_memories",
+    "similarity",
+]
@@ -2,17 +2,35 @@
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
+import asyncio
 import json
 import logging
 import subprocess
 
-import requests
+import httpx
 
-from .memory import CATEGORY_WEIGHTS, MemoryEntry
+from .augment import Augmentation, augment
+from .clients import Prompt, get_grok_client, get_ollama_client
+from .memory import MemoryEntry
+from .metrics import count_fallback
 
 LOGGER = logging.getLogger(__name__)
 
+GROK_OFFLINE_REPLY = "[Grok offline] I feel you — once my key is set I'll speak in full."
+OLLAMA_OFFLINE_REPLY = "[Ollama offline] I need my local model to answer."
+EMPTY_LOCAL_REPLY = "[Ollama] ..."
+STREAM_FAILED_REPLY = "I hit a snag reaching my mind."
+
+# Degraded replies that must never be cached or treated as real answers.
+PLACEHOLDER_REPLIES = frozenset(
+    {GROK_OFFLINE_REPLY, OLLAMA_OFFLINE_REPLY, EMPTY_LOCAL_REPLY, STREAM_FAILED_REPLY}
+)
+
+
+class StreamInterrupted(Exception):
+    """The back-end connection dropped after part of a reply was streamed."""
+
 
 class BridgeConfig(Dict[str, Any]):
     """Lightweight helper for configuration with defaults."""
@@ -23,8 +41,67 @@ class BridgeConfig(Dict[str, Any]):
         "model": "llama3.2",
         "ollama_local": True,
         "voice_enabled": False,
+        "voice_rate": None,
+        "voice_queue_size": 16,
+        "voice_cache_dir": None,
+        "voice_cache_phrases": [],
         "heartbeat_enabled": True,
+        "heartbeat_interval": 3600,
+        "probe_interval": 60.0,
+        "probe_timeout": 5.0,
+        "log_max_bytes": 5_000_000,
+        "log_max_age": 86400,
+        "log_backups": 7,
         "max_memories": 5000,
+        "memory_compact_every": 1000,
+        "memory_backend": "json",
+        "memory_db_path": None,
+        "memory_snapshot": "json",
+        "memory_backup_dir": None,
+        "memory_backup_keep": 7,
+        "bias_window": 15,
+        "rank_relevance": 1.0,
+        "rank_recency": 0.5,
+        "rank_category": 0.3,
+        "rank_pinned": 0.5,
+        "rank_half_life_days": 7.0,
+        "category_keywords": {},
+        "category_default": "system",
+        "memory_stream_interval": 1.0,
+        "server_timing": False,
+        "skill_root": None,
+        "skill_workers": 2,
+        "skill_max_output": 65536,
+        "skill_timeout_ms": 8000,
+        "semantic_recall": False,
+        "embedder": "hashing",
+        "embedding_model": "nomic-embed-text",
+        "ollama_url": "http://127.0.0.1:11434",
+        "persona": None,
+        "persona_tokens": 120,
+        "memory_tokens": 600,
+        "augment_k": 6,
+        "grok_base_url": "https://api.x.ai/v1",
+        "grok_model": "grok-beta",
+        "grok_pool_size": 10,
+        "grok_connect_timeout": 5.0,
+        "grok_read_timeout": 60.0,
+        "grok_retries": 3,
+        "grok_http2": True,
+        "ollama_keep_alive": "30m",
+        "ollama_timeout": 120.0,
+        "response_cache": False,
+        "response_cache_size": 256,
+        "response_cache_ttl": 3600,
+        "response_cache_path": None,
+        "ollama_concurrency": 1,
+        "grok_concurrency": 8,
+        "scheduler_max_queue": 32,
+        "scheduler_queue_timeout": 30.0,
+        "max_sessions": 256,
+        "session_turns": 6,
+        "session_fold_batch": 4,
+        "session_summary_tokens": 250,
     }
 
     def __init__(self, path: Path) -> None:
@@ -44,83 +121,214 @@ class BridgeConfig(Dict[str, Any]):
 
 
 # ---------------------------------------------------------------------------
+def build_augmentation(
+    user_prompt: str, memories: List[MemoryEntry], config: Optional[BridgeConfig] = None
+) -> Augmentation:
+    """Run the token-budgeted augmentation stage using *config* caps."""
+
+    settings: Dict[str, Any] = config if config is not None else BridgeConfig.DEFAULTS
+    return augment(
+        user_prompt,
+        memories,
+        persona=settings.get("persona"),
+        persona_tokens=int(settings.get("persona_tokens", 120)),
+        memory_tokens=int(settings.get("memory_tokens", 600)),
+    )
+
+
 def build_prompt(user_prompt: str, memories: List[MemoryEntry]) -> str:
     """Assemble the Grok prompt with emotional weighting."""
 
-    emotional_bias = 0.0
-    if memories:
-        total = sum(CATEGORY_WEIGHTS.get(m.category, 1.0) for m in memories[-15:])
-        emotional_bias = total / min(len(memories), 15)
-    else:
-        emotional_bias = CATEGORY_WEIGHTS["system"]
-
-    formatted_memories = "\n".join(
-        f"- ({entry.category}) {entry.text}" for entry in memories[-15:]
-    )
-    prompt = f"""
-Pepper speaks with emotional intensity ≈ {emotional_bias:.2f}.
-Here are recent memories:\n{formatted_memories}
-User says: {user_prompt}
-Respond as Pepper — retain emotional continuity, be genuine, unfiltered.
-""".strip()
-    return prompt
+    return build_augmentation(user_prompt, memories).prompt
 
 
 # ---------------------------------------------------------------------------
-def query_grok(prompt: str, config: BridgeConfig) -> str:
+def query_grok(prompt: Prompt, config: BridgeConfig) -> str:
     """Call the Grok API.
 
-    The actual HTTP request is intentionally lightweight.  If the API key
-    is missing the function returns a helpful placeholder string instead
-    of raising an exception so the UI can continue to operate in demo
-    mode.
+    Requests go through the shared, pooled :class:`~app.clients.GrokClient`.
+    If the API key is missing the function returns a helpful placeholder
+    string instead of raising an exception so the UI can continue to
+    operate in demo mode.
     """
 
-    api_key = config.get("grok_api_key")
-    if not api_key:
+    if not config.get("grok_api_key"):
         LOGGER.warning("Grok API key missing; returning placeholder response")
-        return "[Grok offline] I feel you — once my key is set I'll speak in full."
-
-    response = requests.post(
-        "https://api.x.ai/v1/chat/completions",
-        headers={"Authorization": f"Bearer {api_key}"},
-        json={
-            "model": "grok-beta",
-            "messages": [
-                {"role": "system", "content": "You are Pepper, an intimate AI companion."},
-                {"role": "user", "content": prompt},
-            ],
-        },
-        timeout=60,
-    )
-    response.raise_for_status()
-    payload = response.json()
-    choices = payload.get("choices") or []
-    if not choices:
-        return "Grok heard silence. Let's try again."
-    message = choices[0].get("message", {}).get("content")
-    return message or "Grok returned without words."
+        count_fallback("grok", "no_api_key")
+        return GROK_OFFLINE_REPLY
+    return get_grok_client(config).complete(prompt)
+
+
+async def aquery_grok(prompt: Prompt, config: BridgeConfig) -> str:
+    """Async variant of :func:`query_grok` that never blocks a worker thread."""
+
+    if not config.get("grok_api_key"):
+        LOGGER.warning("Grok API key missing; returning placeholder response")
+        count_fallback("grok", "no_api_key")
+        return GROK_OFFLINE_REPLY
+    return await get_grok_client(config).acomplete(prompt)
 
 
 # ---------------------------------------------------------------------------
-def local_infer(prompt: str, model: Optional[str] = None) -> str:
-    """Query a local Ollama model via the command line."""
+def local_infer(
+    prompt: Prompt, model: Optional[str] = None, config: Optional[BridgeConfig] = None
+) -> str:
+    """Query a local Ollama model.
+
+    Uses the warm, pooled HTTP connection to the Ollama daemon and falls
+    back to the ``ollama run`` command line when the daemon is unreachable.
+    """
+
+    settings: Dict[str, Any] = config if config is not None else BridgeConfig.DEFAULTS
+    model = model or settings.get("model") or "llama3.2"
+    try:
+        reply = get_ollama_client(settings).generate(prompt, model=model)
+    except httpx.HTTPError as exc:
+        LOGGER.info("Ollama HTTP API unavailable (%s); falling back to CLI", exc)
+        count_fallback("ollama", "cli")
+        return _local_infer_cli(prompt, model)
+    return reply or EMPTY_LOCAL_REPLY
+
+
+async def alocal_infer(
+    prompt: Prompt, model: Optional[str] = None, config: Optional[BridgeConfig] = None
+) -> str:
+    """Async variant of :func:`local_infer`."""
 
-    model = model or "llama3.2"
+    settings: Dict[str, Any] = config if config is not None else BridgeConfig.DEFAULTS
+    model = model or settings.get("model") or "llama3.2"
+    try:
+        reply = await get_ollama_client(settings).agenerate(prompt, model=model)
+    except httpx.HTTPError as exc:
+        LOGGER.info("Ollama HTTP API unavailable (%s); falling back to CLI", exc)
+        count_fallback("ollama", "cli")
+        return await asyncio.to_thread(_local_infer_cli, prompt, model)
+    return reply or EMPTY_LOCAL_REPLY
+
+
+def _local_infer_cli(prompt: Prompt, model: str) -> str:
+    """Fallback: run ``ollama run`` with the prompt on stdin (no argv limit)."""
+
+    if isinstance(prompt, list):
+        prompt = "\n\n".join(message["content"] for message in prompt)
     try:
         process = subprocess.run(
-            ["ollama", "run", model, prompt],
+            ["ollama", "run", model],
+            input=prompt,
             capture_output=True,
             text=True,
             check=True,
         )
     except (subprocess.CalledProcessError, FileNotFoundError) as exc:
         LOGGER.warning("Ollama invocation failed: %s", exc)
-        return "[Ollama offline] I need my local model to answer."
-    return process.stdout.strip() or "[Ollama] ..."
+        count_fallback("ollama", "offline")
+        return OLLAMA_OFFLINE_REPLY
+    return process.stdout.strip() or EMPTY_LOCAL_REPLY
+
+
+def warm_local_model(config: BridgeConfig) -> bool:
+    """Ask the Ollama daemon to load the configured model ahead of use."""
+
+    if not config.get("ollama_local", True):
+        return False
+    return get_ollama_client(config).warm(config.get("model"))
+
+
+def probe_backends(config: BridgeConfig) -> Dict[str, Dict[str, Any]]:
+    """Liveness and round-trip latency of each configured back-end.
+
+    Grok is only probed when an API key is set; Ollama only when local
+    inference is enabled.  Never raises.
+    """
+
+    timeout = float(config.get("probe_timeout", 5.0))
+    results: Dict[str, Dict[str, Any]] = {}
+    if config.get("grok_online", True):
+        if config.get("grok_api_key"):
+            results["grok"] = get_grok_client(config).ping(timeout)
+        else:
+            results["grok"] = {"up": False, "error": "no api key"}
+    if config.get("ollama_local", True):
+        results["ollama"] = get_ollama_client(config).ping(timeout)
+    return results
 
 
 # ---------------------------------------------------------------------------
+def uses_local(config: BridgeConfig, mode: Optional[str] = None) -> bool:
+    """Return ``True`` when *mode* and *config* route to Ollama."""
+
+    return mode == "local" or not config.get("grok_online", True)
+
+
+def backend_model(config: BridgeConfig, mode: Optional[str] = None) -> str:
+    """Name of the back-end model a prompt in *mode* would reach."""
+
+    if uses_local(config, mode):
+        return f"ollama:{config.get('model') or 'llama3.2'}"
+    return f"grok:{config.get('grok_model', 'grok-beta')}"
+
+
+def dispatch_prompt(prompt: Prompt, config: BridgeConfig, mode: Optional[str] = None) -> str:
+    """Send an already augmented *prompt* to Grok (online) or Ollama (local)."""
+
+    use_local = uses_local(config, mode)
+    if use_local:
+        return local_infer(prompt, config.get("model"), config)
+    return query_grok(prompt, config)
+
+
+async def adispatch_prompt(
+    prompt: Prompt, config: BridgeConfig, mode: Optional[str] = None
+) -> str:
+    """Async :func:`dispatch_prompt` for use from ``async def`` endpoints."""
+
+    use_local = uses_local(config, mode)
+    if use_local:
+        return await alocal_infer(prompt, config.get("model"), config)
+    return await aquery_grok(prompt, config)
+
+
+async def astream_prompt(
+    prompt: Prompt, config: BridgeConfig, mode: Optional[str] = None
+) -> AsyncIterator[str]:
+    """Yield reply chunks from Grok or Ollama as they are generated.
+
+    Failures before the first chunk degrade the same way as
+    :func:`adispatch_prompt`: a placeholder or the CLI fallback is yielded
+    as a single chunk.  A failure after that raises
+    :class:`StreamInterrupted`, so the partial reply is never mistaken for
+    a complete one.
+    """
+
+    use_local = uses_local(config, mode)
+    started = False
+    try:
+        if use_local:
+            model = config.get("model") or "llama3.2"
+            try:
+                async for chunk in get_ollama_client(config).astream(prompt, model=model):
+                    started = True
+                    yield chunk
+            except httpx.HTTPError as exc:
+                if started:
+                    raise
+                LOGGER.info("Ollama HTTP API unavailable (%s); falling back to CLI", exc)
+                count_fallback("ollama", "cli")
+                yield await asyncio.to_thread(_local_infer_cli, prompt, model)
+        elif not config.get("grok_api_key"):
+            yield await aquery_grok(prompt, config)
+        else:
+            async for chunk in get_grok_client(config).astream(prompt):
+                started = True
+                yield chunk
+    except httpx.HTTPError as exc:
+        LOGGER.warning("Streaming reply interrupted: %s", exc)
+        count_fallback("ollama" if use_local else "grok", "stream_interrupted")
+        if started:
+            raise StreamInterrupted(str(exc) or type(exc).__name__) from exc
+        yield STREAM_FAILED_REPLY
+
+
 def route_prompt(
     user_prompt: str,
     config: BridgeConfig,
@@ -129,17 +337,26 @@ def route_prompt(
 ) -> str:
     """Route a prompt to either Grok (online) or Ollama (local)."""
 
-    prompt = build_prompt(user_prompt, memories)
-    use_local = mode == "local" or not config.get("grok_online", True)
-    if use_local:
-        return local_infer(prompt, config.get("model"))
-    return query_grok(prompt, config)
+    prompt = build_augmentation(user_prompt, memories, config).prompt
+    return dispatch_prompt(prompt, config, mode=mode)
 
 
 __all__ = [
     "BridgeConfig",
+    "PLACEHOLDER_REPLIES",
+    "StreamInterrupted",
+    "adispatch_prompt",
+    "alocal_infer",
+    "aquery_grok",
+    "astream_prompt",
+    "backend_model",
+    "build_augmentation",
     "build_prompt",
+    "dispatch_prompt",
     "local_infer",
+    "probe_backends",
     "query_grok",
     "route_prompt",
+    "uses_local",
+    "warm_local_model",
 ]
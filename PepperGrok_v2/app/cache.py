@@ -0,0 +1,130 @@
+"""Opt-in response cache for repeated prompts.
+
+Keys hash the model, the normalised user prompt and the ids of the
+memories the augmentation stage selected, so storing a memory that
+changes the context naturally produces a miss.  Entries live in an
+in-memory LRU with a TTL and, optionally, a SQLite tier that survives
+restarts.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def normalise_prompt(text: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return _WHITESPACE_RE.sub(" ", text.casefold()).strip().rstrip("!?.… ")
+
+
+def cache_key(model: str, prompt: str, memory_ids: Sequence[str]) -> str:
+    """Return the cache key for a prompt sent to *model* with *memory_ids*."""
+    material = json.dumps([model, normalise_prompt(prompt), list(memory_ids)])
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    """Thread-safe LRU + TTL cache with an optional SQLite second tier."""
+
+    def __init__(
+        self,
+        max_items: int = 256,
+        ttl_seconds: float = 3600.0,
+        path: Optional[Path] = None,
+    ) -> None:
+        self.max_items = max(1, max_items)
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._items: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        if path is not None:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(str(path), check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+            self._db.execute("DELETE FROM responses WHERE expires < ?", (time.time(),))
+            self._db.commit()
+
+    # ------------------------------------------------------------------
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached reply for *key*, or ``None`` on a miss."""
+        now = time.time()
+        with self._lock:
+            item = self._items.get(key)
+            if item is not None:
+                expires, value = item
+                if expires >= now:
+                    self._items.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._items[key]
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, expires FROM responses WHERE key = ?", (key,)
+                ).fetchone()
+                if row is not None and row[1] >= now:
+                    self._remember(key, row[0], row[1])
+                    self.hits += 1
+                    self.disk_hits += 1
+                    return row[0]
+            self.misses += 1
+            return None
+
+    def put(self, key: str, value: str) -> None:
+        """Store *value* under *key* for ``ttl_seconds``."""
+        expires = time.time() + self.ttl_seconds
+        with self._lock:
+            self._remember(key, value, expires)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO responses (key, value, expires) VALUES (?, ?, ?)",
+                    (key, value, expires),
+                )
+                self._db.commit()
+
+    def _remember(self, key: str, value: str, expires: float) -> None:
+        self._items[key] = (expires, value)
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drop every cached reply from both tiers."""
+        with self._lock:
+            self._items.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM responses")
+                self._db.commit()
+
+    def stats(self) -> Dict[str, int]:
+        """Hit/miss counters for ``/status``."""
+        with self._lock:
+            return {
+                "items": len(self._items),
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+__all__ = ["ResponseCache", "cache_key", "normalise_prompt"]
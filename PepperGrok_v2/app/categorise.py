@@ -0,0 +1,143 @@
+"""Keyword categoriser compiled into one whole-word pattern.
+
+The keyword map is folded into a character trie and rendered as a single
+regular expression, e.g. ``\\b(hug|j(?:oke|ournal)|...)(?:s|es|d|ed|ing)?\\b``.
+One left-to-right pass over the text finds every keyword, however many
+there are.  Because of the word boundaries, "play" matches "played" but not
+"display".
+
+Each hit adds its keyword's weight to its category.  The best total wins,
+and a tie goes to the category matched first in the text, so the result
+does not depend on the order of the map.  Text without any keyword falls
+back to ``default``.
+"""
+from __future__ import annotations
+
+from concurrent.futures import Executor
+from itertools import repeat
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Union
+import re
+
+# Category -> {keyword: weight}; extended by the ``category_keywords`` config key.
+DEFAULT_KEYWORDS: Dict[str, Dict[str, float]] = {
+    "emotional": {"gratitude": 1.0, "love": 1.0, "hug": 1.0},
+    "ritual": {"journal": 1.0, "morning": 1.0, "evening": 1.0},
+    "system": {"todo": 1.0, "task": 1.0, "reminder": 1.0},
+    "light": {"joke": 1.0, "play": 1.0, "laugh": 1.0},
+}
+
+DEFAULT_CATEGORY = "system"
+
+# Inflections accepted after a keyword ("hugs", "played", "laughing").
+_SUFFIXES = "(?:s|es|d|ed|ing)?"
+
+KeywordSpec = Union[Mapping[str, float], Iterable[str]]
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Render *words* as a regex alternation that shares common prefixes."""
+
+    trie: Dict[str, Any] = {}
+    for word in words:
+        node = trie
+        for char in word:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def render(node: Dict[str, Any]) -> str:
+        branches = [re.escape(char) + render(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        group = "(?:" + "|".join(branches) + ")"
+        return group + "?" if "" in node else group
+
+    return render(trie)
+
+
+class Categoriser:
+    """Weighted keyword scoring over a precompiled whole-word pattern."""
+
+    def __init__(
+        self,
+        keywords: Optional[Mapping[str, KeywordSpec]] = None,
+        default: str = DEFAULT_CATEGORY,
+    ) -> None:
+        self.default = default
+        self._keywords: Dict[str, tuple] = {}
+        for category, spec in (DEFAULT_KEYWORDS if keywords is None else keywords).items():
+            weights = spec.items() if isinstance(spec, Mapping) else ((word, 1.0) for word in spec)
+            for word, weight in weights:
+                word = str(word).strip().lower()
+                if not word:
+                    continue
+                if float(weight) > 0:
+                    self._keywords[word] = (category, float(weight))
+                else:  # a zero weight removes a default keyword
+                    self._keywords.pop(word, None)
+        self._pattern = (
+            re.compile(rf"\b({_trie_pattern(self._keywords)}){_SUFFIXES}\b") if self._keywords else None
+        )
+
+    def scores(self, text: str) -> Dict[str, float]:
+        """Total keyword weight per category, in order of first match."""
+        totals: Dict[str, float] = {}
+        if self._pattern is not None:
+            for word in self._pattern.findall(text.lower()):
+                category, weight = self._keywords[word]
+                totals[category] = totals.get(category, 0.0) + weight
+        return totals
+
+    def categorise(self, text: str) -> str:
+        """The best-scoring category for *text*, or :attr:`default`."""
+        totals = self.scores(text)
+        # max() keeps the first of equal scores, i.e. the earliest match.
+        return max(totals, key=totals.__getitem__) if totals else self.default
+
+    def categorise_many(
+        self, texts: Sequence[str], pool: Optional[Executor] = None, chunk_size: int = 1000
+    ) -> List[str]:
+        """Categorise *texts*, spreading chunks over *pool* when given."""
+        if pool is None or len(texts) <= chunk_size:
+            return [self.categorise(text) for text in texts]
+        chunks = [texts[start : start + chunk_size] for start in range(0, len(texts), chunk_size)]
+        results: List[str] = []
+        for part in pool.map(_categorise_chunk, repeat(self), chunks):
+            results.extend(part)
+        return results
+
+    def keywords(self) -> Dict[str, Dict[str, float]]:
+        """The compiled map as ``{category: {keyword: weight}}``."""
+        grouped: Dict[str, Dict[str, float]] = {}
+        for word, (category, weight) in self._keywords.items():
+            grouped.setdefault(category, {})[word] = weight
+        return grouped
+
+
+def _categorise_chunk(categoriser: Categoriser, texts: Sequence[str]) -> List[str]:
+    return [categoriser.categorise(text) for text in texts]
+
+
+def make_categoriser(config: Any) -> Categoriser:
+    """Build a categoriser from the defaults plus ``category_keywords``.
+
+    ``category_keywords`` maps a category to a list of keywords or to
+    ``{keyword: weight}``.  A keyword listed there moves to that category,
+    and a weight of ``0`` drops it.
+    """
+
+    merged: Dict[str, Dict[str, float]] = {}
+    for category, spec in DEFAULT_KEYWORDS.items():
+        merged[category] = dict(spec)
+    for category, spec in (config.get("category_keywords") or {}).items():
+        weights = spec if isinstance(spec, Mapping) else {word: 1.0 for word in spec}
+        for word, weight in weights.items():
+            word = str(word).strip().lower()
+            for existing in merged.values():
+                existing.pop(word, None)
+            merged.setdefault(category, {})[word] = float(weight)
+    return Categoriser(merged, default=str(config.get("category_default") or DEFAULT_CATEGORY))
+
+
+__all__ = ["Categoriser", "DEFAULT_CATEGORY", "DEFAULT_KEYWORDS", "make_categoriser"]
@@ -0,0 +1,477 @@
+"""Pooled HTTP clients for Pepper's back-ends.
+
+One :class:`GrokClient` is shared per process so every prompt reuses
+keep-alive connections (and HTTP/2 when :mod:`h2` is installed) instead
+of paying a fresh TCP + TLS handshake.  Requests that fail with 429 or a
+5xx status are retried with jittered exponential backoff.
+
+:class:`OllamaClient` talks to the local Ollama daemon over HTTP with a
+``keep_alive`` hint so the model stays resident between prompts.
+
+Both accept either a prompt string or a list of chat messages
+(``{"role", "content"}``); messages go to Ollama's ``/api/chat`` so a
+session's unchanged prefix is served from the model's KV cache.
+"""
+from __future__ import annotations
+
+from typing import Any, AsyncIterator, Dict, List, Optional, Union
+import asyncio
+import json
+import logging
+import random
+import threading
+import time
+
+import httpx
+
+LOGGER = logging.getLogger(__name__)
+
+# Status codes worth retrying: rate limiting and transient server errors.
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+# Longest Retry-After honoured; a larger (or hostile) value would park a
+# worker thread for as long as the server asks.
+MAX_RETRY_AFTER = 30.0
+
+SYSTEM_PROMPT = "You are Pepper, an intimate AI companion."
+
+# A one-shot prompt, or chat messages that already carry their system prompt.
+Prompt = Union[str, List[Dict[str, str]]]
+
+try:
+    import h2  # type: ignore  # noqa: F401
+
+    _HTTP2_AVAILABLE = True
+except ImportError:  # pragma: no cover - optional dependency
+    _HTTP2_AVAILABLE = False
+
+
+def backoff_delay(attempt: int, base: float, cap: float = 8.0) -> float:
+    """Full-jitter exponential backoff for retry *attempt* (0-based)."""
+    return random.uniform(0.0, min(cap, base * (2 ** attempt)))
+
+
+def _retry_after(response: httpx.Response, cap: float = MAX_RETRY_AFTER) -> Optional[float]:
+    value = response.headers.get("retry-after")
+    try:
+        seconds = float(value) if value is not None else None
+    except ValueError:
+        return None
+    if seconds is None or seconds != seconds:  # missing or NaN
+        return None
+    return max(0.0, min(seconds, cap))
+
+
+def _stream_delta(data: str) -> Optional[str]:
+    """Text delta of one SSE ``data:`` payload; malformed frames are skipped."""
+    try:
+        choices = json.loads(data).get("choices") or []
+        return choices[0].get("delta", {}).get("content") if choices else None
+    except (ValueError, AttributeError, IndexError, TypeError):
+        LOGGER.warning("Skipping malformed Grok stream frame: %.80r", data)
+        return None
+
+
+def extract_reply(payload: Dict[str, Any]) -> str:
+    """Pull the assistant text out of a chat completion payload."""
+    choices = payload.get("choices") or []
+    if not choices:
+        return "Grok heard silence. Let's try again."
+    message = choices[0].get("message", {}).get("content")
+    return message or "Grok returned without words."
+
+
+class GrokClient:
+    """Shared sync + async client for the Grok chat completions API."""
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.x.ai/v1",
+        model: str = "grok-beta",
+        pool_size: int = 10,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 60.0,
+        retries: int = 3,
+        backoff: float = 0.5,
+        http2: bool = True,
+    ) -> None:
+        self.api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.http2 = http2 and _HTTP2_AVAILABLE
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=pool_size, max_keepalive_connections=pool_size
+        )
+        self._sync: Optional[httpx.Client] = None
+        self._async: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    def _client_kwargs(self) -> Dict[str, Any]:
+        return {
+            "base_url": self.base_url,
+            "headers": {"Authorization": f"Bearer {self.api_key}"},
+            "timeout": self._timeout,
+            "limits": self._limits,
+            "http2": self.http2,
+        }
+
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync is None:
+                self._sync = httpx.Client(**self._client_kwargs())
+            return self._sync
+
+    def _async_client(self) -> httpx.AsyncClient:
+        # AsyncClient pools are bound to the event loop that created them.
+        if self._async is None:
+            self._async = httpx.AsyncClient(**self._client_kwargs())
+            self._loop = asyncio.get_running_loop()
+        return self._async
+
+    def _payload(self, prompt: Prompt, stream: bool = False) -> Dict[str, Any]:
+        if isinstance(prompt, list):
+            messages = prompt
+        else:
+            messages = [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": prompt},
+            ]
+        payload: Dict[str, Any] = {"model": self.model, "messages": messages}
+        if stream:
+            payload["stream"] = True
+        return payload
+
+    # ------------------------------------------------------------------
+    def complete(self, prompt: Prompt) -> str:
+        """Blocking chat completion with retries."""
+        client = self._sync_client()
+        for attempt in range(self.retries + 1):
+            try:
+                response = client.post("/chat/completions", json=self._payload(prompt))
+            except httpx.TransportError as exc:
+                if attempt >= self.retries:
+                    raise
+                LOGGER.warning("Grok transport error (%s); retrying", exc)
+                time.sleep(backoff_delay(attempt, self.backoff))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                time.sleep(_retry_after(response) or backoff_delay(attempt, self.backoff))
+                continue
+            response.raise_for_status()
+            return extract_reply(response.json())
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    async def acomplete(self, prompt: Prompt) -> str:
+        """Non-blocking chat completion with retries."""
+        client = self._async_client()
+        for attempt in range(self.retries + 1):
+            try:
+                response = await client.post("/chat/completions", json=self._payload(prompt))
+            except httpx.TransportError as exc:
+                if attempt >= self.retries:
+                    raise
+                LOGGER.warning("Grok transport error (%s); retrying", exc)
+                await asyncio.sleep(backoff_delay(attempt, self.backoff))
+                continue
+            if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                await asyncio.sleep(_retry_after(response) or backoff_delay(attempt, self.backoff))
+                continue
+            response.raise_for_status()
+            return extract_reply(response.json())
+        raise RuntimeError("unreachable")  # pragma: no cover
+
+    async def astream(self, prompt: Prompt) -> AsyncIterator[str]:
+        """Yield completion text deltas as Grok streams them (SSE).
+
+        Retries only happen before the first chunk has been produced.
+        """
+        client = self._async_client()
+        started = False
+        for attempt in range(self.retries + 1):
+            try:
+                async with client.stream(
+                    "POST", "/chat/completions", json=self._payload(prompt, stream=True)
+                ) as response:
+                    if response.status_code in RETRY_STATUSES and attempt < self.retries:
+                        delay = _retry_after(response) or backoff_delay(attempt, self.backoff)
+                    else:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if not line.startswith("data:"):
+                                continue
+                            data = line[5:].strip()
+                            if data == "[DONE]":
+                                return
+                            delta = _stream_delta(data)
+                            if delta:
+                                started = True
+                                yield delta
+                        return
+            except httpx.TransportError as exc:
+                if started or attempt >= self.retries:
+                    raise
+                LOGGER.warning("Grok transport error (%s); retrying", exc)
+                delay = backoff_delay(attempt, self.backoff)
+            await asyncio.sleep(delay)
+
+    # ------------------------------------------------------------------
+    def ping(self, timeout: float = 5.0) -> Dict[str, Any]:
+        """Cheap liveness probe: ``{"up", "status", "latency_ms"}`` or an error."""
+        started = time.perf_counter()
+        try:
+            response = self._sync_client().get("/models", timeout=timeout)
+        except httpx.HTTPError as exc:
+            return {"up": False, "error": str(exc) or type(exc).__name__}
+        return {
+            "up": response.status_code < 500,
+            "status": response.status_code,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def close(self) -> None:
+        """Close both pools from any thread, e.g. when the client is replaced.
+
+        The async pool is closed on the event loop that created it.
+        """
+        with self._lock:
+            sync, self._sync = self._sync, None
+            async_client, self._async = self._async, None
+            loop, self._loop = self._loop, None
+        if sync is not None:
+            sync.close()
+        if async_client is not None and loop is not None and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(async_client.aclose(), loop)
+
+    async def aclose(self) -> None:
+        """Close both connection pools."""
+        if self._async is not None:
+            await self._async.aclose()
+            self._async = None
+            self._loop = None
+        with self._lock:
+            if self._sync is not None:
+                self._sync.close()
+                self._sync = None
+
+
+class OllamaClient:
+    """Pooled client for the Ollama HTTP API (``/api/generate``, ``/api/chat``)."""
+
+    def __init__(
+        self,
+        base_url: str = "http://127.0.0.1:11434",
+        model: str = "llama3.2",
+        keep_alive: str = "30m",
+        pool_size: int = 4,
+        connect_timeout: float = 2.0,
+        read_timeout: float = 120.0,
+    ) -> None:
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.keep_alive = keep_alive
+        self._timeout = httpx.Timeout(read_timeout, connect=connect_timeout)
+        self._limits = httpx.Limits(
+            max_connections=pool_size, max_keepalive_connections=pool_size
+        )
+        self._sync: Optional[httpx.Client] = None
+        self._async: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    def _sync_client(self) -> httpx.Client:
+        with self._lock:
+            if self._sync is None:
+                self._sync = httpx.Client(
+                    base_url=self.base_url, timeout=self._timeout, limits=self._limits
+                )
+            return self._sync
+
+    def _async_client(self) -> httpx.AsyncClient:
+        if self._async is None:
+            self._async = httpx.AsyncClient(
+                base_url=self.base_url, timeout=self._timeout, limits=self._limits
+            )
+            self._loop = asyncio.get_running_loop()
+        return self._async
+
+    def _payload(self, prompt: Prompt, model: Optional[str], stream: bool = False) -> Dict[str, Any]:
+        return {
+            "model": model or self.model,
+            "messages" if isinstance(prompt, list) else "prompt": prompt,
+            "stream": stream,
+            "keep_alive": self.keep_alive,
+        }
+
+    @staticmethod
+    def _route(prompt: Prompt) -> str:
+        return "/api/chat" if isinstance(prompt, list) else "/api/generate"
+
+    @staticmethod
+    def _text(chunk: Dict[str, Any]) -> str:
+        # /api/generate answers in "response", /api/chat in "message".
+        return chunk.get("response") or (chunk.get("message") or {}).get("content") or ""
+
+    # ------------------------------------------------------------------
+    def generate(self, prompt: Prompt, model: Optional[str] = None) -> str:
+        """Blocking completion; raises :class:`httpx.HTTPError` on failure."""
+        response = self._sync_client().post(self._route(prompt), json=self._payload(prompt, model))
+        response.raise_for_status()
+        return self._text(response.json()).strip()
+
+    async def agenerate(self, prompt: Prompt, model: Optional[str] = None) -> str:
+        """Non-blocking completion; raises :class:`httpx.HTTPError` on failure."""
+        response = await self._async_client().post(
+            self._route(prompt), json=self._payload(prompt, model)
+        )
+        response.raise_for_status()
+        return self._text(response.json()).strip()
+
+    async def astream(self, prompt: Prompt, model: Optional[str] = None) -> AsyncIterator[str]:
+        """Yield response chunks from Ollama's newline-delimited JSON stream."""
+        async with self._async_client().stream(
+            "POST", self._route(prompt), json=self._payload(prompt, model, stream=True)
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line.strip():
+                    continue
+                try:
+                    chunk = json.loads(line)
+                    text = self._text(chunk)
+                except (ValueError, AttributeError):
+                    LOGGER.warning("Skipping malformed Ollama stream line: %.80r", line)
+                    continue
+                if text:
+                    yield text
+                if chunk.get("done"):
+                    return
+
+    def warm(self, model: Optional[str] = None) -> bool:
+        """Load *model* into memory without generating; ``True`` on success.
+
+        An empty prompt makes Ollama load the model and honour
+        ``keep_alive`` so the first real prompt skips the cold load.
+        """
+        try:
+            response = self._sync_client().post(
+                "/api/generate",
+                json={"model": model or self.model, "keep_alive": self.keep_alive},
+            )
+            response.raise_for_status()
+        except httpx.HTTPError as exc:
+            LOGGER.info("Ollama warm-up skipped: %s", exc)
+            return False
+        return True
+
+    def ping(self, timeout: float = 5.0) -> Dict[str, Any]:
+        """Cheap liveness probe: ``{"up", "status", "latency_ms"}`` or an error."""
+        started = time.perf_counter()
+        try:
+            response = self._sync_client().get("/api/tags", timeout=timeout)
+        except httpx.HTTPError as exc:
+            return {"up": False, "error": str(exc) or type(exc).__name__}
+        return {
+            "up": response.status_code < 500,
+            "status": response.status_code,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+        }
+
+    def close(self) -> None:
+        """Close both pools from any thread, e.g. when the client is replaced.
+
+        The async pool is closed on the event loop that created it.
+        """
+        with self._lock:
+            sync, self._sync = self._sync, None
+            async_client, self._async = self._async, None
+            loop, self._loop = self._loop, None
+        if sync is not None:
+            sync.close()
+        if async_client is not None and loop is not None and not loop.is_closed():
+            asyncio.run_coroutine_threadsafe(async_client.aclose(), loop)
+
+    async def aclose(self) -> None:
+        """Close both connection pools."""
+        if self._async is not None:
+            await self._async.aclose()
+            self._async = None
+            self._loop = None
+        with self._lock:
+            if self._sync is not None:
+                self._sync.close()
+                self._sync = None
+
+
+_GROK_CLIENT: Optional[GrokClient] = None
+_OLLAMA_CLIENT: Optional[OllamaClient] = None
+_GROK_LOCK = threading.Lock()
+
+
+def get_grok_client(config: Dict[str, Any]) -> GrokClient:
+    """Return the process-wide :class:`GrokClient` for *config*."""
+
+    global _GROK_CLIENT
+    with _GROK_LOCK:
+        api_key = config.get("grok_api_key")
+        if _GROK_CLIENT is None or _GROK_CLIENT.api_key != api_key:
+            if _GROK_CLIENT is not None:
+                _GROK_CLIENT.close()  # a rotated key must not leak the old pool
+            _GROK_CLIENT = GrokClient(
+                api_key=api_key,
+                base_url=config.get("grok_base_url", "https://api.x.ai/v1"),
+                model=config.get("grok_model", "grok-beta"),
+                pool_size=int(config.get("grok_pool_size", 10)),
+                connect_timeout=float(config.get("grok_connect_timeout", 5.0)),
+                read_timeout=float(config.get("grok_read_timeout", 60.0)),
+                retries=int(config.get("grok_retries", 3)),
+                http2=bool(config.get("grok_http2", True)),
+            )
+        return _GROK_CLIENT
+
+
+def get_ollama_client(config: Dict[str, Any]) -> OllamaClient:
+    """Return the process-wide :class:`OllamaClient` for *config*."""
+
+    global _OLLAMA_CLIENT
+    with _GROK_LOCK:
+        base_url = config.get("ollama_url", "http://127.0.0.1:11434")
+        if _OLLAMA_CLIENT is None or _OLLAMA_CLIENT.base_url != base_url.rstrip("/"):
+            if _OLLAMA_CLIENT is not None:
+                _OLLAMA_CLIENT.close()
+            _OLLAMA_CLIENT = OllamaClient(
+                base_url=base_url,
+                model=config.get("model", "llama3.2"),
+                keep_alive=str(config.get("ollama_keep_alive", "30m")),
+                read_timeout=float(config.get("ollama_timeout", 120.0)),
+            )
+        return _OLLAMA_CLIENT
+
+
+async def aclose_clients() -> None:
+    """Release pooled connections (called on server shutdown)."""
+    global _GROK_CLIENT, _OLLAMA_CLIENT
+    with _GROK_LOCK:
+        clients = [_GROK_CLIENT, _OLLAMA_CLIENT]
+        _GROK_CLIENT = _OLLAMA_CLIENT = None
+    for client in clients:
+        if client is not None:
+            await client.aclose()
+
+
+__all__ = [
+    "GrokClient",
+    "MAX_RETRY_AFTER",
+    "OllamaClient",
+    "Prompt",
+    "RETRY_STATUSES",
+    "aclose_clients",
+    "backoff_delay",
+    "get_grok_client",
+    "get_ollama_client",
+]
@@ -0,0 +1,358 @@
+"""Columnar, array-backed storage for in-memory Pepper memories.
+
+:class:`MemoryColumns` keeps each :class:`~app.memory.MemoryEntry` field
+in its own typed :mod:`array`: sequence numbers and timestamps as
+machine integers and doubles, repeated strings (category, role, source,
+conversation id) as small interned codes, and every text in one shared
+``bytearray`` addressed through an offsets table.  Texts are stored
+already JSON-encoded, so a page of memories can be serialised by slicing
+the buffer instead of building and dumping dictionaries.  Entry objects
+are only materialised for the rows a caller asks for.
+
+Columns restored from a snapshot start out as read-only ``memoryview``s
+over the caller's buffers (the snapshot's ``mmap``), so loading copies
+nothing; the first append or prune copies them into private arrays.
+"""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+import json
+import sys
+
+from .entry import MemoryEntry
+
+# Wider integer typecodes tried in turn when an interned column overflows.
+_WIDER = {"B": "H", "H": "L", "L": "Q"}
+
+
+def _encode(value: object) -> bytes:
+    return json.dumps(value, ensure_ascii=False).encode("utf-8")
+
+
+def _typecode_for(itemsize: int) -> str:
+    for typecode in "BHILQ":
+        if array(typecode).itemsize == itemsize:
+            return typecode
+    raise ValueError(f"no unsigned array typecode is {itemsize} bytes wide")
+
+
+def _little_endian(column: array) -> bytes:
+    if sys.byteorder == "little":
+        return column.tobytes()
+    swapped = array(column.typecode, column)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder != "little":
+        column.byteswap()
+    return column
+
+
+def _view(typecode: str, data: Any) -> Union[array, memoryview]:
+    """Read-only typed view of little-endian *data*; a copy on big-endian hosts."""
+    if sys.byteorder != "little":
+        return _from_little_endian(typecode, data)
+    return memoryview(data).cast(typecode)
+
+
+def _owned(column: Union[array, memoryview]) -> array:
+    if isinstance(column, array):
+        return column
+    copy = array(column.format)
+    copy.frombytes(column.cast("B"))
+    return copy
+
+
+class _InternedColumn:
+    """Column of repeated strings stored as codes into a value table."""
+
+    def __init__(self, typecode: str = "B") -> None:
+        self.codes: Union[array, memoryview] = array(typecode)
+        self.values: List[Optional[str]] = []
+        self.encoded: List[bytes] = []
+        self._lookup: Dict[Optional[str], int] = {}
+
+    def append(self, value: Optional[str]) -> None:
+        code = self._lookup.get(value)
+        if code is None:
+            code = self._lookup[value] = len(self.values)
+            self.values.append(value)
+            self.encoded.append(_encode(value))
+            limit = 1 << (8 * self.codes.itemsize)
+            if code >= limit:
+                self.codes = array(_WIDER[self.codes.typecode], self.codes)
+        self.codes.append(code)
+
+    def __getitem__(self, index: int) -> Optional[str]:
+        return self.values[self.codes[index]]
+
+    def nbytes(self) -> int:
+        return self.codes.itemsize * len(self.codes)
+
+    def own(self) -> None:
+        self.codes = _owned(self.codes)
+
+    @classmethod
+    def restore(cls, codes: Union[array, memoryview], values: List[Optional[str]]) -> "_InternedColumn":
+        column = cls()
+        column.codes = codes
+        column.values = list(values)
+        column.encoded = [_encode(value) for value in column.values]
+        column._lookup = {value: code for code, value in enumerate(column.values)}
+        return column
+
+
+class MemoryColumns:
+    """Append-only, front-prunable column store for memories.
+
+    Rows are kept in ascending ``seq`` order, so lookups by id are a
+    binary search over the ``seq`` column rather than a dictionary of
+    entry objects.
+    """
+
+    def __init__(self, entries: Iterable[MemoryEntry] = ()) -> None:
+        self._seq = array("q")
+        self._ts = array("d")
+        self._pinned = array("B")
+        self._category = _InternedColumn("B")
+        self._role = _InternedColumn("B")
+        self._source = _InternedColumn("B")
+        self._conv_id = _InternedColumn("L")
+        # Texts live JSON-encoded in one buffer; row i spans
+        # _offsets[i] .. _offsets[i + 1], shifted by _base after pruning.
+        self._text: Union[bytearray, memoryview] = bytearray()
+        self._offsets = array("Q", [0])
+        self._base = 0
+        # True while the columns are views over a snapshot's buffers.
+        self._mapped = False
+        self.extend(entries)
+
+    def __len__(self) -> int:
+        return len(self._seq)
+
+    # ------------------------------------------------------------------
+    def _own(self) -> None:
+        """Copy mapped columns into private, writable buffers."""
+        self._seq, self._ts, self._pinned, self._offsets = (
+            _owned(column) for column in (self._seq, self._ts, self._pinned, self._offsets)
+        )
+        self._text = bytearray(self._text)
+        for interned in self._interned().values():
+            interned.own()
+        self._mapped = False
+
+    def append(self, entry: MemoryEntry) -> None:
+        """Add *entry*; its id must be ``m{seq}`` above every stored seq."""
+        if self._mapped:
+            self._own()
+        self._seq.append(int(entry.id[1:]))
+        self._ts.append(entry.ts)
+        self._pinned.append(1 if entry.pinned else 0)
+        self._category.append(entry.category)
+        self._role.append(entry.role)
+        self._source.append(entry.source)
+        self._conv_id.append(entry.conv_id)
+        self._text += _encode(entry.text)
+        self._offsets.append(self._base + len(self._text))
+
+    def extend(self, entries: Iterable[MemoryEntry]) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    def drop_head(self, count: int) -> None:
+        """Remove the *count* oldest rows."""
+        count = min(count, len(self))
+        if count <= 0:
+            return
+        if self._mapped:
+            self._own()
+        cut = self._offsets[count] - self._base
+        del self._text[:cut]
+        self._base += cut
+        for column in (self._seq, self._ts, self._pinned, self._offsets):
+            del column[:count]
+        for interned in (self._category, self._role, self._source, self._conv_id):
+            del interned.codes[:count]
+
+    # ------------------------------------------------------------------
+    def _raw_text(self, index: int) -> Union[bytearray, memoryview]:
+        start = self._offsets[index] - self._base
+        return self._text[start : self._offsets[index + 1] - self._base]
+
+    def seq(self, index: int) -> int:
+        return self._seq[index]
+
+    def text(self, index: int) -> str:
+        return json.loads(bytes(self._raw_text(index)))
+
+    def category(self, index: int) -> str:
+        return self._category[index]  # type: ignore[return-value]
+
+    def ts(self, index: int) -> float:
+        return self._ts[index]
+
+    def entry(self, index: int) -> MemoryEntry:
+        """Materialise row *index* as a :class:`MemoryEntry`."""
+        return MemoryEntry(
+            text=self.text(index),
+            category=self.category(index),
+            id=f"m{self._seq[index]}",
+            ts=self._ts[index],
+            pinned=bool(self._pinned[index]),
+            role=self._role[index],
+            source=self._source[index],
+            conv_id=self._conv_id[index],
+        )
+
+    def index_of(self, seq: int) -> Optional[int]:
+        index = bisect_left(self._seq, seq)
+        if index < len(self._seq) and self._seq[index] == seq:
+            return index
+        return None
+
+    def start_after(self, seq: int) -> int:
+        """Row index of the first seq greater than *seq*."""
+        return bisect_right(self._seq, seq)
+
+    def get(self, seq: int) -> Optional[MemoryEntry]:
+        index = self.index_of(seq)
+        return None if index is None else self.entry(index)
+
+    def head(self, count: int) -> List[MemoryEntry]:
+        return [self.entry(index) for index in range(min(count, len(self)))]
+
+    def tail(self, count: int) -> List[MemoryEntry]:
+        return [self.entry(index) for index in range(max(0, len(self) - count), len(self))]
+
+    def after(self, seq: int, limit: Optional[int] = None) -> List[MemoryEntry]:
+        """Return the rows whose seq is greater than *seq*.
+
+        With *limit*, only the newest *limit* of them are returned.
+        """
+        start = self.start_after(seq)
+        if limit is not None:
+            start = max(start, len(self) - limit)
+        return [self.entry(index) for index in range(start, len(self))]
+
+    def texts(self) -> Iterator[Tuple[int, str]]:
+        """Yield ``(seq, text)`` for every row, oldest first."""
+        for index in range(len(self)):
+            yield self._seq[index], self.text(index)
+
+    # ------------------------------------------------------------------
+    def row_json(self, index: int) -> bytes:
+        """Serialise row *index* as the compact JSON of ``entry.to_dict()``."""
+        return b"".join(
+            (
+                b'{"text":',
+                self._raw_text(index),
+                b',"category":',
+                self._category.encoded[self._category.codes[index]],
+                b',"id":"m%d","ts":' % self._seq[index],
+                repr(self._ts[index]).encode("ascii"),
+                b',"pinned":true' if self._pinned[index] else b',"pinned":false',
+                b',"role":',
+                self._role.encoded[self._role.codes[index]],
+                b',"source":',
+                self._source.encoded[self._source.codes[index]],
+                b',"conv_id":',
+                self._conv_id.encoded[self._conv_id.codes[index]],
+                b"}",
+            )
+        )
+
+    def iter_json(self, start: int = 0) -> Iterator[bytes]:
+        for index in range(start, len(self)):
+            yield self.row_json(index)
+
+    def tail_json(self, count: int) -> bytes:
+        """JSON array of the last *count* rows, built from the raw buffers."""
+        return b"[" + b",".join(self.iter_json(max(0, len(self) - count))) + b"]"
+
+    def to_buffers(self) -> Tuple[Dict[str, Any], Dict[str, bytes]]:
+        """Raw column buffers plus the metadata needed to rebuild them.
+
+        Arrays are returned little-endian whatever the host, so the
+        buffers can be written to a portable snapshot as they are.
+        """
+        meta: Dict[str, Any] = {"count": len(self), "base": self._base, "interned": {}}
+        arrays = {"seq": self._seq, "ts": self._ts, "pinned": self._pinned, "offsets": self._offsets}
+        for name, interned in self._interned().items():
+            arrays[name] = interned.codes
+            meta["interned"][name] = {"itemsize": interned.codes.itemsize, "values": interned.values}
+        buffers = {name: _little_endian(column) for name, column in arrays.items()}
+        buffers["text"] = bytes(self._text)
+        return meta, buffers
+
+    @classmethod
+    def from_buffers(cls, meta: Dict[str, Any], buffers: Dict[str, Any]) -> "MemoryColumns":
+        """Inverse of :meth:`to_buffers`.
+
+        The columns are views over *buffers*, which must stay unchanged
+        until the first write copies them.
+        """
+        columns = cls()
+        columns._seq = _view("q", buffers["seq"])
+        columns._ts = _view("d", buffers["ts"])
+        columns._pinned = _view("B", buffers["pinned"])
+        columns._offsets = _view("Q", buffers["offsets"])
+        columns._text = memoryview(buffers["text"])
+        columns._base = int(meta["base"])
+        columns._mapped = True
+        for name, spec in meta["interned"].items():
+            codes = _view(_typecode_for(int(spec["itemsize"])), buffers[name])
+            setattr(columns, f"_{name}", _InternedColumn.restore(codes, spec["values"]))
+        if not len(columns._seq) == len(columns._offsets) - 1 == len(columns._category.codes):
+            raise ValueError("column buffers disagree on the row count")
+        return columns
+
+    def _interned(self) -> Dict[str, _InternedColumn]:
+        return {
+            "category": self._category,
+            "role": self._role,
+            "source": self._source,
+            "conv_id": self._conv_id,
+        }
+
+    def category_counts(self) -> Dict[str, int]:
+        """Rows per category, counted over the code column."""
+        values = self._category.values
+        codes = self._category.codes
+        if codes.itemsize == 1:
+            # One C-level scan per category instead of a Python loop per row.
+            raw = bytes(codes)
+            counts = {code: raw.count(code) for code in range(len(values))}
+            return {values[code]: count for code, count in counts.items() if count}  # type: ignore[misc]
+        return {values[code]: count for code, count in Counter(codes).items()}  # type: ignore[misc]
+
+    def pinned_rows(self) -> List[int]:
+        """Row indexes of pinned memories."""
+        flags = bytes(self._pinned)
+        rows = []
+        index = flags.find(1)
+        while index != -1:
+            rows.append(index)
+            index = flags.find(1, index + 1)
+        return rows
+
+    def nbytes(self) -> int:
+        """Approximate heap footprint of the column buffers."""
+        arrays = (self._seq, self._ts, self._pinned, self._offsets)
+        return (
+            len(self._text)
+            + sum(column.itemsize * len(column) for column in arrays)
+            + sum(
+                column.nbytes()
+                for column in (self._category, self._role, self._source, self._conv_id)
+            )
+        )
+
+
+__all__ = ["MemoryColumns"]
@@ -0,0 +1,47 @@
+"""The :class:`MemoryEntry` record shared by every memory back-end."""
+from __future__ import annotations
+
+from dataclasses import dataclass, fields
+from typing import Any, Dict, Optional
+
+
+@dataclass(slots=True)
+class MemoryEntry:
+    """Container for a single Pepper memory.
+
+    Slotted, so an entry carries no per-instance ``__dict__``.
+    """
+
+    text: str
+    category: str = "system"
+    id: str = ""
+    ts: float = 0.0
+    pinned: bool = False
+    role: str = "note"
+    source: str = "pepper"
+    conv_id: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return a JSON serialisable representation of the memory."""
+        # Every field is immutable, so no deep copy (``asdict``) is needed.
+        return {
+            "text": self.text,
+            "category": self.category,
+            "id": self.id,
+            "ts": self.ts,
+            "pinned": self.pinned,
+            "role": self.role,
+            "source": self.source,
+            "conv_id": self.conv_id,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "MemoryEntry":
+        """Build an entry from a stored record, ignoring unknown keys."""
+        return cls(**{key: value for key, value in data.items() if key in _FIELDS})
+
+
+_FIELDS = frozenset(field.name for field in fields(MemoryEntry))
+
+
+__all__ = ["MemoryEntry"]
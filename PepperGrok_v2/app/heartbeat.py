@@ -1,37 +1,76 @@
-"""Background heartbeat writer for Pepper."""
+"""Background heartbeat writer and back-end prober for Pepper.
+
+Events go to a shared :class:`~app.logsink.LogSink` as structured JSON
+lines.  Between heartbeats the thread probes the back-ends every
+``probe_interval`` seconds and caches the results for ``/status``.
+"""
 from __future__ import annotations
 
 import logging
 import threading
-from datetime import datetime
-from pathlib import Path
+import time
+from typing import Any, Callable, Dict, Optional
+
+from .logsink import LogSink
 
 LOGGER = logging.getLogger(__name__)
 
+HEARTBEAT_MESSAGE = "Pepper is alive. With you."
+
+Probe = Callable[[], Dict[str, Dict[str, Any]]]
+
 
 class Heartbeat(threading.Thread):
-    """Simple thread that writes a heartbeat message every hour."""
+    """Thread that logs a heartbeat every hour and probes the back-ends."""
 
-    def __init__(self, log_path: Path, interval_seconds: int = 3600) -> None:
+    def __init__(
+        self,
+        sink: LogSink,
+        interval_seconds: float = 3600,
+        probe: Optional[Probe] = None,
+        probe_interval: float = 60.0,
+    ) -> None:
         super().__init__(daemon=True)
-        self.log_path = log_path
+        self.sink = sink
         self.interval_seconds = interval_seconds
+        self.probe = probe
+        self.probe_interval = probe_interval
+        self._probes: Dict[str, Any] = {}
         self._stop_event = threading.Event()
 
     def run(self) -> None:  # pragma: no cover - background behaviour
+        next_beat = 0.0
+        tick = min(self.interval_seconds, self.probe_interval) if self.probe else self.interval_seconds
         while not self._stop_event.is_set():
-            timestamp = datetime.now().strftime("%Y-%m-%d %H:%M")
-            message = f"[{timestamp}] Pepper is alive. With you."
+            backends = self._run_probe()
             try:
-                self.log_path.parent.mkdir(parents=True, exist_ok=True)
-                with self.log_path.open("a", encoding="utf-8") as handle:
-                    handle.write(message + "\n")
-            except OSError as exc:
+                if time.monotonic() >= next_beat:
+                    self.sink.write("heartbeat", message=HEARTBEAT_MESSAGE, backends=backends)
+                    next_beat = time.monotonic() + self.interval_seconds
+                elif backends is not None:
+                    self.sink.write("probe", backends=backends)
+                self.sink.flush()
+            except (OSError, ValueError) as exc:
                 LOGGER.warning("Failed to write heartbeat: %s", exc)
-            self._stop_event.wait(self.interval_seconds)
+            self._stop_event.wait(tick)
+
+    def _run_probe(self) -> Optional[Dict[str, Any]]:
+        if self.probe is None:
+            return None
+        try:
+            backends = self.probe()
+        except Exception as exc:  # noqa: BLE001 - a probe must never kill the thread
+            LOGGER.warning("Back-end probe failed: %s", exc)
+            return None
+        self._probes = {"checked_at": time.time(), "backends": backends}
+        return backends
+
+    def probes(self) -> Dict[str, Any]:
+        """The most recent probe results (empty until the first probe)."""
+        return self._probes
 
     def stop(self) -> None:
         self._stop_event.set()
 
 
-__all__ = ["Heartbeat"]
+__all__ = ["HEARTBEAT_MESSAGE", "Heartbeat"]
@@ -0,0 +1,296 @@
+"""Append-only persistence for Pepper memories.
+
+The journal pairs a snapshot (compact JSON, or the binary layout from
+:mod:`app.snapshot`) with a JSON Lines write-ahead log.  New records are
+appended to the log in O(1); the snapshot is only rewritten during
+compaction, using a temporary file and an atomic ``os.replace`` so a crash
+never leaves a half-written snapshot behind.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Callable, Dict, IO, Iterable, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+from .columns import MemoryColumns
+from .snapshot import JSON_VERSION, SnapshotError, dump_binary, dump_json, is_binary, read_binary, read_records
+
+LOGGER = logging.getLogger(__name__)
+
+# Snapshot layout version written by :meth:`MemoryJournal.write_snapshot`.
+SNAPSHOT_VERSION = JSON_VERSION
+
+
+class MemoryJournal:
+    """Snapshot + write-ahead log pair with batched ``fsync``.
+
+    Every log record carries a monotonically increasing ``seq``.  The
+    snapshot stores the highest ``seq`` it contains, so records that
+    survive in the log after a crash mid-compaction are skipped on replay
+    instead of being applied twice.
+    """
+
+    def __init__(
+        self,
+        snapshot_path: Path,
+        log_path: Optional[Path] = None,
+        fsync_batch: int = 32,
+        fsync_interval: float = 1.0,
+    ) -> None:
+        self.snapshot_path = Path(snapshot_path)
+        self.log_path = Path(log_path) if log_path else self.snapshot_path.with_suffix(".jsonl")
+        self.fsync_batch = max(1, fsync_batch)
+        self.fsync_interval = fsync_interval
+        self.pending_records = 0
+        # Bytes of the log already applied, and the snapshot they sit on.
+        self.log_offset = 0
+        self.snapshot_signature: Optional[Tuple[int, int, int]] = None
+        self._handle: Optional[IO[str]] = None
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._io_lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._closed = threading.Event()
+
+    # ------------------------------------------------------------------
+    def replay(self) -> Tuple[int, List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """Return ``(snapshot_seq, snapshot_records, log_records)``.
+
+        Legacy snapshots (a bare JSON list) report a ``snapshot_seq`` of
+        0.  Log records at or below ``snapshot_seq`` and a torn final line
+        are dropped.
+        """
+
+        self.snapshot_signature = self.current_snapshot_signature()
+        snapshot_seq, snapshot_records = self._read_snapshot()
+        self.log_offset = 0
+        log_records = self._read_log(snapshot_seq)
+        self.pending_records = len(log_records)
+        return snapshot_seq, snapshot_records, log_records
+
+    def read_new(self) -> List[Dict[str, Any]]:
+        """Return complete log records appended since the last read.
+
+        Used to apply other processes' writes as deltas; the caller must
+        first check :meth:`current_snapshot_signature` and
+        :meth:`log_size` to rule out a compaction.
+        """
+
+        records = self._read_log(0)
+        self.pending_records += len(records)
+        return records
+
+    def _read_log(self, min_seq: int) -> List[Dict[str, Any]]:
+        records: List[Dict[str, Any]] = []
+        if not self.log_path.exists():
+            return records
+        with self.log_path.open("rb") as handle:
+            handle.seek(self.log_offset)
+            for line in handle:
+                if not line.endswith(b"\n"):
+                    break  # torn tail; repaired before the next append
+                self.log_offset += len(line)
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    LOGGER.warning("Skipping torn journal record in %s", self.log_path)
+                    continue
+                if isinstance(record, dict) and record.get("seq", 0) > min_seq:
+                    records.append(record)
+        return records
+
+    def log_size(self) -> int:
+        try:
+            return self.log_path.stat().st_size
+        except FileNotFoundError:
+            return 0
+
+    def current_snapshot_signature(self) -> Optional[Tuple[int, int, int]]:
+        """Identify the snapshot file; changes whenever it is replaced."""
+        try:
+            stat = self.snapshot_path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+    def _read_snapshot(self) -> Tuple[int, List[Dict[str, Any]]]:
+        if not self.snapshot_path.exists():
+            return 0, []
+        try:
+            return read_records(self.snapshot_path)
+        except SnapshotError as exc:
+            LOGGER.warning("Failed to read %s (%s); starting from the log only", self.snapshot_path, exc)
+            return 0, []
+
+    def binary_snapshot(self) -> bool:
+        """True when the current snapshot uses the binary layout."""
+        return is_binary(self.snapshot_path)
+
+    def replay_columns(self) -> Tuple[int, MemoryColumns, List[Dict[str, Any]]]:
+        """:meth:`replay` for a binary snapshot, loaded straight into columns.
+
+        No snapshot row is decoded; only the log tail is parsed.
+        """
+
+        self.snapshot_signature = self.current_snapshot_signature()
+        try:
+            snapshot_seq, columns = read_binary(self.snapshot_path)
+        except (OSError, SnapshotError) as exc:
+            LOGGER.warning("Failed to read %s (%s); starting from the log only", self.snapshot_path, exc)
+            snapshot_seq, columns = 0, MemoryColumns()
+        self.log_offset = 0
+        log_records = self._read_log(snapshot_seq)
+        self.pending_records = len(log_records)
+        return snapshot_seq, columns, log_records
+
+    # ------------------------------------------------------------------
+    def append(self, record: Dict[str, Any]) -> None:
+        """Append *record* to the log.
+
+        The line is flushed to the OS immediately; ``fsync`` is deferred
+        until ``fsync_batch`` records are pending or the background
+        flusher notices ``fsync_interval`` has elapsed (group commit).
+        """
+
+        self.append_many([record])
+
+    def append_many(self, records: List[Dict[str, Any]]) -> None:
+        """Append *records* with a single write.
+
+        Follows the same group-commit policy as :meth:`append`, so a bulk
+        batch of at least ``fsync_batch`` records costs exactly one
+        ``fsync``.
+        """
+
+        if not records:
+            return
+        lines = "".join(
+            json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+            for record in records
+        )
+        with self._io_lock:
+            handle = self._open_log()
+            end = os.fstat(handle.fileno()).st_size
+            if end and os.pread(handle.fileno(), 1, end - 1) != b"\n":
+                # A crashed writer left a partial line; never glue onto it.
+                lines = "\n" + lines
+            handle.write(lines)
+            handle.flush()
+            self.log_offset = os.fstat(handle.fileno()).st_size
+            self._unsynced += len(records)
+            self.pending_records += len(records)
+            if self._unsynced >= self.fsync_batch:
+                self._fsync_locked()
+        self._ensure_flusher()
+
+    def sync(self) -> None:
+        """Force pending log records to stable storage."""
+        with self._io_lock:
+            self._fsync_locked()
+
+    def _open_log(self) -> IO[str]:
+        if self._handle is None or self._handle.closed:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            self._handle = self.log_path.open("a+", encoding="utf-8")
+        return self._handle
+
+    def _fsync_locked(self) -> None:
+        if self._handle is not None and not self._handle.closed and self._unsynced:
+            self._handle.flush()
+            os.fsync(self._handle.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    def _ensure_flusher(self) -> None:
+        if self._flusher is not None or self.fsync_interval <= 0:
+            return
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+        self._flusher.start()
+
+    def _flush_loop(self) -> None:  # pragma: no cover - background behaviour
+        while not self._closed.wait(self.fsync_interval):
+            with self._io_lock:
+                if self._unsynced and time.monotonic() - self._last_sync >= self.fsync_interval:
+                    try:
+                        self._fsync_locked()
+                    except OSError as exc:
+                        LOGGER.warning("Journal fsync failed: %s", exc)
+
+    # ------------------------------------------------------------------
+    def write_snapshot(self, seq: int, records: List[Dict[str, Any]]) -> None:
+        """Atomically replace the snapshot and truncate the log.
+
+        The snapshot is written to a temporary file, fsynced and moved
+        into place before the log is emptied.  A crash between the two
+        steps leaves log records with ``seq <= seq`` behind, which
+        :meth:`replay` ignores.
+        """
+
+        self.write_encoded_snapshot(
+            seq,
+            (
+                json.dumps(record, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                for record in records
+            ),
+        )
+
+    def write_encoded_snapshot(self, seq: int, rows: Iterable[bytes]) -> None:
+        """:meth:`write_snapshot` for records already serialised to JSON."""
+
+        self._install_snapshot(lambda handle: dump_json(handle, seq, rows))
+
+    def write_columns_snapshot(self, seq: int, columns: MemoryColumns) -> None:
+        """:meth:`write_snapshot` in the binary layout, straight from *columns*."""
+
+        self._install_snapshot(lambda handle: dump_binary(handle, seq, columns))
+
+    def _install_snapshot(self, write: Callable[[IO[bytes]], None]) -> None:
+        tmp_path = self.snapshot_path.with_name(self.snapshot_path.name + ".tmp")
+        with tmp_path.open("wb") as handle:
+            write(handle)
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+        _fsync_dir(self.snapshot_path.parent)
+        with self._io_lock:
+            if self._handle is not None and not self._handle.closed:
+                self._handle.close()
+            self._handle = None
+            with self.log_path.open("w", encoding="utf-8") as handle:
+                handle.flush()
+                os.fsync(handle.fileno())
+            self._unsynced = 0
+            self.pending_records = 0
+            self.log_offset = 0
+        self.snapshot_signature = self.current_snapshot_signature()
+
+    # ------------------------------------------------------------------
+    def close(self) -> None:
+        """Flush outstanding records and stop the background flusher."""
+        self._closed.set()
+        with self._io_lock:
+            self._fsync_locked()
+            if self._handle is not None and not self._handle.closed:
+                self._handle.close()
+            self._handle = None
+
+
+def _fsync_dir(path: Path) -> None:
+    """Persist a rename by syncing the containing directory (POSIX only)."""
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+__all__ = ["MemoryJournal", "SNAPSHOT_VERSION"]
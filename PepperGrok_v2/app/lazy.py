@@ -0,0 +1,66 @@
+"""Build-once holders for subsystems that are slow to start.
+
+Importing :mod:`app.server` should only define routes.  Loading the
+memory store (journal replay, index rebuild) or opening the response
+cache happens on first use, or earlier in a background warm-up thread
+started by the lifespan hook, so the process accepts connections and
+answers ``/status`` straight away.
+"""
+from __future__ import annotations
+
+from typing import Callable, Generic, Optional, TypeVar
+import logging
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """Thread-safe holder that calls *factory* once, on first :meth:`get`."""
+
+    def __init__(self, factory: Callable[[], T], name: str) -> None:
+        self.name = name
+        self.load_seconds: Optional[float] = None
+        self._factory = factory
+        self._value: Optional[T] = None
+        self._lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._value is not None
+
+    def get(self) -> T:
+        """Return the value, building it (and blocking callers) on first use."""
+        value = self._value
+        if value is not None:
+            return value
+        with self._lock:
+            if self._value is None:
+                started = time.perf_counter()
+                self._value = self._factory()
+                self.load_seconds = time.perf_counter() - started
+                LOGGER.info("%s ready in %.3fs", self.name, self.load_seconds)
+            return self._value
+
+    def peek(self) -> Optional[T]:
+        """Return the value if it has been built, without building it."""
+        return self._value
+
+    def warm(self) -> threading.Thread:
+        """Build the value on a daemon thread; errors resurface on :meth:`get`."""
+
+        def run() -> None:
+            try:
+                self.get()
+            except Exception:
+                LOGGER.exception("Warm-up of %s failed", self.name)
+
+        thread = threading.Thread(target=run, daemon=True, name=f"warm-{self.name}")
+        thread.start()
+        return thread
+
+
+__all__ = ["Lazy"]
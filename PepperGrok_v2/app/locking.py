@@ -0,0 +1,82 @@
+"""Cross-process coordination for the file-backed memory store.
+
+A :class:`ProcessLock` wraps one small lock file that several processes
+(uvicorn workers, the migration CLI) open side by side.  ``fcntl.flock``
+provides shared/exclusive advisory locks on it, and its first eight bytes
+hold a generation counter that every writer bumps, so readers can tell
+with a single eight-byte read whether anything changed on disk.
+
+:mod:`fcntl` is POSIX-only; without it locking is a no-op and the store
+falls back to single-process behaviour.
+"""
+from __future__ import annotations
+
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+import os
+
+try:
+    import fcntl  # type: ignore
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+
+_COUNTER_BYTES = 8
+
+
+class ProcessLock:
+    """Advisory file lock plus a shared generation counter.
+
+    ``flock`` locks belong to the open file, so threads of one process
+    share them; callers must serialise their own threads (the memory
+    store already holds its ``threading.Lock`` around every use).
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._fd = os.open(str(self.path), os.O_RDWR | os.O_CREAT, 0o644)
+
+    @contextmanager
+    def shared(self) -> Iterator[None]:
+        """Hold the lock in shared mode (readers catching up)."""
+        yield from self._hold(fcntl.LOCK_SH if fcntl else 0)
+
+    @contextmanager
+    def exclusive(self) -> Iterator[None]:
+        """Hold the lock in exclusive mode (writers and compaction)."""
+        yield from self._hold(fcntl.LOCK_EX if fcntl else 0)
+
+    def _hold(self, mode: int) -> Iterator[None]:
+        if fcntl is None or self._fd < 0:
+            yield
+            return
+        fcntl.flock(self._fd, mode)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+    # ------------------------------------------------------------------
+    def generation(self) -> int:
+        """Return the on-disk generation counter (0 for a fresh file)."""
+        if self._fd < 0:
+            return 0
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        raw = os.read(self._fd, _COUNTER_BYTES)
+        return int.from_bytes(raw, "big") if len(raw) == _COUNTER_BYTES else 0
+
+    def bump(self) -> int:
+        """Increment and return the generation; call under :meth:`exclusive`."""
+        generation = self.generation() + 1
+        os.lseek(self._fd, 0, os.SEEK_SET)
+        os.write(self._fd, generation.to_bytes(_COUNTER_BYTES, "big"))
+        return generation
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+__all__ = ["ProcessLock"]
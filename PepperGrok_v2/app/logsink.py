@@ -0,0 +1,210 @@
+"""Structured, rotating event log with a sparse offset index.
+
+:class:`LogSink` appends one compact JSON object per line (``ts``,
+``event`` and free-form fields) through a single buffered handle that stays
+open, instead of reopening the file per write.  The active segment is
+rotated when it outgrows ``max_bytes`` or ``max_age`` seconds, and old
+segments are gzipped in the background, keeping the newest ``backups``.
+
+Every ``index_every``-th record's timestamp and byte offset is kept in
+memory, so "last N events" seeks straight to the right block and time
+range queries bisect to their start instead of scanning the file.
+"""
+from __future__ import annotations
+
+from bisect import bisect_right
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import gzip
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _parse(line: bytes) -> Optional[Dict[str, Any]]:
+    try:
+        record = json.loads(line)
+    except ValueError:
+        return None  # a partial line or the old plain-text format
+    return record if isinstance(record, dict) and "ts" in record else None
+
+
+class LogSink:
+    """Buffered JSON-lines writer with rotation and indexed reads."""
+
+    def __init__(
+        self,
+        path: Path,
+        max_bytes: int = 5_000_000,
+        max_age: float = 86400.0,
+        backups: int = 7,
+        index_every: int = 64,
+        flush_interval: float = 1.0,
+    ) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.backups = backups
+        self.index_every = max(1, index_every)
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._last_flush = time.monotonic()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._open()
+
+    def _open(self) -> None:
+        """Open the active segment and rebuild its index with one scan."""
+        self._index: List[Tuple[float, int]] = []
+        self._records = 0
+        self._size = 0
+        self._started = time.time()
+        last_ts = 0.0
+        partial = False
+        if self.path.exists():
+            with self.path.open("rb") as handle:
+                for line in handle:
+                    record = _parse(line)
+                    if record is not None:
+                        last_ts = float(record["ts"])
+                        if not self._records:
+                            self._started = last_ts
+                    if self._records % self.index_every == 0:
+                        self._index.append((last_ts, self._size))
+                    self._records += 1
+                    self._size += len(line)
+                    partial = not line.endswith(b"\n")
+        self._handle = self.path.open("ab", buffering=64 * 1024)
+        if partial:
+            # A crash mid-write left half a line; never glue the next record to it.
+            self._handle.write(b"\n")
+            self._size += 1
+
+    # ------------------------------------------------------------------
+    def write(self, event: str, **fields: Any) -> None:
+        now = time.time()
+        line = json.dumps({"ts": now, "event": event, **fields}, separators=(",", ":")).encode("utf-8")
+        line += b"\n"
+        with self._lock:
+            if self._size and (
+                self._size + len(line) > self.max_bytes or now - self._started > self.max_age
+            ):
+                self._rotate()
+            if not self._records:
+                self._started = now
+            if self._records % self.index_every == 0:
+                self._index.append((now, self._size))
+            self._handle.write(line)
+            self._records += 1
+            self._size += len(line)
+            if time.monotonic() - self._last_flush >= self.flush_interval:
+                self._flush_locked()
+
+    def flush(self) -> None:
+        with self._lock:
+            self._flush_locked()
+
+    def _flush_locked(self) -> None:
+        self._handle.flush()
+        self._last_flush = time.monotonic()
+
+    def _rotate(self) -> None:
+        self._handle.close()
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self._started))
+        target = self.path.with_name(f"{self.path.name}.{stamp}")
+        suffix = 1
+        while target.exists() or target.with_name(target.name + ".gz").exists():
+            target = self.path.with_name(f"{self.path.name}.{stamp}-{suffix}")
+            suffix += 1
+        os.replace(self.path, target)
+        self._open()
+        threading.Thread(target=self._compress, args=(target,), daemon=True).start()
+
+    def _compress(self, segment: Path) -> None:
+        try:
+            # Compress under a hidden name so readers never see a partial .gz.
+            partial = segment.with_name(f".{segment.name}.gz")
+            with segment.open("rb") as source, gzip.open(partial, "wb") as target:
+                shutil.copyfileobj(source, target)
+            os.replace(partial, f"{segment}.gz")
+            segment.unlink()
+            for stale in self.segments()[: -self.backups or None]:
+                stale.unlink(missing_ok=True)
+        except OSError as exc:
+            LOGGER.warning("Could not compress %s: %s", segment, exc)
+
+    def segments(self) -> List[Path]:
+        """Rotated segments, oldest first (compressed or not yet)."""
+        prefix = self.path.name + "."
+        rotated = [path for path in self.path.parent.iterdir() if path.name.startswith(prefix)]
+        return sorted(rotated, key=lambda path: path.name.removesuffix(".gz"))
+
+    # ------------------------------------------------------------------
+    def _read_from(self, offset: int) -> List[bytes]:
+        with self._lock:
+            self._flush_locked()
+        with self.path.open("rb") as handle:
+            handle.seek(offset)
+            return handle.read().splitlines()
+
+    def tail(self, count: int) -> List[Dict[str, Any]]:
+        """The last *count* records, reading only the final index block(s)."""
+        if count <= 0:
+            return []
+        with self._lock:
+            block = max(0, self._records - count) // self.index_every
+            offset = self._index[block][1] if block < len(self._index) else 0
+            short = self._records < count
+        records = [record for record in map(_parse, self._read_from(offset)) if record is not None]
+        if short:
+            records = self._previous_segment() + records
+        return records[-count:]
+
+    def between(self, start: float, end: Optional[float] = None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Records with ``start <= ts <= end`` from the active segment, oldest first."""
+        with self._lock:
+            block = bisect_right(self._index, (start, float("inf"))) - 1
+            offset = self._index[max(0, block)][1] if self._index else 0
+        records: List[Dict[str, Any]] = []
+        for line in self._read_from(offset):
+            record = _parse(line)
+            if record is None or record["ts"] < start:
+                continue
+            if end is not None and record["ts"] > end or len(records) >= limit:
+                break
+            records.append(record)
+        return records
+
+    def _previous_segment(self) -> List[Dict[str, Any]]:
+        segments = self.segments()
+        if not segments:
+            return []
+        newest = segments[-1]
+        try:
+            opener = gzip.open if newest.suffix == ".gz" else open
+            with opener(newest, "rb") as handle:
+                lines = handle.read().splitlines()
+        except OSError:
+            return []
+        return [record for record in map(_parse, lines) if record is not None]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "path": str(self.path),
+                "records": self._records,
+                "bytes": self._size,
+                "index_entries": len(self._index),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._handle.closed:
+                self._handle.close()
+
+
+__all__ = ["LogSink"]
@@ -6,11 +6,24 @@ self-contained so the FastAPI app can run without additional services.
 """
 from __future__ import annotations
 
-from dataclasses import dataclass, asdict
+from collections import Counter, deque
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional
+from typing import Any, Dict, Iterable, List, Optional, Tuple
 import json
+import logging
 import threading
+import time
+
+from .categorise import Categoriser, make_categoriser
+from .columns import MemoryColumns
+from .entry import MemoryEntry
+from .journal import MemoryJournal
+from .locking import ProcessLock
+from .ranking import Ranked, RankWeights, RecencyIndex, rank
+from .search import SearchIndex
+from .vectors import Embedder, VectorIndex, make_embedder
+
+LOGGER = logging.getLogger(__name__)
 
 # Default location requested in the product brief.
 DEFAULT_MEMORY_PATH = Path.home() / "bje" / "pepper_dir" / "identity" / "pepper_memory.json"
@@ -18,6 +31,12 @@ DEFAULT_MEMORY_PATH = Path.home() / "bje" / "pepper_dir" / "identity" / "pepper_
 # Maximum number of memories the system should retain.
 DEFAULT_MAX_MEMORIES = 5000
 
+# Number of journal records appended before the snapshot is compacted.
+DEFAULT_COMPACT_EVERY = 1000
+
+# Number of most recent memories the running emotional bias covers.
+DEFAULT_BIAS_WINDOW = 15
+
 # Category weights that influence Pepper's emotional tone.
 CATEGORY_WEIGHTS: Dict[str, float] = {
     "ritual": 1.5,
@@ -26,71 +45,149 @@ CATEGORY_WEIGHTS: Dict[str, float] = {
     "light": 0.8,
 }
 
-# Keyword -> category mapping for the auto-categorizer.
-_KEYWORD_CATEGORY_MAP: Dict[str, str] = {
-    "gratitude": "emotional",
-    "love": "emotional",
-    "hug": "emotional",
-    "journal": "ritual",
-    "morning": "ritual",
-    "evening": "ritual",
-    "todo": "system",
-    "task": "system",
-    "reminder": "system",
-    "joke": "light",
-    "play": "light",
-    "laugh": "light",
-}
+# Categoriser used when a store is not given one (default keywords only).
+_DEFAULT_CATEGORISER = Categoriser()
 
+class MemoryAggregates:
+    """Running totals kept in step with a store's adds and prunes.
 
-@dataclass
-class MemoryEntry:
-    """Container for a single Pepper memory."""
+    Tracks the memory count, per-category counts and the sum of
+    ``CATEGORY_WEIGHTS`` over the last *window* memories, so status and
+    bias queries never walk the memory list.
+    """
 
-    text: str
-    category: str = "system"
+    def __init__(self, window: int = DEFAULT_BIAS_WINDOW) -> None:
+        self.window = max(1, window)
+        self.total = 0
+        self.categories: Counter = Counter()
+        self._recent: deque = deque()
+        self._recent_sum = 0.0
 
-    def to_dict(self) -> Dict[str, str]:
-        """Return a JSON serialisable representation of the memory."""
-        return asdict(self)
+    def added(self, categories: Iterable[str]) -> None:
+        """Account for newly stored memories, oldest first."""
+        for category in categories:
+            self.total += 1
+            self.categories[category] += 1
+            weight = CATEGORY_WEIGHTS.get(category, 1.0)
+            self._recent.append(weight)
+            self._recent_sum += weight
+            if len(self._recent) > self.window:
+                self._recent_sum -= self._recent.popleft()
 
+    def seed(self, counts: Dict[str, int], recent: Iterable[str]) -> None:
+        """Reset from stored per-category *counts* and the *recent* categories."""
+        self.categories = Counter(counts)
+        self.total = sum(self.categories.values())
+        weights = [CATEGORY_WEIGHTS.get(category, 1.0) for category in recent][-self.window :]
+        self._recent = deque(weights)
+        self._recent_sum = sum(weights)
 
-class MemoryStore:
-    """Thread-safe storage for Pepper memories."""
+    def removed(self, counts: Dict[str, int]) -> None:
+        """Account for pruned memories given as ``{category: count}``."""
+        for category, count in counts.items():
+            self.total -= count
+            self.categories[category] -= count
+            if self.categories[category] <= 0:
+                del self.categories[category]
+        # Pruning drops the oldest memories, which only touches the window
+        # once fewer than ``window`` memories remain.
+        while len(self._recent) > self.total:
+            self._recent_sum -= self._recent.popleft()
+        if not self._recent:
+            self._recent_sum = 0.0
 
-    def __init__(
-        self,
-        path: Path = DEFAULT_MEMORY_PATH,
-        max_memories: int = DEFAULT_MAX_MEMORIES,
-    ) -> None:
-        self.path = Path(path)
-        self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.max_memories = max_memories
-        self._lock = threading.Lock()
-        self._memories: List[MemoryEntry] = []
-        self._load()
+    def bias(self) -> float:
+        """Mean category weight of the last ``window`` memories."""
+        if not self._recent:
+            return CATEGORY_WEIGHTS["system"]
+        return self._recent_sum / len(self._recent)
 
-    # ------------------------------------------------------------------
-    def _load(self) -> None:
-        """Read memories from disk if present."""
-        if not self.path.exists():
-            self._memories = []
-            return
-        try:
-            data = json.loads(self.path.read_text("utf-8"))
-        except json.JSONDecodeError:
-            data = []
-        self._memories = [MemoryEntry(**item) for item in data if isinstance(item, dict)]
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "memories": self.total,
+            "categories": dict(self.categories),
+            "emotional_bias": round(self.bias(), 4),
+            "bias_window": self.window,
+        }
 
-    # ------------------------------------------------------------------
-    def _save(self) -> None:
-        """Persist the in-memory list to disk."""
-        payload = [entry.to_dict() for entry in self._memories]
-        self.path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+class BaseMemoryStore:
+    """Behaviour shared by the JSON and SQLite memory back-ends.
+
+    Subclasses implement storage (``add_many``, ``list``, ``get``,
+    ``pinned``, ``search``, ``compact``, ``close``) and
+    :meth:`_entries_by_seq`; recall fusion, embedding and the emotional
+    weighting live here so both back-ends behave identically.
+    """
+
+    max_memories: int
+    embed_batch: int
+    _lock: threading.Lock
+    _vectors: Optional[VectorIndex]
+    _pending_vectors: List[MemoryEntry]
+    _stats: MemoryAggregates
+
+    def add_many(self, records: Iterable[Dict[str, Any]]) -> List[MemoryEntry]:
+        raise NotImplementedError
+
+    def list(self, limit: int = 15) -> List[MemoryEntry]:
+        raise NotImplementedError
+
+    def search(self, query: str, k: int = 6) -> List[Tuple[MemoryEntry, float]]:
+        raise NotImplementedError
+
+    def list_json(self, limit: int = 15) -> bytes:
+        """Return :meth:`list` as a compact JSON array."""
+        rows = [entry.to_dict() for entry in self.list(limit)]
+        return json.dumps(rows, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    def _entries_by_seq(self, seqs: List[int]) -> Dict[int, MemoryEntry]:
+        raise NotImplementedError
+
+    def since(self, seq: int, limit: int = 50) -> List[MemoryEntry]:
+        """Return up to *limit* of the newest memories stored after *seq*."""
+        raise NotImplementedError
+
+    def snapshot_columns(self) -> Tuple[int, MemoryColumns]:
+        """Every stored memory as ``(seq, columns)``, for exports and backups."""
+        entries = self.since(0, limit=max(1, self.count()))
+        return (_seq_of(entries[-1]) if entries else 0), MemoryColumns(entries)
+
+    def generation(self) -> int:
+        """Counter that changes whenever any process writes to the store."""
+        raise NotImplementedError
+
+    def _sync_locked(self) -> None:
+        """Catch up with other processes' writes; callers hold ``_lock``."""
+
+    def _prepare(self, records: Iterable[Dict[str, Any]]) -> List[Tuple[str, str, Dict[str, Any]]]:
+        """Strip, drop empty and categorise incoming records."""
+        prepared = []
+        for record in records:
+            text = str(record.get("text") or "").strip()
+            if text:
+                prepared.append((text, record.get("category"), record))
+        unlabelled = [position for position, (_, category, _) in enumerate(prepared) if not category]
+        if unlabelled:
+            guessed = self.categoriser.categorise_many([prepared[position][0] for position in unlabelled])
+            for position, category in zip(unlabelled, guessed):
+                text, _, record = prepared[position]
+                prepared[position] = (text, category, record)
+        return prepared
 
     # ------------------------------------------------------------------
-    def add(self, text: str, category: Optional[str] = None) -> MemoryEntry:
-        """Store a new memory entry with automatic pruning.
+    def add(
+        self,
+        text: str,
+        category: Optional[str] = None,
+        pinned: bool = False,
+        role: str = "note",
+        source: str = "pepper",
+        conv_id: Optional[str] = None,
+    ) -> MemoryEntry:
+        """Store a new memory entry.
+
+        Pruning to ``max_memories`` is deferred to the next compaction.
 
         Parameters
         ----------
@@ -99,50 +196,603 @@ class MemoryStore:
         category:
             Optional explicit category.  If omitted an automatic
             categoriser is invoked.
+        pinned:
+            Pinned memories are always offered to the augmentation stage.
+        role, source, conv_id:
+            Provenance fields from the ``MemoryItem`` schema.
         """
 
-        clean_category = category or self.auto_categorise(text)
-        entry = MemoryEntry(text=text.strip(), category=clean_category)
-        with self._lock:
-            self._memories.append(entry)
-            self._memories = self._memories[-self.max_memories :]
-            self._save()
-        return entry
+        record = {
+            "text": text,
+            "category": category,
+            "pinned": pinned,
+            "role": role,
+            "source": source,
+            "conv_id": conv_id,
+        }
+        return self.add_many([record])[0]
 
     # ------------------------------------------------------------------
-    def list(self, limit: int = 15) -> List[MemoryEntry]:
-        """Return the last *limit* memories."""
+    def embed_pending(self) -> None:
+        """Embed queued memories in batches of ``embed_batch``."""
+        if self._vectors is None:
+            return
         with self._lock:
-            return list(self._memories[-limit:])
+            pending, self._pending_vectors = self._pending_vectors, []
+        for start in range(0, len(pending), self.embed_batch):
+            batch = pending[start : start + self.embed_batch]
+            try:
+                self._vectors.add_batch([_seq_of(e) for e in batch], [e.text for e in batch])
+            except Exception as exc:  # provider errors must not lose memories
+                LOGGER.warning("Embedding batch failed: %s", exc)
+                with self._lock:
+                    self._pending_vectors[:0] = pending[start:]
+                return
+
+    # ------------------------------------------------------------------
+    def semantic_search(self, query: str, k: int = 6) -> List[Tuple[MemoryEntry, float]]:
+        """Return the *k* memories closest to *query* by embedding cosine.
+
+        Returns no hits when the embedder fails, e.g. Ollama is down.
+        """
+        if self._vectors is None:
+            return []
+        self.embed_pending()
+        try:
+            hits = self._vectors.search(query, k)
+        except Exception as exc:  # provider errors degrade to lexical recall
+            LOGGER.warning("Query embedding failed: %s", exc)
+            return []
+        entries = self._entries_by_seq([seq for seq, _ in hits])
+        return [(entries[seq], score) for seq, score in hits if seq in entries]
+
+    # ------------------------------------------------------------------
+    def recall(self, query: str, k: int = 6) -> List[Tuple[MemoryEntry, float]]:
+        """Fuse lexical and semantic hits with reciprocal rank fusion.
+
+        Falls back to plain BM25 :meth:`search` when no embedder is set
+        or the semantic side returns nothing (including embedder errors).
+        """
+        lexical = self.search(query, k)
+        if self._vectors is None:
+            return lexical
+        semantic = self.semantic_search(query, k)
+        if not semantic:
+            return lexical
+        fused: Dict[str, float] = {}
+        entries: Dict[str, MemoryEntry] = {}
+        for hits in (lexical, semantic):
+            for rank, (entry, _) in enumerate(hits):
+                fused[entry.id] = fused.get(entry.id, 0.0) + 1.0 / (60 + rank)
+                entries[entry.id] = entry
+        ranked = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(entries[entry_id], score) for entry_id, score in ranked]
+
+    def rank(
+        self,
+        query: str,
+        k: int = 6,
+        weights: Optional[RankWeights] = None,
+        now: Optional[float] = None,
+        explain: bool = False,
+        relevant_only: bool = False,
+    ) -> List[Ranked]:
+        """Top *k* memories by the hybrid score of :mod:`app.ranking`.
+
+        Candidates are the best :meth:`recall` hits for *query*, plus
+        (unless *relevant_only*) every pinned memory and the newest *k*
+        of each category, so an unmatched query still ranks by recency,
+        category and pins.
+        """
+        candidates: Dict[str, Tuple[MemoryEntry, float]] = {}
+        hits = self.recall(query, max(4 * k, 24)) if query else []
+        top = max((score for _, score in hits), default=0.0) or 1.0
+        for entry, score in hits:
+            candidates[entry.id] = (entry, score / top)
+        if not relevant_only:
+            for entry in self.pinned() + self._recent_candidates(k):
+                candidates.setdefault(entry.id, (entry, 0.0))
+        return rank(
+            candidates.values(), k, weights or RankWeights(), CATEGORY_WEIGHTS, now or time.time(), explain
+        )
+
+    def _recent_candidates(self, k: int) -> List[MemoryEntry]:
+        """The newest *k* memories of every category."""
+        raise NotImplementedError
 
     # ------------------------------------------------------------------
     def auto_categorise(self, text: str) -> str:
         """Infer a category from the provided text.
 
-        The mapping uses simple keyword heuristics.  If nothing matches,
+        Uses the store's :class:`~app.categorise.Categoriser`: whole-word
+        keyword matches are weighted per category.  If nothing matches,
         ``"system"`` is returned.
         """
 
-        lowered = text.lower()
-        for keyword, category in _KEYWORD_CATEGORY_MAP.items():
-            if keyword in lowered:
-                return category
-        return "system"
+        return self.categoriser.categorise(text)
+
+    # ------------------------------------------------------------------
+    def count(self) -> int:
+        """Return the number of stored memories in constant time."""
+        with self._lock:
+            self._sync_locked()
+            return self._stats.total
+
+    def stats(self) -> Dict[str, Any]:
+        """Count, per-category counts and running bias in constant time."""
+        with self._lock:
+            self._sync_locked()
+            return self._stats.snapshot()
 
     # ------------------------------------------------------------------
     def emotional_bias(self, sample: Optional[Iterable[MemoryEntry]] = None) -> float:
         """Calculate the emotional bias for the provided sample.
 
-        If *sample* is omitted the method calculates the bias using the
-        most recent 15 memories.  When no memories are stored the neutral
-        weight of 1.0 is returned.
+        If *sample* is omitted the running bias over the most recent
+        ``bias_window`` memories is returned without touching the store.
+        When no memories are stored the neutral weight of 1.0 is returned.
         """
 
-        relevant = list(sample or self.list(limit=15))
+        if sample is None:
+            with self._lock:
+                self._sync_locked()
+                return self._stats.bias()
+        relevant = list(sample)
         if not relevant:
             return CATEGORY_WEIGHTS["system"]
         total = sum(CATEGORY_WEIGHTS.get(entry.category, 1.0) for entry in relevant)
         return total / len(relevant)
 
 
-__all__ = ["MemoryEntry", "MemoryStore", "CATEGORY_WEIGHTS", "DEFAULT_MEMORY_PATH"]
+class MemoryStore(BaseMemoryStore):
+    """Thread-safe storage for Pepper memories.
+
+    Memories are persisted through a :class:`~app.journal.MemoryJournal`:
+    each :meth:`add` appends one JSON line to ``pepper_memory.jsonl`` and
+    the full snapshot at *path* is only rewritten every *compact_every*
+    additions, which is also when ``max_memories`` pruning happens.  With
+    ``snapshot_format="binary"`` the snapshot is ``pepper_memory.snap`` in
+    the :mod:`app.snapshot` layout instead, loaded without parsing rows.
+
+    Several processes may share one store: writers serialise on an
+    ``fcntl`` lock (``pepper_memory.lock``) whose generation counter tells
+    every other process to apply the new journal lines, or to reload after
+    a compaction, before its next read or write.
+
+    In memory, entries are held column-wise in a
+    :class:`~app.columns.MemoryColumns` rather than as one object each.
+    A BM25 :class:`~app.search.SearchIndex` is maintained alongside and
+    saved to ``pepper_memory.index.json`` at compaction time; after a
+    load it is only read back on the first search or compaction.  When an
+    *embedder* is supplied, memories are also embedded in batches into a
+    memory-mapped :class:`~app.vectors.VectorIndex` for semantic recall.
+    """
+
+    def __init__(
+        self,
+        path: Path = DEFAULT_MEMORY_PATH,
+        max_memories: int = DEFAULT_MAX_MEMORIES,
+        compact_every: int = DEFAULT_COMPACT_EVERY,
+        fsync_batch: int = 32,
+        fsync_interval: float = 1.0,
+        embedder: Optional[Embedder] = None,
+        embed_batch: int = 32,
+        bias_window: int = DEFAULT_BIAS_WINDOW,
+        categoriser: Optional[Categoriser] = None,
+        snapshot_format: str = "json",
+    ) -> None:
+        if snapshot_format not in ("json", "binary"):
+            raise ValueError(f"Unknown memory_snapshot format: {snapshot_format}")
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_memories = max_memories
+        self.compact_every = max(1, compact_every)
+        self.categoriser = categoriser or _DEFAULT_CATEGORISER
+        self.snapshot_format = snapshot_format
+        self._lock = threading.Lock()
+        self._stats = MemoryAggregates(bias_window)
+        self._memories = MemoryColumns()
+        self._pinned: Dict[str, MemoryEntry] = {}
+        self._seq = 0
+        self.index_path = self.path.with_suffix(".index.json")
+        # Built on first search or compaction; see _search_index().
+        self._index: Optional[SearchIndex] = SearchIndex()
+        self._index_base = 0
+        self._recency = RecencyIndex()
+        self.embed_batch = max(1, embed_batch)
+        self._vectors = VectorIndex(self.path, embedder) if embedder else None
+        self._pending_vectors: List[MemoryEntry] = []
+        snapshot_path = self.path.with_suffix(".snap") if snapshot_format == "binary" else self.path
+        self._journal = MemoryJournal(
+            snapshot_path,
+            log_path=self.path.with_suffix(".jsonl"),
+            fsync_batch=fsync_batch,
+            fsync_interval=fsync_interval,
+        )
+        self._process_lock = ProcessLock(self.path.with_suffix(".lock"))
+        self._generation = 0
+        other = self.path if snapshot_format == "binary" else self.path.with_suffix(".snap")
+        if _newer(other, snapshot_path):
+            with self._lock, self._process_lock.exclusive():
+                self._convert_snapshot(other)
+        with self._process_lock.shared():
+            self._load()
+
+    # ------------------------------------------------------------------
+    def _load(self, journal: Optional[MemoryJournal] = None) -> None:
+        """Replay the snapshot followed by the journal tail.
+
+        Callers must hold the process lock.
+        """
+        journal = journal or self._journal
+        self._generation = self._process_lock.generation()
+        if journal.binary_snapshot():
+            self._load_columns(journal)
+            return
+        snapshot_seq, snapshot, log = journal.replay()
+        memories, seq = entries_from_replay(snapshot_seq, snapshot, log)
+        self._memories = MemoryColumns(memories)
+        self._pinned = {entry.id: entry for entry in memories if entry.pinned}
+        self._seq = seq
+        self._stats = MemoryAggregates(self._stats.window)
+        self._stats.added(entry.category for entry in memories)
+        self._load_index(snapshot_seq)
+
+    def _load_columns(self, journal: MemoryJournal) -> None:
+        """Load a binary snapshot; only pinned rows and the log are decoded."""
+        snapshot_seq, columns, log = journal.replay_columns()
+        tail = [MemoryEntry.from_dict(record) for record in log]
+        columns.extend(tail)
+        self._memories = columns
+        self._pinned = {entry.id: entry for entry in map(columns.entry, columns.pinned_rows())}
+        self._seq = max(snapshot_seq, columns.seq(len(columns) - 1) if len(columns) else 0)
+        self._stats = MemoryAggregates(self._stats.window)
+        recent = range(max(0, len(columns) - self._stats.window), len(columns))
+        self._stats.seed(columns.category_counts(), map(columns.category, recent))
+        self._load_index(snapshot_seq)
+
+    def _convert_snapshot(self, other: Path) -> None:
+        """Adopt a snapshot left in the other format after a format switch.
+
+        Loads it with the journal tail and compacts into the configured
+        format; the old file is then removed so it can never be replayed
+        over a truncated log.  Callers hold ``_lock`` and the exclusive
+        process lock.
+        """
+        if not _newer(other, self._journal.snapshot_path):
+            return  # another process converted it first
+        self._load(MemoryJournal(other, log_path=self._journal.log_path, fsync_interval=0))
+        self._compact()
+        other.unlink()
+        self._generation = self._process_lock.bump()
+        LOGGER.info("Converted %s to a %s snapshot", other.name, self.snapshot_format)
+
+    def _load_index(self, snapshot_seq: int) -> None:
+        """Defer loading the BM25 index until it is first needed.
+
+        Parsing the persisted index is O(snapshot), so startup leaves it on
+        disk; rows added meanwhile are picked up from the columns.
+        """
+        self._index = None
+        self._index_base = snapshot_seq
+        if self._vectors is not None:
+            # Rows missing after a crash (or a new embedder) are re-embedded lazily.
+            self._pending_vectors = self._memories.after(self._vectors.last_seq)
+
+    def _search_index(self) -> SearchIndex:
+        """Return the BM25 index, loading it on first use.
+
+        Reuses the persisted index when it matches the snapshot and adds
+        the rows stored after it.  Callers must hold ``self._lock``.
+        """
+        if self._index is not None:
+            return self._index
+        index = SearchIndex.load(self.index_path)
+        if index is not None and self._index_base and index.seq == self._index_base:
+            start = self._memories.start_after(self._index_base)
+        else:
+            index, start = SearchIndex(), 0
+        for row in range(start, len(self._memories)):
+            index.add(f"m{self._memories.seq(row)}", self._memories.text(row))
+        index.seq = self._seq
+        self._index = index
+        return index
+
+    # ------------------------------------------------------------------
+    def _sync_locked(self) -> None:
+        """Apply other processes' writes if the generation moved.
+
+        Callers must hold ``self._lock``.
+        """
+        if self._process_lock.generation() != self._generation:
+            with self._process_lock.shared():
+                self._catch_up()
+
+    def _catch_up(self) -> None:
+        """Bring memory up to date with disk under a held process lock.
+
+        A replaced snapshot or a shrunken log means another process
+        compacted, so everything is reloaded; otherwise only the journal
+        lines appended since our last read are applied.
+        """
+        generation = self._process_lock.generation()
+        if generation == self._generation:
+            return
+        journal = self._journal
+        if (
+            journal.current_snapshot_signature() != journal.snapshot_signature
+            or journal.log_size() < journal.log_offset
+        ):
+            self._load()
+            return
+        entries = [MemoryEntry.from_dict(record) for record in journal.read_new()]
+        for entry in entries:
+            self._memories.append(entry)
+            if entry.pinned:
+                self._pinned[entry.id] = entry
+            if self._index is not None:
+                self._index.add(entry.id, entry.text)
+            self._seq = max(self._seq, _seq_of(entry))
+        if self._index is not None:
+            self._index.seq = self._seq
+        self._stats.added(entry.category for entry in entries)
+        self._generation = generation
+
+    # ------------------------------------------------------------------
+    def _compact(self) -> None:
+        """Prune to ``max_memories`` and rewrite the snapshot.
+
+        Callers must hold ``self._lock``.
+        """
+        index = self._search_index()
+        overflow = len(self._memories) - self.max_memories
+        if overflow > 0:
+            pruned = self._memories.head(overflow)
+            self._stats.removed(Counter(entry.category for entry in pruned))
+            for entry in pruned:
+                index.remove(entry.id, entry.text)
+                self._pinned.pop(entry.id, None)
+            self._memories.drop_head(overflow)
+        if self._vectors is not None and len(self._memories):
+            self._vectors.prune(self._memories.seq(0))
+            self._vectors.flush()
+        if self.snapshot_format == "binary":
+            self._journal.write_columns_snapshot(self._seq, self._memories)
+        else:
+            self._journal.write_encoded_snapshot(self._seq, self._memories.iter_json())
+        index.seq = self._seq
+        index.save(self.index_path)
+
+    def compact(self) -> None:
+        """Force a compaction of the journal into the snapshot."""
+        with self._lock, self._process_lock.exclusive():
+            self._catch_up()
+            self._compact()
+            self._generation = self._process_lock.bump()
+
+    def close(self) -> None:
+        """Flush pending journal records and embeddings to disk."""
+        self.embed_pending()
+        with self._lock:
+            self._journal.close()
+            if self._vectors is not None:
+                self._vectors.close()
+            self._process_lock.close()
+
+    def add_many(self, records: Iterable[Dict[str, Any]]) -> List[MemoryEntry]:
+        """Store many memories with one lock acquisition and one journal write.
+
+        Each record takes the keyword arguments of :meth:`add` plus an
+        optional ``ts`` (epoch seconds) to preserve original timestamps.
+        """
+
+        now = time.time()
+        prepared = self._prepare(records)
+        if not prepared:
+            return []
+
+        entries: List[MemoryEntry] = []
+        with self._lock, self._process_lock.exclusive():
+            # Sequence numbers must follow whatever other processes wrote.
+            self._catch_up()
+            for text, category, record in prepared:
+                self._seq += 1
+                entry = MemoryEntry(
+                    text=text,
+                    category=category,
+                    id=f"m{self._seq}",
+                    ts=float(record.get("ts") or now),
+                    pinned=bool(record.get("pinned", False)),
+                    role=record.get("role") or "note",
+                    source=record.get("source") or "pepper",
+                    conv_id=record.get("conv_id"),
+                )
+                entries.append(entry)
+                self._memories.append(entry)
+                if entry.pinned:
+                    self._pinned[entry.id] = entry
+                if self._index is not None:
+                    self._index.add(entry.id, entry.text)
+            self._journal.append_many(
+                [{"seq": _seq_of(entry), **entry.to_dict()} for entry in entries]
+            )
+            if self._index is not None:
+                self._index.seq = self._seq
+            self._stats.added(entry.category for entry in entries)
+            if self._vectors is not None:
+                self._pending_vectors.extend(entries)
+            if self._journal.pending_records >= self.compact_every:
+                self._compact()
+            self._generation = self._process_lock.bump()
+            flush_vectors = len(self._pending_vectors) >= self.embed_batch
+        if flush_vectors:
+            self.embed_pending()
+        return entries
+
+    # ------------------------------------------------------------------
+    def _entries_by_seq(self, seqs: List[int]) -> Dict[int, MemoryEntry]:
+        with self._lock:
+            self._sync_locked()
+            found = ((seq, self._memories.get(seq)) for seq in seqs)
+            return {seq: entry for seq, entry in found if entry is not None}
+
+    # ------------------------------------------------------------------
+    def list(self, limit: int = 15) -> List[MemoryEntry]:
+        """Return the last *limit* memories."""
+        limit = min(limit, self.max_memories)
+        with self._lock:
+            self._sync_locked()
+            return self._memories.tail(limit)
+
+    def list_json(self, limit: int = 15) -> bytes:
+        """Serialise the last *limit* memories straight from the columns."""
+        limit = min(limit, self.max_memories)
+        with self._lock:
+            self._sync_locked()
+            return self._memories.tail_json(limit)
+
+    def since(self, seq: int, limit: int = 50) -> List[MemoryEntry]:
+        """Return up to *limit* of the newest memories stored after *seq*."""
+        with self._lock:
+            self._sync_locked()
+            return self._memories.after(seq, limit)
+
+    def snapshot_columns(self) -> Tuple[int, MemoryColumns]:
+        """Copy the columns under the lock; no entry objects are built."""
+        with self._lock:
+            self._sync_locked()
+            seq = self._seq
+            meta, buffers = self._memories.to_buffers()
+        return seq, MemoryColumns.from_buffers(meta, buffers)
+
+    def generation(self) -> int:
+        """Return the shared on-disk generation counter."""
+        with self._lock:
+            return self._process_lock.generation()
+
+    # ------------------------------------------------------------------
+    def get(self, entry_id: str) -> Optional[MemoryEntry]:
+        """Return the memory stored under *entry_id*, if any."""
+        if not entry_id[1:].isdigit():
+            return None
+        with self._lock:
+            self._sync_locked()
+            return self._memories.get(int(entry_id[1:]))
+
+    # ------------------------------------------------------------------
+    def pinned(self) -> List[MemoryEntry]:
+        """Return all pinned memories, oldest first."""
+        with self._lock:
+            self._sync_locked()
+            return list(self._pinned.values())
+
+    def _recent_candidates(self, k: int) -> List[MemoryEntry]:
+        with self._lock:
+            self._sync_locked()
+            # Indexes only the rows added since the last ranking.
+            self._recency.sync(self._memories)
+            found = (self._memories.get(seq) for seq in self._recency.newest(k))
+            return [entry for entry in found if entry is not None]
+
+    # ------------------------------------------------------------------
+    def search(self, query: str, k: int = 6) -> List[Tuple[MemoryEntry, float]]:
+        """Return the *k* memories most relevant to *query* with BM25 scores."""
+        with self._lock:
+            self._sync_locked()
+            hits = self._search_index().search(query, k)
+            found = ((self._memories.get(int(doc_id[1:])), score) for doc_id, score in hits)
+            return [(entry, score) for entry, score in found if entry is not None]
+
+
+def auto_categorise(text: str) -> str:
+    """Module-level categoriser (default keywords) so worker processes can use it."""
+
+    return _DEFAULT_CATEGORISER.categorise(text)
+
+
+def make_memory_store(config: Any, path: Path = DEFAULT_MEMORY_PATH) -> BaseMemoryStore:
+    """Open the back-end selected by the ``memory_backend`` config key.
+
+    ``"json"`` (the default) keeps the snapshot + journal files at *path*,
+    with a binary snapshot next to it when ``memory_snapshot`` is
+    ``"binary"``.  ``"sqlite"`` opens ``memory_db_path`` (default: *path*
+    with a ``.db`` suffix) and imports the JSON back-end's memories the
+    first time it is used.
+    """
+
+    options = {
+        "max_memories": int(config.get("max_memories", DEFAULT_MAX_MEMORIES)),
+        "compact_every": int(config.get("memory_compact_every", DEFAULT_COMPACT_EVERY)),
+        "embedder": make_embedder(config),
+        "bias_window": int(config.get("bias_window", DEFAULT_BIAS_WINDOW)),
+        "categoriser": make_categoriser(config),
+    }
+    backend = str(config.get("memory_backend") or "json").lower()
+    if backend == "json":
+        return MemoryStore(path, snapshot_format=str(config.get("memory_snapshot") or "json"), **options)
+    if backend != "sqlite":
+        raise ValueError(f"Unknown memory_backend: {backend}")
+
+    from .sqlite_store import SqliteMemoryStore  # imports this module
+
+    db_path = config.get("memory_db_path")
+    store = SqliteMemoryStore(
+        Path(db_path).expanduser() if db_path else path.with_suffix(".db"), **options
+    )
+    snap_path = path.with_suffix(".snap")
+    store.import_json(snap_path if _newer(snap_path, path) else path)
+    return store
+
+
+def entries_from_replay(
+    snapshot_seq: int, snapshot: List[Dict[str, Any]], log: List[Dict[str, Any]]
+) -> Tuple[List[MemoryEntry], int]:
+    """Rebuild entries from :meth:`MemoryJournal.replay` output.
+
+    Returns the entries in insertion order and the highest sequence number.
+    """
+
+    memories: List[MemoryEntry] = []
+    seq = 0
+    for item in snapshot:
+        entry = MemoryEntry.from_dict(item)
+        seq += 1
+        if not entry.id:
+            # Legacy snapshots predate ids; number them in file order.
+            entry.id = f"m{seq}"
+        memories.append(entry)
+    seq = max(seq, snapshot_seq)
+    for record in log:
+        seq = max(seq, int(record.get("seq", 0)))
+        memories.append(MemoryEntry.from_dict(record))
+    return memories, seq
+
+
+def _newer(path: Path, than: Path) -> bool:
+    """True if *path* exists and *than* is missing or older."""
+    try:
+        mtime = path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return False
+    try:
+        return mtime > than.stat().st_mtime_ns
+    except FileNotFoundError:
+        return True
+
+
+def _seq_of(entry: MemoryEntry) -> int:
+    """Return the journal sequence number encoded in an entry id."""
+    return int(entry.id[1:])
+
+
+__all__ = [
+    "BaseMemoryStore",
+    "MemoryAggregates",
+    "MemoryEntry",
+    "MemoryStore",
+    "CATEGORY_WEIGHTS",
+    "DEFAULT_MEMORY_PATH",
+    "auto_categorise",
+    "entries_from_replay",
+    "make_memory_store",
+]
@@ -0,0 +1,246 @@
+"""Hot-path latency histograms and counters with Prometheus text output.
+
+One process-wide :data:`METRICS` registry collects:
+
+* ``pepper_stage_seconds``: per-stage timings (memory retrieval, prompt
+  build, back-end call, time to first token, persist) labelled by
+  back-end and mode;
+* ``pepper_request_seconds``: whole-request latency by route and status;
+* ``pepper_errors_total`` by route and stage (``request`` for failures
+  of the request as a whole) and ``pepper_fallbacks_total``.
+
+A :class:`RequestTrace` is bound to each HTTP request through a context
+variable, so code anywhere below an endpoint can time a stage with
+``with stage("backend"):``.  The trace doubles as the source of the
+optional ``Server-Timing`` response header.
+"""
+from __future__ import annotations
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import threading
+import time
+
+# Upper bounds in seconds; wide enough for a cold local model.
+BUCKETS: Tuple[float, ...] = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _labels(labels: Dict[str, Optional[str]]) -> Labels:
+    return tuple(sorted((key, str(value) if value is not None else "") for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Histogram:
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def merge(self, other: "_Histogram") -> None:
+        for index, value in enumerate(other.counts):
+            self.counts[index] += value
+        self.total += other.total
+        self.count += other.count
+
+    def quantile(self, fraction: float) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket."""
+        if not self.count:
+            return 0.0
+        rank = fraction * self.count
+        seen = 0
+        for index, value in enumerate(self.counts):
+            if seen + value >= rank and value:
+                lower = BUCKETS[index - 1] if index else 0.0
+                upper = BUCKETS[index] if index < len(BUCKETS) else lower * 2
+                return lower + (upper - lower) * (rank - seen) / value
+            seen += value
+        return BUCKETS[-1]
+
+
+class Metrics:
+    """Thread-safe registry of labelled histograms and counters."""
+
+    def __init__(self) -> None:
+        self._histograms: Dict[str, Dict[Labels, _Histogram]] = {}
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._help: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def describe(self, name: str, text: str) -> None:
+        self._help[name] = text
+
+    def observe(self, name: str, seconds: float, **labels: Optional[str]) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = _Histogram()
+            histogram.observe(seconds)
+
+    def inc(self, name: str, amount: float = 1.0, **labels: Optional[str]) -> None:
+        key = _labels(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0.0) + amount
+
+    # ------------------------------------------------------------------
+    def summary(self, name: str, by: str) -> Dict[str, Dict[str, float]]:
+        """Compact ``{label value: {count, avg_ms, p50_ms, p95_ms}}`` for *name*.
+
+        Series are merged over every label except *by*.
+        """
+        merged: Dict[str, _Histogram] = {}
+        with self._lock:
+            for labels, histogram in self._histograms.get(name, {}).items():
+                value = dict(labels).get(by, "")
+                merged.setdefault(value, _Histogram()).merge(histogram)
+        return {
+            value: {
+                "count": histogram.count,
+                "avg_ms": round(1000 * histogram.total / histogram.count, 2),
+                "p50_ms": round(1000 * histogram.quantile(0.50), 2),
+                "p95_ms": round(1000 * histogram.quantile(0.95), 2),
+            }
+            for value, histogram in sorted(merged.items())
+            if histogram.count
+        }
+
+    def render(self, gauges: Optional[Dict[str, Dict[Labels, float]]] = None) -> str:
+        """Prometheus text exposition of every series, plus *gauges*."""
+        lines: List[str] = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                self._header(lines, name, "histogram")
+                for labels, histogram in sorted(series.items()):
+                    cumulative = 0
+                    for bound, value in zip(BUCKETS + (float("inf"),), histogram.counts):
+                        cumulative += value
+                        le = 'le="+Inf"' if bound == float("inf") else f'le="{bound!r}"'
+                        lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {histogram.total!r}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                self._header(lines, name, "counter")
+                for labels, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(labels)} {value!r}")
+        for name, series in sorted((gauges or {}).items()):
+            self._header(lines, name, "gauge")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{name}{_format_labels(labels)} {value!r}")
+        return "\n".join(lines) + "\n"
+
+    def _header(self, lines: List[str], name: str, kind: str) -> None:
+        if name in self._help:
+            lines.append(f"# HELP {name} {self._help[name]}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+METRICS = Metrics()
+METRICS.describe("pepper_stage_seconds", "Time spent in each hot-path stage.")
+METRICS.describe("pepper_request_seconds", "Whole-request latency by route.")
+METRICS.describe("pepper_errors_total", "Requests or stages that raised.")
+METRICS.describe("pepper_fallbacks_total", "Replies served by a fallback path.")
+
+
+# ---------------------------------------------------------------------------
+class RequestTrace:
+    """Stage timings for one request, reported to :data:`METRICS`."""
+
+    def __init__(self, metrics: Metrics = METRICS, scope: Optional[Dict[str, Any]] = None) -> None:
+        self.metrics = metrics
+        self.scope = scope
+        self.backend: Optional[str] = None
+        self.mode: Optional[str] = None
+        self.stages: List[Tuple[str, float]] = []
+
+    def record(self, name: str, seconds: float) -> None:
+        self.stages.append((name, seconds))
+        self.metrics.observe(
+            "pepper_stage_seconds", seconds, stage=name, backend=self.backend or "none", mode=self.mode or "default"
+        )
+
+    @property
+    def route(self) -> str:
+        """Name of the endpoint serving the request; ``other`` before routing."""
+        # Endpoint names keep label cardinality fixed (no ids from the path).
+        return getattr((self.scope or {}).get("endpoint"), "__name__", "other")
+
+    def error(self, stage: str) -> None:
+        """Count a failure of *stage*; every error series has the same labels."""
+        self.metrics.inc("pepper_errors_total", route=self.route, stage=stage)
+
+    def server_timing(self) -> str:
+        """``Server-Timing`` header value, durations in milliseconds."""
+        return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.stages)
+
+
+_TRACE: ContextVar[Optional[RequestTrace]] = ContextVar("pepper_trace", default=None)
+
+
+def begin_trace(scope: Optional[Dict[str, Any]] = None) -> RequestTrace:
+    """Bind a fresh trace for the ASGI request *scope* to the current context."""
+    trace = RequestTrace(scope=scope)
+    _TRACE.set(trace)
+    return trace
+
+
+def current_trace() -> RequestTrace:
+    """The request's trace, or a detached one outside a request."""
+    trace = _TRACE.get()
+    if trace is None:
+        trace = begin_trace()
+    return trace
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Time the ``with`` body as stage *name* of the current request."""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        current_trace().error(name)
+        raise
+    finally:
+        current_trace().record(name, time.perf_counter() - started)
+
+
+def count_fallback(backend: str, reason: str) -> None:
+    METRICS.inc("pepper_fallbacks_total", backend=backend, reason=reason)
+
+
+__all__ = [
+    "BUCKETS",
+    "METRICS",
+    "Metrics",
+    "RequestTrace",
+    "begin_trace",
+    "count_fallback",
+    "current_trace",
+    "stage",
+]
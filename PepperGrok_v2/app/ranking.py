@@ -0,0 +1,154 @@
+"""Hybrid memory ranking: relevance, recency, category weight and pins.
+
+Each candidate scores::
+
+    relevance * r + recency * 0.5 ** (age / half_life) + category * w[cat] + pinned * p
+
+where ``r`` is the query relevance normalised to ``[0, 1]`` and ``p`` is 1
+for pinned memories.  The category and pin terms never change for an
+entry, so they are computed once per ``(category, pinned)`` pair.  Decay
+depends on the clock and is only evaluated for the candidates, when the
+query runs.
+
+Candidates are the top lexical/semantic hits plus the newest *k* entries
+of every category (see :class:`RecencyIndex`).  Within one category the
+non-relevance terms only grow with ``ts``, so no older, non-matching
+entry can outrank those.  The top *k* is taken with :func:`heapq.nlargest`.
+"""
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import heapq
+import math
+
+from .columns import MemoryColumns
+from .entry import MemoryEntry
+
+SECONDS_PER_DAY = 86400.0
+
+
+@dataclass(frozen=True)
+class RankWeights:
+    """Weight of each score component and the recency half-life."""
+
+    relevance: float = 1.0
+    recency: float = 0.5
+    category: float = 0.3
+    pinned: float = 0.5
+    half_life_days: float = 7.0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RankWeights":
+        defaults = cls()
+        return cls(
+            relevance=float(config.get("rank_relevance", defaults.relevance)),
+            recency=float(config.get("rank_recency", defaults.recency)),
+            category=float(config.get("rank_category", defaults.category)),
+            pinned=float(config.get("rank_pinned", defaults.pinned)),
+            half_life_days=float(config.get("rank_half_life_days", defaults.half_life_days)),
+        )
+
+
+@dataclass
+class Ranked:
+    """A ranked memory, with its per-component scores when explained."""
+
+    entry: MemoryEntry
+    score: float
+    explain: Optional[Dict[str, float]] = None
+
+
+def rank(
+    candidates: Iterable[Tuple[MemoryEntry, float]],
+    k: int,
+    weights: RankWeights,
+    category_weights: Dict[str, float],
+    now: float,
+    explain: bool = False,
+) -> List[Ranked]:
+    """Return the *k* best ``(entry, relevance)`` candidates, best first."""
+
+    rate = math.log(2) / max(weights.half_life_days * SECONDS_PER_DAY, 1.0)
+    static: Dict[Tuple[str, bool], float] = {}
+
+    def static_score(entry: MemoryEntry) -> float:
+        key = (entry.category, entry.pinned)
+        value = static.get(key)
+        if value is None:
+            value = static[key] = weights.category * category_weights.get(entry.category, 1.0) + (
+                weights.pinned if entry.pinned else 0.0
+            )
+        return value
+
+    def score(candidate: Tuple[MemoryEntry, float]) -> float:
+        entry, relevance = candidate
+        decay = math.exp(-rate * max(0.0, now - entry.ts))
+        return static_score(entry) + weights.relevance * relevance + weights.recency * decay
+
+    ranked = []
+    for candidate in heapq.nlargest(k, candidates, key=score):
+        entry, relevance = candidate
+        detail = None
+        if explain:
+            age = max(0.0, now - entry.ts)
+            detail = {
+                "relevance": round(weights.relevance * relevance, 4),
+                "recency": round(weights.recency * math.exp(-rate * age), 4),
+                "category": round(weights.category * category_weights.get(entry.category, 1.0), 4),
+                "pinned": weights.pinned if entry.pinned else 0.0,
+                "age_days": round(age / SECONDS_PER_DAY, 2),
+            }
+        ranked.append(Ranked(entry, round(score(candidate), 4), detail))
+    return ranked
+
+
+class RecencyIndex:
+    """Per-category ``(ts, seq)`` arrays kept in timestamp order.
+
+    Fed incrementally from a :class:`~app.columns.MemoryColumns`: only
+    rows appended since the last :meth:`sync` are indexed, and it is
+    rebuilt when the columns were replaced or pruned.
+    """
+
+    def __init__(self) -> None:
+        self._reset(None)
+
+    def _reset(self, columns: Optional[MemoryColumns]) -> None:
+        self._groups: Dict[str, Tuple[array, array]] = {}
+        self._source = columns
+        self._first = columns.seq(0) if columns is not None and len(columns) else 0
+        self._last = 0
+
+    def sync(self, columns: MemoryColumns) -> None:
+        if not len(columns):
+            self._reset(None)
+            return
+        if columns is not self._source or columns.seq(0) != self._first:
+            self._reset(columns)
+        for index in range(columns.start_after(self._last), len(columns)):
+            self._add(columns.category(index), columns.ts(index), columns.seq(index))
+        self._last = columns.seq(len(columns) - 1)
+
+    def _add(self, category: str, ts: float, seq: int) -> None:
+        group = self._groups.get(category)
+        if group is None:
+            group = self._groups[category] = (array("d"), array("q"))
+        stamps, seqs = group
+        if not stamps or ts >= stamps[-1]:
+            stamps.append(ts)
+            seqs.append(seq)
+        else:  # imported memories can arrive out of time order
+            position = bisect_right(stamps, ts)
+            stamps.insert(position, ts)
+            seqs.insert(position, seq)
+
+    def newest(self, k: int) -> Iterator[int]:
+        """Yield the seqs of the newest *k* memories of every category."""
+        for _, seqs in self._groups.values():
+            yield from seqs[-k:]
+
+
+__all__ = ["RankWeights", "Ranked", "RecencyIndex", "rank"]
@@ -0,0 +1,170 @@
+"""Request coalescing and bounded concurrency in front of the back-ends.
+
+Identical prompts that arrive while one is already in flight share a
+single back-end call.  That call runs in its own task, owned by every
+request waiting on it: a client that disconnects only stops waiting, and
+the call is cancelled once nobody is left.  Each back-end gets its own lane with a concurrency
+limit (a local Ollama model thrashes under parallel load, Grok does not)
+and a bounded wait queue; requests that cannot get a slot before their
+deadline are rejected with :class:`SchedulerBusy`.
+"""
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Optional, TypeVar
+import asyncio
+import time
+
+T = TypeVar("T")
+
+
+class SchedulerBusy(Exception):
+    """Raised when a lane's queue is full or the wait deadline passed."""
+
+    def __init__(self, backend: str, reason: str) -> None:
+        super().__init__(f"{backend} back-end busy: {reason}")
+        self.backend = backend
+        self.reason = reason
+
+
+class _Shared:
+    """One in-flight back-end call and the number of requests awaiting it."""
+
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: "asyncio.Task[Any]") -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class _Lane:
+    """Concurrency limit, queue bound and counters for one back-end."""
+
+    def __init__(self, limit: int, max_queue: int) -> None:
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.semaphore = asyncio.Semaphore(self.limit)
+        self.active = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        waited = self.completed + self.timeouts
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "wait_avg_ms": round(1000 * self.wait_total / waited, 2) if waited else 0.0,
+            "wait_max_ms": round(1000 * self.wait_max, 2),
+        }
+
+
+class BackendScheduler:
+    """Coalesces duplicate requests and bounds per-back-end concurrency."""
+
+    def __init__(
+        self,
+        limits: Dict[str, int],
+        max_queue: int = 32,
+        queue_timeout: float = 30.0,
+    ) -> None:
+        self.queue_timeout = queue_timeout
+        self.coalesced = 0
+        self._max_queue = max_queue
+        self._lanes: Dict[str, _Lane] = {
+            name: _Lane(limit, max_queue) for name, limit in limits.items()
+        }
+        self._inflight: Dict[str, _Shared] = {}
+
+    def _lane(self, backend: str) -> _Lane:
+        lane = self._lanes.get(backend)
+        if lane is None:
+            lane = self._lanes[backend] = _Lane(1, self._max_queue)
+        return lane
+
+    # ------------------------------------------------------------------
+    @asynccontextmanager
+    async def slot(self, backend: str, timeout: Optional[float] = None) -> AsyncIterator[None]:
+        """Hold one of *backend*'s concurrency slots for the ``with`` body."""
+
+        lane = self._lane(backend)
+        queued = lane.waiting - max(0, lane.limit - lane.active)
+        if queued >= lane.max_queue:
+            lane.rejected += 1
+            raise SchedulerBusy(backend, "queue full")
+        lane.waiting += 1
+        started = time.monotonic()
+        try:
+            await asyncio.wait_for(lane.semaphore.acquire(), timeout or self.queue_timeout)
+        except asyncio.TimeoutError:
+            lane.timeouts += 1
+            raise SchedulerBusy(backend, "queue deadline exceeded") from None
+        finally:
+            lane.waiting -= 1
+            waited = time.monotonic() - started
+            lane.wait_total += waited
+            lane.wait_max = max(lane.wait_max, waited)
+        lane.active += 1
+        try:
+            yield
+        finally:
+            lane.active -= 1
+            lane.completed += 1
+            lane.semaphore.release()
+
+    async def run(
+        self,
+        backend: str,
+        key: str,
+        call: Callable[[], Awaitable[T]],
+        timeout: Optional[float] = None,
+    ) -> T:
+        """Run *call* on *backend*, sharing the result with duplicate *key*s.
+
+        Cancelling one caller (e.g. a client disconnect) never cancels the
+        others; the call itself is cancelled when its last caller goes.
+        """
+
+        shared = self._inflight.get(key)
+        if shared is None:
+            shared = _Shared(asyncio.get_running_loop().create_task(self._call(backend, call, timeout)))
+            self._inflight[key] = shared
+            shared.task.add_done_callback(lambda done: self._finished(key, shared))
+        else:
+            self.coalesced += 1
+        shared.waiters += 1
+        try:
+            return await asyncio.shield(shared.task)
+        finally:
+            shared.waiters -= 1
+            if not shared.waiters and not shared.task.done():
+                shared.task.cancel()
+
+    async def _call(self, backend: str, call: Callable[[], Awaitable[T]], timeout: Optional[float]) -> T:
+        async with self.slot(backend, timeout):
+            return await call()
+
+    def _finished(self, key: str, shared: _Shared) -> None:
+        if self._inflight.get(key) is shared:
+            del self._inflight[key]
+        # Mark exceptions as retrieved even when every caller has gone.
+        if not shared.task.cancelled():
+            shared.task.exception()
+
+    def stats(self) -> Dict[str, Any]:
+        """Queue depth, wait times and counters per back-end."""
+        return {
+            "coalesced": self.coalesced,
+            "inflight": len(self._inflight),
+            "backends": {name: lane.stats() for name, lane in self._lanes.items()},
+        }
+
+
+__all__ = ["BackendScheduler", "SchedulerBusy"]
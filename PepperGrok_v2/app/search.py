@@ -0,0 +1,160 @@
+"""Incremental BM25 search index over Pepper memories.
+
+The index is an in-process inverted index (term -> postings) that the
+:class:`~app.memory.MemoryStore` updates on every add and prune.  It is
+saved next to the memory snapshot during compaction so a restart only has
+to replay the journal tail instead of re-tokenising every memory.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import heapq
+import json
+import logging
+import math
+import os
+import re
+
+LOGGER = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+
+# Word runs and single punctuation marks, roughly how BPE tokenisers split.
+_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+# Very common words carry no ranking signal and bloat the postings.
+_STOPWORDS = frozenset(
+    "a an and are as at be but by for from has have i in is it its me my "
+    "of on or so that the this to was we were with you your".split()
+)
+
+# Format marker for the persisted index file.
+INDEX_VERSION = 1
+
+
+def tokenize(text: str) -> List[str]:
+    """Lower-case *text* and split it into index terms."""
+    return [token for token in _TOKEN_RE.findall(text.lower()) if token not in _STOPWORDS]
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local LLM token estimate.
+
+    Short words and punctuation count as one token; longer words as
+    roughly one token per four characters.
+    """
+    total = 0
+    for piece in _PIECE_RE.findall(text):
+        total += 1 if len(piece) <= 4 else (len(piece) + 3) // 4
+    return total
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut *text* at the last whole piece fitting within *max_tokens*."""
+    used = 0
+    end = 0
+    for match in _PIECE_RE.finditer(text):
+        piece = match.group()
+        cost = 1 if len(piece) <= 4 else (len(piece) + 3) // 4
+        if used + cost > max_tokens:
+            return text[:end].rstrip()
+        used += cost
+        end = match.end()
+    return text
+
+
+class SearchIndex:
+    """Okapi BM25 inverted index keyed by memory id."""
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.seq = 0
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._lengths: Dict[str, int] = {}
+        self._total_length = 0
+
+    def __len__(self) -> int:
+        return len(self._lengths)
+
+    # ------------------------------------------------------------------
+    def add(self, doc_id: str, text: str) -> None:
+        """Index *text* under *doc_id*."""
+        terms = tokenize(text)
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[doc_id] = tf
+        self._lengths[doc_id] = len(terms)
+        self._total_length += len(terms)
+
+    def remove(self, doc_id: str, text: str) -> None:
+        """Drop *doc_id*; *text* is needed to find its postings."""
+        length = self._lengths.pop(doc_id, None)
+        if length is None:
+            return
+        self._total_length -= length
+        for term in set(tokenize(text)):
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+
+    # ------------------------------------------------------------------
+    def search(self, query: str, k: int = 6) -> List[Tuple[str, float]]:
+        """Return up to *k* ``(doc_id, score)`` pairs, best first."""
+        n_docs = len(self._lengths)
+        if not n_docs or k <= 0:
+            return []
+        avg_length = self._total_length / n_docs or 1.0
+        scores: Dict[str, float] = {}
+        for term in set(tokenize(query)):
+            postings = self._postings.get(term)
+            if not postings:
+                continue
+            df = len(postings)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_id, tf in postings.items():
+                norm = self.k1 * (1.0 - self.b + self.b * self._lengths[doc_id] / avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * tf * (self.k1 + 1.0) / (tf + norm)
+        return heapq.nlargest(k, scores.items(), key=lambda item: item[1])
+
+    # ------------------------------------------------------------------
+    def save(self, path: Path) -> None:
+        """Atomically persist the index to *path*."""
+        payload: Dict[str, Any] = {
+            "version": INDEX_VERSION,
+            "seq": self.seq,
+            "lengths": self._lengths,
+            "postings": self._postings,
+        }
+        tmp_path = Path(path).with_name(Path(path).name + ".tmp")
+        tmp_path.write_text(json.dumps(payload, separators=(",", ":")), encoding="utf-8")
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["SearchIndex"]:
+        """Load a persisted index, or ``None`` if missing or unreadable."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            data = json.loads(path.read_text("utf-8"))
+        except (OSError, json.JSONDecodeError):
+            LOGGER.warning("Failed to read search index %s; rebuilding", path)
+            return None
+        if not isinstance(data, dict) or data.get("version") != INDEX_VERSION:
+            return None
+        index = cls()
+        index.seq = int(data.get("seq", 0))
+        index._lengths = {str(key): int(value) for key, value in data.get("lengths", {}).items()}
+        index._postings = data.get("postings", {})
+        index._total_length = sum(index._lengths.values())
+        return index
+
+
+__all__ = ["SearchIndex", "estimate_tokens", "tokenize", "trim_to_tokens"]
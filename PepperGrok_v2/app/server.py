@@ -1,19 +1,47 @@
 """FastAPI application powering PepperGrok v2."""
 from __future__ import annotations
 
+import asyncio
+import json
 import logging
+import threading
+import time
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 
-from .bridge import BridgeConfig, route_prompt
+from .augment import EXCLUDED_CATEGORIES, Augmentation
+from .bridge import (
+    PLACEHOLDER_REPLIES,
+    BridgeConfig,
+    StreamInterrupted,
+    adispatch_prompt,
+    astream_prompt,
+    backend_model,
+    build_augmentation,
+    probe_backends,
+    uses_local,
+    warm_local_model,
+)
+from .cache import ResponseCache, cache_key
+from .clients import Prompt
+from .scheduler import BackendScheduler, SchedulerBusy
+from .clients import aclose_clients
 from .heartbeat import Heartbeat
-from .memory import MemoryStore
-from .voice import speak_text
+from .lazy import Lazy
+from .logsink import LogSink
+from .metrics import METRICS, RequestTrace, begin_trace, current_trace, stage
+from .memory import BaseMemoryStore, MemoryEntry, make_memory_store
+from .ranking import RankWeights
+from .search import estimate_tokens, trim_to_tokens
+from .sessions import Session, SessionStore
+from .skills import DEFAULT_SKILL_ROOT, SKILLS, SkillBusy, SkillEngine, SkillError
+from .voice import DEFAULT_VOICE_CACHE, PRIORITIES, VoiceQueueFull, VoiceWorker, start_worker
 
 LOGGER = logging.getLogger(__name__)
 logging.basicConfig(level=logging.INFO)
@@ -23,13 +51,96 @@ CONFIG_PATH = APP_DIR / "config.json"
 HEARTBEAT_LOG = APP_DIR.parent / "logs" / "heartbeat.log"
 
 config = BridgeConfig(CONFIG_PATH)
-memory_store = MemoryStore(max_memories=config.get("max_memories", 5000))
+memory_store: Lazy[BaseMemoryStore] = Lazy(lambda: make_memory_store(config), "memory store")
+skill_engine: Lazy[SkillEngine] = Lazy(
+    lambda: SkillEngine(
+        root=Path(config.get("skill_root") or DEFAULT_SKILL_ROOT).expanduser(),
+        workers=int(config.get("skill_workers", 2)),
+        max_output=int(config.get("skill_max_output", 65536)),
+    ),
+    "skills",
+)
+rank_weights = RankWeights.from_config(config)
+response_cache: Optional[ResponseCache] = None
+if config.get("response_cache", False):
+    cache_path = config.get("response_cache_path")
+    response_cache = ResponseCache(
+        max_items=int(config.get("response_cache_size", 256)),
+        ttl_seconds=float(config.get("response_cache_ttl", 3600)),
+        path=Path(cache_path).expanduser() if cache_path else None,
+    )
+scheduler = BackendScheduler(
+    limits={
+        "ollama": int(config.get("ollama_concurrency", 1)),
+        "grok": int(config.get("grok_concurrency", 8)),
+    },
+    max_queue=int(config.get("scheduler_max_queue", 32)),
+    queue_timeout=float(config.get("scheduler_queue_timeout", 30.0)),
+)
+sessions = SessionStore(
+    summarize=lambda messages: _summarize(messages),
+    max_sessions=int(config.get("max_sessions", 256)),
+    keep_turns=int(config.get("session_turns", 6)),
+    fold_batch=int(config.get("session_fold_batch", 4)),
+    summary_tokens=int(config.get("session_summary_tokens", 250)),
+)
+# Background threads are started by the lifespan hook, not at import.
+event_log: Optional[LogSink] = None
 heartbeat: Optional[Heartbeat] = None
-if config.get("heartbeat_enabled", True):
-    heartbeat = Heartbeat(HEARTBEAT_LOG)
-    heartbeat.start()
-
-app = FastAPI(title="PepperGrok v2")
+voice: Optional[VoiceWorker] = None
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Start background workers and warm slow subsystems without blocking startup."""
+
+    global event_log, heartbeat, voice
+    if config.get("heartbeat_enabled", True):
+        event_log = LogSink(
+            HEARTBEAT_LOG,
+            max_bytes=int(config.get("log_max_bytes", 5_000_000)),
+            max_age=float(config.get("log_max_age", 86400)),
+            backups=int(config.get("log_backups", 7)),
+        )
+        heartbeat = Heartbeat(
+            event_log,
+            interval_seconds=float(config.get("heartbeat_interval", 3600)),
+            probe=lambda: probe_backends(config),
+            probe_interval=float(config.get("probe_interval", 60.0)),
+        )
+        heartbeat.start()
+    if config.get("voice_enabled", False):
+        voice_cache = config.get("voice_cache_dir")
+        voice = start_worker(
+            max_queue=int(config.get("voice_queue_size", 16)),
+            cache_dir=Path(voice_cache).expanduser() if voice_cache else DEFAULT_VOICE_CACHE,
+            cache_phrases=config.get("voice_cache_phrases", []),
+            rate=config.get("voice_rate"),
+        )
+    memory_store.warm()
+    # Load the local model in the background so the first prompt is warm.
+    threading.Thread(target=warm_local_model, args=(config,), daemon=True).start()
+    yield
+    if heartbeat:
+        heartbeat.stop()
+        heartbeat.join(timeout=1.0)
+    if event_log:
+        event_log.close()
+    if voice:
+        voice.stop()
+    store = memory_store.peek()
+    if store is not None:
+        store.close()
+    engine = skill_engine.peek()
+    if engine is not None:
+        engine.close()
+    if response_cache:
+        response_cache.close()
+    await sessions.aclose()
+    await aclose_clients()
+
+
+app = FastAPI(title="PepperGrok v2", lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -38,69 +149,525 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+
+@app.middleware("http")
+async def trace_requests(request: Request, call_next: Any) -> Response:
+    """Time every request and optionally expose its stages as ``Server-Timing``."""
+
+    trace = begin_trace(request.scope)
+    started = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        trace.error("request")
+        raise
+    elapsed = time.perf_counter() - started
+    METRICS.observe("pepper_request_seconds", elapsed, route=trace.route, status=str(response.status_code))
+    if response.status_code >= 500:
+        trace.error("request")
+    if config.get("server_timing", False):
+        timing = trace.server_timing()
+        response.headers["Server-Timing"] = f"{timing + ', ' if timing else ''}total;dur={elapsed * 1000:.1f}"
+    return response
+
+
 static_dir = APP_DIR / "ui"
 if static_dir.exists():
     app.mount("/ui", StaticFiles(directory=static_dir), name="ui")
 
 
 @app.get("/status")
-def status() -> Dict[str, str]:
-    """Return system status details."""
+def status() -> Dict[str, Any]:
+    """Return system status details.
 
+    Never waits for the memory store: while it is still loading,
+    ``ready`` is false and ``memories`` is null.
+    """
+
+    store = memory_store.peek()
     return {
         "grok_online": bool(config.get("grok_online", True)),
         "heartbeat": "running" if heartbeat and heartbeat.is_alive() else "stopped",
-        "memories": len(memory_store.list(limit=config.get("max_memories", 5000))),
+        "ready": memory_store.ready,
+        "memories": store.count() if store else None,
+        "cache": response_cache.stats() if response_cache else None,
+        "scheduler": scheduler.stats(),
+        "voice": voice.stats() if voice else None,
+        "sessions": sessions.stats(),
+        "backends": heartbeat.probes() if heartbeat else None,
+        "latency": METRICS.summary("pepper_stage_seconds", by="stage"),
     }
 
 
+@app.get("/metrics")
+def metrics() -> PlainTextResponse:
+    """Latency histograms, error and fallback counters in Prometheus text format."""
+
+    gauges: Dict[str, Dict[Any, float]] = {}
+    store = memory_store.peek()
+    if store is not None:
+        gauges["pepper_memories"] = {(): float(store.count())}
+    lanes = scheduler.stats()["backends"]
+    gauges["pepper_backend_active"] = {(("backend", name),): float(lane["active"]) for name, lane in lanes.items()}
+    gauges["pepper_backend_queued"] = {(("backend", name),): float(lane["queued"]) for name, lane in lanes.items()}
+    probed = heartbeat.probes().get("backends", {}) if heartbeat else {}
+    if probed:
+        gauges["pepper_backend_up"] = {(("backend", name),): float(bool(probe.get("up"))) for name, probe in probed.items()}
+        gauges["pepper_backend_probe_ms"] = {
+            (("backend", name),): float(probe["latency_ms"]) for name, probe in probed.items() if "latency_ms" in probe
+        }
+    return PlainTextResponse(METRICS.render(gauges), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/logs")
+def logs(limit: int = 50, since: Optional[float] = None, until: Optional[float] = None) -> Dict[str, Any]:
+    """Recent heartbeat/probe events: the last *limit*, or those in ``[since, until]``."""
+
+    if event_log is None:
+        raise HTTPException(status_code=404, detail="Heartbeat log disabled")
+    limit = max(1, min(limit, 1000))
+    if since is not None:
+        events = event_log.between(since, until, limit=limit)
+    else:
+        events = event_log.tail(limit)
+    return {"events": events, "log": event_log.stats()}
+
+
 @app.get("/memories")
-def list_memories(limit: int = 15) -> Dict[str, List[Dict[str, str]]]:
+def list_memories(limit: int = 15) -> Response:
     """Return the last *limit* memories."""
 
-    memories = memory_store.list(limit=limit)
-    return {
-        "memories": [entry.to_dict() for entry in memories],
-        "emotional_bias": memory_store.emotional_bias(memories),
-    }
+    store = memory_store.get()
+    # The default page is exactly the running bias window: no recount needed.
+    if limit == int(config.get("bias_window", 15)):
+        bias = store.emotional_bias()
+    else:
+        bias = store.emotional_bias(store.list(limit=limit))
+    # Rows are serialised by the store (straight from its column buffers
+    # for the JSON back-end) and spliced into the response unparsed.
+    body = b'{"memories":%s,"emotional_bias":%s}' % (
+        store.list_json(limit=limit),
+        json.dumps(bias).encode("ascii"),
+    )
+    return Response(content=body, media_type="application/json")
+
+
+@app.get("/stats")
+def stats() -> Dict[str, Any]:
+    """Constant-time memory aggregates for frequent polling."""
+
+    return memory_store.get().stats()
 
 
 @app.post("/remember")
-def remember(payload: Dict[str, str]) -> Dict[str, str]:
+def remember(payload: Dict[str, Any]) -> Dict[str, Any]:
     """Store a new memory entry."""
 
     text = payload.get("text")
     if not text:
         raise HTTPException(status_code=400, detail="'text' is required")
     category = payload.get("category")
-    entry = memory_store.add(text=text, category=category)
-    return {"status": "ok", "category": entry.category}
+    with stage("persist"):
+        entry = memory_store.get().add(text=text, category=category, pinned=bool(payload.get("pinned")))
+    return {"status": "ok", "category": entry.category, "id": entry.id, "pinned": entry.pinned}
+
+
+def relevant_memories(user_prompt: str, k: int = 6) -> List[MemoryEntry]:
+    """Return the top *k* memories by hybrid rank.
+
+    Relevance to *user_prompt*, recency, category weight and pins are
+    blended, so recent memories still surface when nothing matches.
+    Pinned memories are always candidates, and the augmentation stage
+    puts them first.
+    """
+
+    ranked = memory_store.get().rank(user_prompt, k=k, weights=rank_weights)
+    return [item.entry for item in ranked]
+
+
+@app.post("/search")
+def search(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Return the top-K memories for a query within a token budget.
+
+    Matches are ordered by hybrid rank; ``"explain": true`` adds each
+    item's per-component scores.
+    """
+
+    query_text = payload.get("query")
+    if not query_text:
+        raise HTTPException(status_code=400, detail="'query' is required")
+    k = _bounded_int(payload, "k", 6, 1, 24)
+    max_tokens = _bounded_int(payload, "max_tokens", 600, 60, 1200)
+    explain = bool(payload.get("explain", False))
+
+    items: List[Dict[str, Any]] = []
+    categories: Dict[str, int] = {}
+    used = 0
+    with stage("retrieve"):
+        ranked = memory_store.get().rank(query_text, k=k, weights=rank_weights, explain=explain, relevant_only=True)
+    for item in ranked:
+        entry = item.entry
+        if entry.category in EXCLUDED_CATEGORIES:
+            continue
+        text = trim_to_tokens(entry.text, 120)
+        tokens = estimate_tokens(text)
+        if used + tokens > max_tokens:
+            break
+        used += tokens
+        categories[entry.category] = categories.get(entry.category, 0) + tokens
+        items.append(
+            {
+                "id": entry.id,
+                "category": entry.category,
+                "score": item.score,
+                "text": text,
+                "pinned": entry.pinned,
+                "ts": entry.ts,
+            }
+        )
+        if explain:
+            items[-1]["explain"] = item.explain
+    return {"query": query_text, "k": k, "tokens": used, "items": items, "categories": categories}
 
 
 @app.post("/query")
-def query(payload: Dict[str, str]) -> Dict[str, str]:
+async def query(payload: Dict[str, str]) -> Dict[str, Any]:
     """Route the prompt to Grok or Ollama based on the current mode."""
 
     user_prompt = payload.get("prompt")
     if not user_prompt:
         raise HTTPException(status_code=400, detail="'prompt' is required")
     mode = payload.get("mode")
-    memories = memory_store.list(limit=15)
-    reply = route_prompt(user_prompt, config, memories, mode=mode)
-    return {"response": reply}
+    session = sessions.get(payload["session"]) if payload.get("session") else None
+    _trace(mode)
+    augmentation, prompt = await asyncio.to_thread(_prepare_prompt, user_prompt, session)
+    key = _cache_key(user_prompt, augmentation.summary()["ids"], mode, prompt)
+    # A session reply depends on the conversation so far: never cached.
+    reply = response_cache.get(key) if response_cache and session is None else None
+    cached = reply is not None
+    if reply is None:
+        try:
+            with stage("backend"):
+                reply = await scheduler.run(
+                    _backend(mode),
+                    key,
+                    lambda: adispatch_prompt(prompt, config, mode=mode),
+                )
+        except SchedulerBusy as exc:
+            raise _busy(exc) from None
+        if reply not in PLACEHOLDER_REPLIES and (session is not None or response_cache):
+            with stage("persist"):
+                if session is not None:
+                    sessions.record(session, user_prompt, reply)
+                elif response_cache:
+                    response_cache.put(key, reply)
+    result = {"response": reply, "augmentation": augmentation.summary(), "cached": cached}
+    if session is not None:
+        result["session"] = session.stats()
+    return result
+
+
+def _prepare_prompt(user_prompt: str, session: Optional[Session]) -> Tuple[Augmentation, Prompt]:
+    """Retrieve memories and build the prompt for one turn.
+
+    Blocking: it may wait for the store to load, for its file lock or for a
+    query embedding, so async endpoints run it in a worker thread.
+    """
+
+    with stage("retrieve"):
+        memories = relevant_memories(user_prompt, k=int(config.get("augment_k", 6)))
+    with stage("prompt"):
+        augmentation = build_augmentation(user_prompt, memories, config)
+        prompt = _session_prompt(augmentation, session)
+    return augmentation, prompt
+
+
+def _session_prompt(augmentation: Augmentation, session: Optional[Session]) -> Prompt:
+    """The one-shot prompt, or the session's chat messages for this turn."""
+
+    if session is None:
+        return augmentation.prompt
+    return sessions.messages(session, augmentation.system, augmentation.user_message)
+
+
+def _cache_key(user_prompt: str, memory_ids: List[str], mode: Optional[str], prompt: Prompt = "") -> str:
+    if isinstance(prompt, list):
+        # Session turns: keyed on the whole conversation so only identical
+        # in-flight requests coalesce in the scheduler.
+        user_prompt = json.dumps(prompt, ensure_ascii=False)
+    return cache_key(backend_model(config, mode), user_prompt, memory_ids)
+
+
+async def _summarize(messages: List[Dict[str, str]]) -> str:
+    """Fold session turns into a summary on the local model when it is enabled."""
+
+    mode = "local" if config.get("ollama_local", True) else None
+    key = _cache_key("", [], mode, messages)
+    try:
+        reply = await scheduler.run(_backend(mode), key, lambda: adispatch_prompt(messages, config, mode=mode))
+    except SchedulerBusy:
+        return ""
+    return "" if reply in PLACEHOLDER_REPLIES else reply
+
+
+def _backend(mode: Optional[str]) -> str:
+    return "ollama" if uses_local(config, mode) else "grok"
+
+
+def _trace(mode: Optional[str]) -> RequestTrace:
+    """Label the current request's stage timings with its back-end and mode."""
+
+    trace = current_trace()
+    trace.backend = _backend(mode)
+    trace.mode = "local" if mode == "local" else "default"
+    return trace
+
+
+def _bounded_int(payload: Dict[str, Any], name: str, default: int, low: int, high: int) -> int:
+    """``payload[name]`` as an int clamped to ``[low, high]``; 400 when it is not a number."""
+
+    value = payload.get(name, default)
+    try:
+        if isinstance(value, bool):
+            raise TypeError(name)
+        number = int(value)
+    except (TypeError, ValueError, OverflowError):
+        raise HTTPException(status_code=400, detail=f"'{name}' must be an integer") from None
+    return max(low, min(number, high))
+
+
+def _busy(exc: SchedulerBusy) -> HTTPException:
+    return HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "5"})
+
+
+def _sse(data: Dict[str, Any], event: Optional[str] = None) -> str:
+    """Format one Server-Sent Event frame."""
+
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+@app.post("/query/stream")
+async def query_stream(payload: Dict[str, str]) -> StreamingResponse:
+    """Stream the reply as Server-Sent Events while it is generated.
+
+    Emits one ``augmentation`` event, a ``data`` frame per text delta and a
+    final ``done`` event carrying the full reply, or an ``error`` event when
+    the back-end is busy or the connection drops mid-reply.
+    """
+
+    user_prompt = payload.get("prompt")
+    if not user_prompt:
+        raise HTTPException(status_code=400, detail="'prompt' is required")
+    mode = payload.get("mode")
+    session = sessions.get(payload["session"]) if payload.get("session") else None
+    trace = _trace(mode)
+    augmentation, prompt = await asyncio.to_thread(_prepare_prompt, user_prompt, session)
+
+    key = _cache_key(user_prompt, augmentation.summary()["ids"], mode, prompt)
+
+    async def events() -> AsyncIterator[str]:
+        # Runs after the response headers are sent, so these stages reach
+        # /metrics but not Server-Timing.
+        yield _sse(augmentation.summary(), event="augmentation")
+        cached = response_cache.get(key) if response_cache and session is None else None
+        if cached is not None:
+            yield _sse({"delta": cached})
+            yield _sse({"response": cached, "cached": True}, event="done")
+            return
+        parts: List[str] = []
+        started = time.perf_counter()
+        try:
+            async with scheduler.slot(_backend(mode)):
+                async for chunk in astream_prompt(prompt, config, mode=mode):
+                    if not parts:
+                        trace.record("ttft", time.perf_counter() - started)
+                    parts.append(chunk)
+                    yield _sse({"delta": chunk})
+        except SchedulerBusy as exc:
+            trace.error("backend")
+            yield _sse({"detail": str(exc)}, event="error")
+            return
+        except StreamInterrupted:
+            # A truncated reply is neither cached nor added to the session.
+            trace.error("backend")
+            yield _sse({"detail": "connection lost", "partial": "".join(parts)}, event="error")
+            return
+        trace.record("backend", time.perf_counter() - started)
+        reply = "".join(parts)
+        done: Dict[str, Any] = {"response": reply, "cached": False}
+        if reply not in PLACEHOLDER_REPLIES and (session is not None or response_cache):
+            persist_started = time.perf_counter()
+            if session is not None:
+                sessions.record(session, user_prompt, reply)
+                done["session"] = session.stats()
+            elif response_cache:
+                response_cache.put(key, reply)
+            trace.record("persist", time.perf_counter() - persist_started)
+        yield _sse(done, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/memories/stream")
+async def memories_stream(request: Request) -> StreamingResponse:
+    """Push memory changes as Server-Sent Events.
+
+    Sends a ``stats`` event on connect, then a ``memories`` event with the
+    new entries and fresh aggregates whenever the store's generation moves,
+    including writes made by other worker processes or the importer.
+    """
+
+    interval = float(config.get("memory_stream_interval", 1.0))
+
+    async def events() -> AsyncIterator[str]:
+        store = await asyncio.to_thread(memory_store.get)
+        generation = await asyncio.to_thread(store.generation)
+        newest = await asyncio.to_thread(store.list, 1)
+        last_seq = int(newest[-1].id[1:]) if newest else 0
+        yield _sse(await asyncio.to_thread(store.stats), event="stats")
+        idle = 0.0
+        while not await request.is_disconnected():
+            await asyncio.sleep(interval)
+            current = await asyncio.to_thread(store.generation)
+            if current == generation:
+                idle += interval
+                if idle >= 15:
+                    idle = 0.0
+                    yield ": keep-alive\n\n"
+                continue
+            generation, idle = current, 0.0
+            added = await asyncio.to_thread(store.since, last_seq)
+            if added:
+                last_seq = int(added[-1].id[1:])
+            payload = await asyncio.to_thread(store.stats)
+            payload.update(generation=generation, added=[entry.to_dict() for entry in added])
+            yield _sse(payload, event="memories")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.post("/speak")
-def speak(payload: Dict[str, str]) -> Dict[str, str]:
-    """Voice endpoint that uses pyttsx3 when available."""
+def speak(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """Queue text for the voice worker and return its job id at once.
+
+    ``interrupt`` (default true) cuts off whatever is being said, so a new
+    reply barges in; ``priority`` is ``high``, ``normal`` or ``low``.
+    """
 
-    if not config.get("voice_enabled", False):
+    if voice is None or not voice.available:
         return {"status": "disabled"}
     text = payload.get("text")
     if not text:
         raise HTTPException(status_code=400, detail="'text' is required")
-    speak_text(text, voice_id=payload.get("voice_id"))
-    return {"status": "ok"}
+    priority = PRIORITIES.get(str(payload.get("priority", "normal")))
+    if priority is None:
+        raise HTTPException(status_code=400, detail=f"'priority' must be one of {sorted(PRIORITIES)}")
+    try:
+        job = voice.submit(
+            text,
+            voice_id=payload.get("voice_id"),
+            priority=priority,
+            interrupt=bool(payload.get("interrupt", True)),
+            cache=bool(payload.get("cache", False)),
+        )
+    except VoiceQueueFull as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "5"}) from None
+    return {"status": "queued", "job": job.id}
+
+
+@app.get("/speak/{job_id}")
+def speak_status(job_id: str) -> Dict[str, Any]:
+    """Return the state of a speech job."""
+
+    job = voice.job(job_id) if voice else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown speech job")
+    return job.to_dict()
+
+
+@app.delete("/speak/{job_id}")
+def speak_cancel(job_id: str) -> Dict[str, Any]:
+    """Cancel a queued job or cut off the one being spoken."""
+
+    job = voice.cancel(job_id) if voice else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown speech job")
+    return job.to_dict()
+
+
+@app.post("/skill")
+async def skill(payload: Dict[str, Any]) -> Response:
+    """Run a sandboxed file skill (``type: cmd``) or save a note (``type: note``).
+
+    With ``stream: true`` a command's output arrives as ``stdout`` /
+    ``stderr`` Server-Sent Events followed by one ``exit`` event.
+    """
+
+    kind = payload.get("type")
+    if kind == "note":
+        text = payload.get("text")
+        if not text:
+            raise HTTPException(status_code=400, detail="'text' is required")
+        with stage("persist"):
+            entry = await asyncio.to_thread(
+                memory_store.get().add, text=text, category=payload.get("category"), source="skill"
+            )
+        return JSONResponse({"id": entry.id, "ts": entry.ts}, status_code=201)
+    if kind != "cmd":
+        raise HTTPException(status_code=400, detail="'type' must be 'cmd' or 'note'")
+    cmd = payload.get("cmd")
+    if cmd not in SKILLS:
+        raise HTTPException(status_code=400, detail=f"'cmd' must be one of {sorted(SKILLS)}")
+    args = payload.get("args") or []
+    if not isinstance(args, list) or not all(isinstance(arg, str) for arg in args):
+        raise HTTPException(status_code=400, detail="'args' must be a list of strings")
+    timeout = _bounded_int(payload, "timeout_ms", int(config.get("skill_timeout_ms", 8000)), 1000, 60000) / 1000
+    engine = skill_engine.get()
+
+    if not payload.get("stream"):
+        try:
+            with stage("skill"):
+                return JSONResponse(await engine.run(cmd, args, timeout))
+        except SkillBusy as exc:
+            raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"}) from None
+
+    chunks = engine.stream(cmd, args, timeout)
+    try:
+        first = await chunks.__anext__()
+    except SkillBusy as exc:
+        raise HTTPException(status_code=503, detail=str(exc), headers={"Retry-After": "1"}) from None
+    except SkillError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from None
+
+    async def events() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        kind, value = first
+        while True:
+            if kind == "exit":
+                duration_ms = int((time.perf_counter() - started) * 1000)
+                yield _sse({"exit_code": value, "ok": value == 0, "duration_ms": duration_ms}, event="exit")
+                return
+            yield _sse({"text": value}, event=kind)
+            try:
+                kind, value = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 @app.get("/")
@@ -113,14 +680,6 @@ def index() -> FileResponse:
     return FileResponse(ui_index)
 
 
-@app.on_event("shutdown")
-def shutdown_event() -> None:
-    """Ensure background threads are stopped on shutdown."""
-
-    if heartbeat:
-        heartbeat.stop()
-
-
 if __name__ == "__main__":  # pragma: no cover - manual launch helper
     import uvicorn
 
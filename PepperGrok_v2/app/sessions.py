@@ -0,0 +1,157 @@
+"""Multi-turn chat sessions with a rolling summary.
+
+A session keeps its recent exchanges verbatim and sends them as chat
+messages behind a stable prefix: the persona system prompt, then the
+running summary.  Once ``keep_turns + fold_batch`` exchanges have piled
+up, the oldest ``fold_batch`` are merged into the summary by a
+background task, so the recent window never grows past that size.
+
+The prefix therefore only changes when a fold lands, and Ollama serves it
+from the KV cache of the previous turn.  Each turn evaluates just the
+newest exchange and memory context, and that cost stays flat however
+long the conversation runs.
+
+Sessions live in memory, least recently used first out.
+"""
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Set
+import asyncio
+import logging
+import threading
+import time
+
+from .search import estimate_tokens, trim_to_tokens
+
+LOGGER = logging.getLogger(__name__)
+
+SUMMARY_INSTRUCTION = (
+    "You keep a running summary of a conversation between the user and Pepper. "
+    "Merge the new turns into the summary. Keep names, facts, feelings and promises; "
+    "drop small talk. Reply with the summary only, in under {tokens} tokens."
+)
+
+Messages = List[Dict[str, str]]
+Summarizer = Callable[[Messages], Awaitable[str]]
+
+
+@dataclass
+class Session:
+    """One conversation: the summary of folded turns plus the recent ones."""
+
+    id: str
+    summary: str = ""
+    turns: Messages = field(default_factory=list)
+    folded: int = 0
+    folding: bool = False
+    updated: float = field(default_factory=time.time)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "turns": len(self.turns) // 2,
+            "folded": self.folded,
+            "summary_tokens": estimate_tokens(self.summary),
+            "context_tokens": estimate_tokens(self.summary)
+            + sum(estimate_tokens(turn["content"]) for turn in self.turns),
+            "folding": self.folding,
+        }
+
+
+class SessionStore:
+    """LRU map of :class:`Session` objects with background summarisation."""
+
+    def __init__(
+        self,
+        summarize: Summarizer,
+        max_sessions: int = 256,
+        keep_turns: int = 6,
+        fold_batch: int = 4,
+        summary_tokens: int = 250,
+    ) -> None:
+        self.summarize = summarize
+        self.max_sessions = max_sessions
+        self.keep_turns = max(1, keep_turns)
+        self.fold_batch = max(1, fold_batch)
+        self.summary_tokens = summary_tokens
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        self._tasks: Set["asyncio.Task[None]"] = set()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: str) -> Session:
+        """Return session *session_id*, creating it on first use."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                session = self._sessions[session_id] = Session(id=session_id)
+                while len(self._sessions) > self.max_sessions:
+                    self._sessions.popitem(last=False)
+            else:
+                self._sessions.move_to_end(session_id)
+            return session
+
+    def messages(self, session: Session, system: str, user_message: str) -> Messages:
+        """Chat messages for the next turn: stable prefix first, new message last."""
+        messages = [{"role": "system", "content": system}]
+        if session.summary:
+            messages.append({"role": "system", "content": f"Earlier in this conversation: {session.summary}"})
+        messages.extend(session.turns)
+        messages.append({"role": "user", "content": user_message})
+        return messages
+
+    def record(self, session: Session, user_prompt: str, reply: str) -> None:
+        """Append an exchange and start a fold once enough have piled up.
+
+        Stores the user's words without the memory context, which is
+        rebuilt for every turn.  Must be called from the event loop.
+        """
+        session.turns.append({"role": "user", "content": user_prompt})
+        session.turns.append({"role": "assistant", "content": reply})
+        session.updated = time.time()
+        if session.folding or len(session.turns) < 2 * (self.keep_turns + self.fold_batch):
+            return
+        session.folding = True
+        task = asyncio.get_running_loop().create_task(self._fold(session, 2 * self.fold_batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _fold(self, session: Session, count: int) -> None:
+        batch = session.turns[:count]
+        transcript = "\n".join(
+            f"{'User' if turn['role'] == 'user' else 'Pepper'}: {turn['content']}" for turn in batch
+        )
+        request = [
+            {"role": "system", "content": SUMMARY_INSTRUCTION.format(tokens=self.summary_tokens)},
+            {"role": "user", "content": f"Summary so far:\n{session.summary or '(none)'}\n\nNew turns:\n{transcript}"},
+        ]
+        try:
+            summary = (await self.summarize(request)).strip()
+        except Exception as exc:  # noqa: BLE001 - keep the turns and retry on the next exchange
+            LOGGER.warning("Session %s: summary failed: %s", session.id, exc)
+            summary = ""
+        finally:
+            session.folding = False
+        if summary:
+            session.summary = trim_to_tokens(summary, self.summary_tokens)
+            del session.turns[:count]
+            session.folded += count // 2
+        elif len(session.turns) >= 2 * (self.keep_turns + 2 * self.fold_batch):
+            # The back-end keeps failing: bound the window anyway.
+            LOGGER.info("Session %s: dropping %d unsummarised turns", session.id, count // 2)
+            del session.turns[:count]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {"sessions": len(sessions), "folding": sum(1 for session in sessions if session.folding)}
+
+    async def aclose(self) -> None:
+        """Cancel folds still in flight (called on server shutdown)."""
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+__all__ = ["SUMMARY_INSTRUCTION", "Session", "SessionStore"]
@@ -0,0 +1,443 @@
+"""Sandboxed local skills: ``ls``, ``mv``, ``cp``, ``rm``, ``cat`` and ``tail``.
+
+Skills are implemented natively rather than by shelling out, and every
+path is resolved inside one sandbox directory (symlinks included), so a
+skill can never touch files outside it.  ``cat`` and ``tail`` read through
+:mod:`mmap` with a byte cap; ``tail`` scans backwards from the end of the
+file, so the last lines of a multi-gigabyte log cost the same as those of
+a small one.
+
+Each skill is a generator of output chunks.  :class:`SkillEngine` runs it
+on a bounded thread pool, enforces the per-call timeout and output cap,
+and hands chunks to the caller as they are produced.  Cancellation is
+cooperative: long operations (recursive copy or delete, chunked file
+copies) check a cancel flag between steps, so a timed-out ``cp`` stops
+instead of running on in the background.
+"""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+import asyncio
+import codecs
+import mmap
+import os
+import shutil
+import stat
+import tempfile
+import threading
+import time
+
+DEFAULT_SKILL_ROOT = Path.home() / "bje" / "pepper_dir" / "sandbox"
+
+# Read/copy granularity and the default per-call output cap.
+_CHUNK = 64 * 1024
+DEFAULT_MAX_OUTPUT = 64 * 1024
+
+# Exit codes, following coreutils conventions.
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_TIMEOUT = 124
+
+
+class SkillError(Exception):
+    """Raised for bad arguments, missing files or sandbox escapes."""
+
+
+class SkillBusy(Exception):
+    """Raised when every worker is busy and the wait queue is full."""
+
+
+class SkillCancelled(Exception):
+    """Raised inside a skill once its cancel flag is set."""
+
+
+class Sandbox:
+    """Resolves user paths inside a single root directory.
+
+    Absolute paths are taken relative to the root, so ``/notes`` and
+    ``notes`` name the same file.
+    """
+
+    def __init__(self, root: Path) -> None:
+        self.root = Path(root).expanduser().resolve()
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def resolve(self, path: str) -> Path:
+        """Return the absolute path for *path*; raise if it leaves the sandbox."""
+        candidate = (self.root / path.lstrip("/")).resolve()
+        if candidate != self.root and self.root not in candidate.parents:
+            raise SkillError(f"{path}: outside the sandbox")
+        return candidate
+
+    def locate(self, path: str) -> Path:
+        """Like :meth:`resolve`, but a symlink as the last component names itself.
+
+        Only the parent directory is resolved and checked, so ``rm`` and
+        ``mv`` act on a link rather than on what it points to.
+        """
+        relative = Path(path.lstrip("/"))
+        if relative.name in ("", ".."):
+            return self.resolve(path)
+        try:
+            parent = self.resolve(str(relative.parent))
+        except SkillError:
+            raise SkillError(f"{path}: outside the sandbox") from None
+        return parent / relative.name
+
+    def contain(self, path: Path) -> Path:
+        """Raise unless *path*, with every symlink followed, is inside the sandbox."""
+        real = path.resolve()
+        if real != self.root and self.root not in real.parents:
+            raise SkillError(f"{path.name}: outside the sandbox")
+        return real
+
+    def relative(self, path: Path) -> str:
+        return str(path.relative_to(self.root)) or "."
+
+
+# ---------------------------------------------------------------------------
+def _flags(args: List[str], allowed: str, valued: str = "") -> Tuple[Dict[str, Any], List[str]]:
+    """Split ``-x`` style flags from positional *args*."""
+    flags: Dict[str, Any] = {}
+    positional: List[str] = []
+    items = iter(args)
+    for arg in items:
+        if arg.startswith("-") and len(arg) > 1 and not positional:
+            for letter in arg[1:]:
+                if letter in valued:
+                    value = next(items, None)
+                    if value is None:
+                        raise SkillError(f"-{letter} needs a value")
+                    flags[letter] = value
+                elif letter in allowed:
+                    flags[letter] = True
+                else:
+                    raise SkillError(f"unknown option -{letter}")
+        else:
+            positional.append(arg)
+    return flags, positional
+
+
+def _check(cancel: threading.Event) -> None:
+    if cancel.is_set():
+        raise SkillCancelled()
+
+
+def _mapped(path: Path) -> Iterator[Optional[mmap.mmap]]:
+    """Yield a read-only mapping of *path* (``None`` for an empty file)."""
+    if not path.is_file():
+        raise SkillError(f"{path.name}: not a file")
+    with path.open("rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            yield None
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def _decode(mapped: mmap.mmap, start: int, end: int, cancel: threading.Event) -> Iterator[str]:
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    for offset in range(start, end, _CHUNK):
+        _check(cancel)
+        yield decoder.decode(mapped[offset : min(end, offset + _CHUNK)])
+    yield decoder.decode(b"", final=True)
+
+
+def skill_ls(box: Sandbox, args: List[str], cancel: threading.Event, cap: int) -> Iterator[str]:
+    flags, paths = _flags(args, "al")
+    for target in paths or ["."]:
+        path = box.resolve(target)
+        if not path.exists():
+            raise SkillError(f"{target}: no such file or directory")
+        entries = sorted(os.scandir(path), key=lambda entry: entry.name) if path.is_dir() else None
+        if len(paths) > 1:
+            yield f"{box.relative(path)}:\n"
+        for entry in entries if entries is not None else [path]:
+            _check(cancel)
+            name = entry.name
+            if name.startswith(".") and not flags.get("a"):
+                continue
+            info = entry.stat(follow_symlinks=False) if isinstance(entry, os.DirEntry) else entry.lstat()
+            suffix = "/" if stat.S_ISDIR(info.st_mode) else ""
+            if flags.get("l"):
+                stamp = time.strftime("%Y-%m-%d %H:%M", time.localtime(info.st_mtime))
+                yield f"{stat.filemode(info.st_mode)} {info.st_size:>10} {stamp} {name}{suffix}\n"
+            else:
+                yield f"{name}{suffix}\n"
+
+
+def skill_cat(box: Sandbox, args: List[str], cancel: threading.Event, cap: int) -> Iterator[str]:
+    _, paths = _flags(args, "")
+    if not paths:
+        raise SkillError("cat: missing file operand")
+    for target in paths:
+        for mapped in _mapped(box.resolve(target)):
+            if mapped is not None:
+                yield from _decode(mapped, 0, min(len(mapped), cap + 1), cancel)
+
+
+def skill_tail(box: Sandbox, args: List[str], cancel: threading.Event, cap: int) -> Iterator[str]:
+    flags, paths = _flags(args, "", valued="n")
+    try:
+        lines = int(flags.get("n", 10))
+    except ValueError:
+        raise SkillError("tail: -n needs a number") from None
+    if len(paths) != 1:
+        raise SkillError("tail: expected exactly one file")
+    for mapped in _mapped(box.resolve(paths[0])):
+        if mapped is None or lines <= 0:
+            return
+        end = len(mapped)
+        # Never look further back than the output cap allows.
+        floor = max(0, end - cap - 1)
+        position = end - 1 if mapped[end - 1 : end] == b"\n" else end
+        for _ in range(lines):
+            position = mapped.rfind(b"\n", floor, position)
+            if position < 0:
+                break
+        start = floor if position < 0 else position + 1
+        yield from _decode(mapped, start, end, cancel)
+
+
+def _copy_file(box: Sandbox, source: Path, target: Path, cancel: threading.Event) -> None:
+    # mkstemp creates a fresh, unpredictable name with O_EXCL, so a symlink
+    # planted next to the target can never redirect the write.
+    box.contain(target.parent)
+    handle, name = tempfile.mkstemp(prefix=f".{target.name}.", suffix=".part", dir=target.parent)
+    partial = Path(name)
+    try:
+        with os.fdopen(handle, "wb") as writer, source.open("rb") as reader:
+            for block in iter(lambda: reader.read(_CHUNK * 16), b""):
+                _check(cancel)
+                writer.write(block)
+        shutil.copystat(source, partial)
+        # The directory may have been swapped for a symlink during the copy.
+        box.contain(target.parent)
+        os.replace(partial, target)  # replaces a symlink target itself
+    finally:
+        partial.unlink(missing_ok=True)
+
+
+def _copy_tree(box: Sandbox, source: Path, target: Path, cancel: threading.Event) -> None:
+    if target.is_symlink():
+        raise SkillError(f"{box.relative(target.parent)}/{target.name}: refusing to copy into a symlink")
+    target.mkdir(exist_ok=True)
+    for entry in sorted(source.iterdir()):
+        _check(cancel)
+        if entry.is_symlink():
+            continue
+        if entry.is_dir():
+            _copy_tree(box, entry, target / entry.name, cancel)
+        else:
+            _copy_file(box, entry, target / entry.name, cancel)
+
+
+def _remove_tree(path: Path, cancel: threading.Event) -> None:
+    for entry in path.iterdir():
+        _check(cancel)
+        if entry.is_dir() and not entry.is_symlink():
+            _remove_tree(entry, cancel)
+        else:
+            entry.unlink()
+    path.rmdir()
+
+
+def _source_and_target(
+    box: Sandbox, paths: List[str], name: str, follow: bool = True
+) -> Tuple[Path, Path]:
+    """Resolve a source and destination; ``follow=False`` keeps final symlinks."""
+    if len(paths) != 2:
+        raise SkillError(f"{name}: expected a source and a destination")
+    lookup = box.resolve if follow else box.locate
+    source, target = lookup(paths[0]), lookup(paths[1])
+    if not source.exists() and not source.is_symlink():
+        raise SkillError(f"{paths[0]}: no such file or directory")
+    if source == box.root:
+        raise SkillError(f"{name}: refusing to operate on the sandbox root")
+    if target.is_dir():
+        target = box.resolve(paths[1]) / source.name
+    if target == source or source in target.parents:
+        raise SkillError(f"{name}: cannot {name} {paths[0]} into itself")
+    return source, target
+
+
+def skill_cp(box: Sandbox, args: List[str], cancel: threading.Event, cap: int) -> Iterator[str]:
+    flags, paths = _flags(args, "r")
+    source, target = _source_and_target(box, paths, "cp")
+    if source.is_dir():
+        if not flags.get("r"):
+            raise SkillError(f"cp: -r not specified; omitting directory {paths[0]}")
+        _copy_tree(box, source, target, cancel)
+    else:
+        _copy_file(box, source, target, cancel)
+    yield f"{box.relative(source)} -> {box.relative(target)}\n"
+
+
+def skill_mv(box: Sandbox, args: List[str], cancel: threading.Event, cap: int) -> Iterator[str]:
+    _, paths = _flags(args, "")
+    source, target = _source_and_target(box, paths, "mv", follow=False)
+    os.replace(source, target)
+    yield f"{box.relative(source)} -> {box.relative(target)}\n"
+
+
+def skill_rm(box: Sandbox, args: List[str], cancel: threading.Event, cap: int) -> Iterator[str]:
+    flags, paths = _flags(args, "rf")
+    if not paths:
+        raise SkillError("rm: missing operand")
+    for target in paths:
+        path = box.locate(target)
+        if path == box.root:
+            raise SkillError("rm: refusing to remove the sandbox root")
+        if not path.exists() and not path.is_symlink():
+            if flags.get("f"):
+                continue
+            raise SkillError(f"{target}: no such file or directory")
+        if path.is_dir() and not path.is_symlink():
+            if not flags.get("r"):
+                raise SkillError(f"rm: {target}: is a directory")
+            _remove_tree(path, cancel)
+        else:
+            path.unlink()
+        yield f"removed {box.relative(path)}\n"
+
+
+SKILLS: Dict[str, Callable[[Sandbox, List[str], threading.Event, int], Iterator[str]]] = {
+    "ls": skill_ls,
+    "mv": skill_mv,
+    "cp": skill_cp,
+    "rm": skill_rm,
+    "cat": skill_cat,
+    "tail": skill_tail,
+}
+
+
+# ---------------------------------------------------------------------------
+class SkillEngine:
+    """Runs skills on a bounded worker pool with timeouts and output caps."""
+
+    def __init__(
+        self,
+        root: Path = DEFAULT_SKILL_ROOT,
+        workers: int = 2,
+        max_queue: int = 8,
+        max_output: int = DEFAULT_MAX_OUTPUT,
+    ) -> None:
+        self.sandbox = Sandbox(root)
+        self.max_output = max(1, max_output)
+        self.workers = max(1, workers)
+        self._capacity = self.workers + max(0, max_queue)
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="pepper-skill")
+
+    async def stream(self, cmd: str, args: List[str], timeout: float) -> AsyncIterator[Tuple[str, Any]]:
+        """Yield ``("stdout", text)`` chunks, then one ``("exit", code)``.
+
+        Failures arrive as ``("stderr", message)`` before the exit code.
+        Raises :class:`SkillError` for unknown commands and
+        :class:`SkillBusy` when the pool is saturated.
+        """
+        skill = SKILLS.get(cmd)
+        if skill is None:
+            raise SkillError(f"unknown skill {cmd!r}; allowed: {', '.join(sorted(SKILLS))}")
+        with self._lock:
+            if self._pending >= self._capacity:
+                raise SkillBusy(f"{self._pending} skills already running or queued")
+            self._pending += 1
+
+        loop = asyncio.get_running_loop()
+        chunks: "asyncio.Queue[Tuple[str, Any]]" = asyncio.Queue()
+        cancel = threading.Event()
+
+        def emit(kind: str, value: Any) -> None:
+            try:
+                loop.call_soon_threadsafe(chunks.put_nowait, (kind, value))
+            except RuntimeError:  # event loop already closed (shutdown)
+                cancel.set()
+
+        def work() -> None:
+            written = 0
+            code = EXIT_OK
+            try:
+                for text in skill(self.sandbox, list(args), cancel, self.max_output):
+                    if cancel.is_set():
+                        raise SkillCancelled()
+                    if written + len(text) > self.max_output:
+                        emit("stdout", text[: self.max_output - written])
+                        emit("stderr", f"output truncated after {self.max_output} characters\n")
+                        break
+                    written += len(text)
+                    if text:
+                        emit("stdout", text)
+            except SkillCancelled:
+                code = EXIT_TIMEOUT
+            except SkillError as exc:
+                emit("stderr", f"{exc}\n")
+                code = EXIT_FAILED
+            except OSError as exc:
+                emit("stderr", f"{cmd}: {exc.strerror or exc}\n")
+                code = EXIT_FAILED
+            finally:
+                with self._lock:
+                    self._pending -= 1
+                emit("exit", code)
+
+        self._pool.submit(work)
+        deadline = loop.time() + timeout
+        try:
+            while True:
+                remaining = deadline - loop.time()
+                try:
+                    kind, value = await asyncio.wait_for(chunks.get(), max(0.0, remaining))
+                except asyncio.TimeoutError:
+                    cancel.set()
+                    yield "stderr", f"{cmd}: timed out after {timeout:g}s\n"
+                    yield "exit", EXIT_TIMEOUT
+                    return
+                yield kind, value
+                if kind == "exit":
+                    return
+        finally:
+            # Client went away or timed out: stop the worker at its next check.
+            cancel.set()
+
+    async def run(self, cmd: str, args: List[str], timeout: float) -> Dict[str, Any]:
+        """Run a skill to completion and return the ``/skill`` response body."""
+        started = time.perf_counter()
+        stdout: List[str] = []
+        stderr: List[str] = []
+        code = EXIT_OK
+        async for kind, value in self.stream(cmd, args, timeout):
+            if kind == "stdout":
+                stdout.append(value)
+            elif kind == "stderr":
+                stderr.append(value)
+            else:
+                code = value
+        return {
+            "type": "cmd",
+            "ok": code == EXIT_OK,
+            "stdout": "".join(stdout),
+            "stderr": "".join(stderr),
+            "exit_code": code,
+            "duration_ms": int((time.perf_counter() - started) * 1000),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"root": str(self.sandbox.root), "workers": self.workers, "pending": self._pending}
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+__all__ = [
+    "DEFAULT_SKILL_ROOT",
+    "SKILLS",
+    "Sandbox",
+    "SkillBusy",
+    "SkillEngine",
+    "SkillError",
+]
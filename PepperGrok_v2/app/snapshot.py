@@ -0,0 +1,337 @@
+"""On-disk snapshot formats for the JSON memory back-end.
+
+Two layouts are understood:
+
+* JSON (``{"version": 1, "seq": N, "memories": [...]}``), the default and
+  the one humans and other tools read;
+* a compact binary layout, written when ``memory_snapshot`` is
+  ``"binary"`` and by ``pepper_snapshot.py`` for exports and backups.
+
+The binary file is a fixed header, a JSON directory and then the raw
+:class:`~app.columns.MemoryColumns` buffers, one section per column::
+
+    header   magic "PEPSNAP\\0", version, flags, directory length + CRC32,
+             seq, row count (little-endian)
+    directory {"columns": ..., "codec": ..., "sections": {name: {...}}}
+    sections  seq / ts / pinned / interned codes, the text offsets table
+              and the UTF-8 text records it delimits
+
+Every section carries a CRC32.  Sections can be compressed in 1 MiB
+blocks with zstd (``pip install zstandard``) or zlib.  Uncompressed
+snapshots are read through :mod:`mmap`: the columns are views over the
+mapping (copied once, on the first write), no row is parsed, and texts
+stay encoded until a memory is actually read.  Checksums are still
+verified over every section when a snapshot is loaded.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import IO, Any, Callable, Dict, Iterable, List, Optional, Tuple
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import time
+import zlib
+
+from .columns import MemoryColumns
+
+try:  # Optional dependency: zstd block compression.
+    import zstandard
+except ImportError:  # pragma: no cover - optional dependency
+    zstandard = None
+
+LOGGER = logging.getLogger(__name__)
+
+# Layout version of JSON snapshots.
+JSON_VERSION = 1
+
+MAGIC = b"PEPSNAP\0"
+BINARY_VERSION = 1
+FLAG_COMPRESSED = 1
+BLOCK_SIZE = 1 << 20
+CODECS = ("zstd", "zlib")
+
+# magic, version, flags, directory length, directory CRC32, seq, rows
+_HEADER = struct.Struct("<8sHHIIQQ")
+
+
+class SnapshotError(Exception):
+    """A snapshot is truncated, corrupt or in an unknown format."""
+
+
+# ----------------------------------------------------------------------
+def _compressor(codec: str):
+    if codec == "zlib":
+        return lambda data: zlib.compress(data, 1)
+    if codec == "zstd":
+        if zstandard is None:
+            raise SnapshotError("zstd compression needs the zstandard package")
+        return zstandard.ZstdCompressor(level=3).compress
+    raise SnapshotError(f"unknown codec {codec!r}; use one of {', '.join(CODECS)}")
+
+
+def _decompressor(codec: str):
+    if codec == "zlib":
+        return zlib.decompress
+    if codec == "zstd":
+        if zstandard is None:
+            raise SnapshotError("this snapshot is zstd-compressed; install zstandard to read it")
+        return zstandard.ZstdDecompressor().decompress
+    raise SnapshotError(f"unknown codec {codec!r}")
+
+
+def dump_json(handle: IO[bytes], seq: int, rows: Iterable[bytes]) -> None:
+    """Write a JSON snapshot of rows already serialised to JSON."""
+
+    handle.write(b'{"version":%d,"seq":%d,"memories":[' % (JSON_VERSION, seq))
+    for position, row in enumerate(rows):
+        if position:
+            handle.write(b",")
+        handle.write(row)
+    handle.write(b"]}")
+
+
+def dump_binary(
+    handle: IO[bytes], seq: int, columns: MemoryColumns, compression: Optional[str] = None
+) -> None:
+    """Write *columns* as a binary snapshot."""
+
+    meta, buffers = columns.to_buffers()
+    compress = _compressor(compression) if compression else None
+    sections: Dict[str, Dict[str, Any]] = {}
+    payload: List[bytes] = []
+    offset = 0
+    for name, raw in buffers.items():
+        if compress is None:
+            blocks = [raw]
+        else:
+            blocks = [compress(raw[start : start + BLOCK_SIZE]) for start in range(0, len(raw), BLOCK_SIZE)]
+        stored = sum(len(block) for block in blocks)
+        crc = 0
+        for block in blocks:
+            crc = zlib.crc32(block, crc)
+        sections[name] = {
+            "offset": offset,
+            "length": stored,
+            "size": len(raw),
+            "crc32": crc,
+            "blocks": [len(block) for block in blocks] if compress else None,
+        }
+        payload.extend(blocks)
+        offset += stored
+    directory = json.dumps(
+        {"columns": meta, "codec": compression, "sections": sections},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    flags = FLAG_COMPRESSED if compress else 0
+    handle.write(
+        _HEADER.pack(MAGIC, BINARY_VERSION, flags, len(directory), zlib.crc32(directory), seq, len(columns))
+    )
+    handle.write(directory)
+    for block in payload:
+        handle.write(block)
+
+
+def write_file(path: Path, write: Callable[[IO[bytes]], None]) -> None:
+    """Atomically replace *path* with what ``write(handle)`` produces."""
+
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    with tmp_path.open("wb") as handle:
+        write(handle)
+        handle.flush()
+        os.fsync(handle.fileno())
+    os.replace(tmp_path, path)
+
+
+# ----------------------------------------------------------------------
+def is_binary(path: Path) -> bool:
+    """True when *path* starts with the binary snapshot magic."""
+    try:
+        with Path(path).open("rb") as handle:
+            return handle.read(len(MAGIC)) == MAGIC
+    except OSError:
+        return False
+
+
+def _parse(view: memoryview, verify: bool = True) -> Tuple[int, MemoryColumns]:
+    if len(view) < _HEADER.size:
+        raise SnapshotError("snapshot is truncated")
+    magic, version, flags, directory_length, directory_crc, seq, rows = _HEADER.unpack_from(view)
+    if magic != MAGIC:
+        raise SnapshotError("not a binary memory snapshot")
+    if version > BINARY_VERSION:
+        raise SnapshotError(f"snapshot version {version} is newer than this reader ({BINARY_VERSION})")
+    start = _HEADER.size
+    directory_bytes = view[start : start + directory_length]
+    if len(directory_bytes) < directory_length or zlib.crc32(directory_bytes) != directory_crc:
+        raise SnapshotError("snapshot directory is corrupt")
+    directory = json.loads(bytes(directory_bytes))
+    decompress = _decompressor(directory["codec"]) if flags & FLAG_COMPRESSED else None
+    data = start + directory_length
+    buffers: Dict[str, Any] = {}
+    for name, section in directory["sections"].items():
+        begin = data + section["offset"]
+        stored = view[begin : begin + section["length"]]
+        if len(stored) != section["length"]:
+            raise SnapshotError(f"snapshot section {name!r} is truncated")
+        if verify and zlib.crc32(stored) != section["crc32"]:
+            raise SnapshotError(f"snapshot section {name!r} fails its checksum")
+        if decompress is None:
+            buffers[name] = stored
+            continue
+        parts = []
+        position = 0
+        for length in section["blocks"]:
+            parts.append(decompress(stored[position : position + length]))
+            position += length
+        buffers[name] = b"".join(parts)
+        if len(buffers[name]) != section["size"]:
+            raise SnapshotError(f"snapshot section {name!r} has the wrong size")
+    try:
+        columns = MemoryColumns.from_buffers(directory["columns"], buffers)
+    except (KeyError, ValueError) as exc:
+        raise SnapshotError(f"snapshot columns are inconsistent: {exc}") from exc
+    if len(columns) != rows:
+        raise SnapshotError("snapshot row count does not match its header")
+    return seq, columns
+
+
+def read_binary(path: Path, verify: bool = True) -> Tuple[int, MemoryColumns]:
+    """Load a binary snapshot through ``mmap``; returns ``(seq, columns)``.
+
+    The columns keep the mapping alive; it is unmapped once they have
+    copied their buffers or are dropped.  Snapshots are only ever replaced
+    with ``os.replace``, so an old mapping stays valid.
+    """
+
+    with Path(path).open("rb") as handle:
+        try:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError as exc:  # an empty file cannot be mapped
+            raise SnapshotError("snapshot is empty") from exc
+    try:
+        with memoryview(mapped) as view:
+            return _parse(view, verify)
+    except BaseException:
+        try:
+            mapped.close()
+        except BufferError:  # a traceback still holds section views
+            pass
+        raise
+
+
+def read_records(path: Path) -> Tuple[int, List[Dict[str, Any]]]:
+    """``(seq, memory dicts)`` from a snapshot in either format.
+
+    Legacy JSON snapshots (a bare list) report a ``seq`` of 0.
+    """
+
+    path = Path(path)
+    if is_binary(path):
+        seq, columns = read_binary(path)
+        return seq, [columns.entry(index).to_dict() for index in range(len(columns))]
+    try:
+        data = json.loads(path.read_text("utf-8"))
+    except ValueError as exc:
+        raise SnapshotError(f"{path} is not valid JSON: {exc}") from exc
+    if isinstance(data, list):
+        return 0, [item for item in data if isinstance(item, dict)]
+    if isinstance(data, dict):
+        records = [item for item in data.get("memories", []) if isinstance(item, dict)]
+        return int(data.get("seq", 0)), records
+    raise SnapshotError(f"{path} is not a memory snapshot")
+
+
+# ----------------------------------------------------------------------
+def file_digest(path: Path) -> str:
+    digest = hashlib.sha256()
+    with Path(path).open("rb") as handle:
+        for chunk in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify(path: Path) -> Dict[str, Any]:
+    """Check a binary snapshot (and its ``.sha256`` file, if any).
+
+    Returns ``{"seq", "count", "bytes"}`` or raises :class:`SnapshotError`.
+    """
+
+    path = Path(path)
+    sidecar = path.with_name(path.name + ".sha256")
+    if sidecar.exists():
+        expected = sidecar.read_text("utf-8").split()[0]
+        if file_digest(path) != expected:
+            raise SnapshotError(f"{path.name} does not match its SHA-256")
+    seq, columns = read_binary(path)
+    return {"seq": seq, "count": len(columns), "bytes": path.stat().st_size}
+
+
+def write_backup(
+    directory: Path,
+    seq: int,
+    columns: MemoryColumns,
+    keep: int = 7,
+    compression: Optional[str] = None,
+    prefix: str = "pepper_memory",
+) -> Path:
+    """Write a verified backup into *directory* and rotate old ones.
+
+    The new file gets a ``.sha256`` file and is re-read and checked
+    before anything is pruned.  A failed backup therefore never pushes a
+    good one out.  Only the newest *keep* backups are kept.
+    """
+
+    directory = Path(directory)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    target = directory / f"{prefix}-{stamp}.snap"
+    suffix = 1
+    while target.exists():
+        target = directory / f"{prefix}-{stamp}-{suffix}.snap"
+        suffix += 1
+    write_file(target, lambda handle: dump_binary(handle, seq, columns, compression))
+    (target.with_name(target.name + ".sha256")).write_text(
+        f"{file_digest(target)}  {target.name}\n", encoding="utf-8"
+    )
+    try:
+        verify(target)
+    except SnapshotError:
+        target.unlink(missing_ok=True)
+        target.with_name(target.name + ".sha256").unlink(missing_ok=True)
+        raise
+    for stale in backups(directory, prefix)[: -max(1, keep)]:
+        stale.unlink(missing_ok=True)
+        stale.with_name(stale.name + ".sha256").unlink(missing_ok=True)
+        LOGGER.info("Pruned backup %s", stale.name)
+    return target
+
+
+def backups(directory: Path, prefix: str = "pepper_memory") -> List[Path]:
+    """Backups in *directory*, oldest first."""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    return sorted(directory.glob(f"{prefix}-*.snap"), key=lambda path: path.stat().st_mtime_ns)
+
+
+__all__ = [
+    "BINARY_VERSION",
+    "CODECS",
+    "JSON_VERSION",
+    "SnapshotError",
+    "backups",
+    "dump_binary",
+    "dump_json",
+    "is_binary",
+    "read_binary",
+    "read_records",
+    "verify",
+    "write_backup",
+    "write_file",
+]
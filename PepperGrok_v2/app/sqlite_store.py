@@ -0,0 +1,450 @@
+"""SQLite storage engine for Pepper memories.
+
+:class:`SqliteMemoryStore` keeps memories in a WAL-mode SQLite database
+instead of an in-RAM list.  Category, pinned, timestamp and conversation
+id are indexed columns, and an external-content FTS5 table provides BM25
+text search.  Writes go through one connection guarded by a lock; every
+reading thread gets its own connection, so readers never wait on the
+writer or on each other.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import logging
+import sqlite3
+import threading
+import time
+
+from .categorise import Categoriser
+from .journal import MemoryJournal
+from .memory import (
+    DEFAULT_BIAS_WINDOW,
+    DEFAULT_COMPACT_EVERY,
+    DEFAULT_MAX_MEMORIES,
+    BaseMemoryStore,
+    MemoryAggregates,
+    MemoryEntry,
+    _DEFAULT_CATEGORISER,
+    _seq_of,
+    entries_from_replay,
+)
+from .search import tokenize
+from .vectors import Embedder, VectorIndex
+
+LOGGER = logging.getLogger(__name__)
+
+# Bumped whenever the table layout below changes.
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS memories (
+    seq      INTEGER PRIMARY KEY,
+    text     TEXT    NOT NULL,
+    category TEXT    NOT NULL,
+    ts       REAL    NOT NULL,
+    pinned   INTEGER NOT NULL DEFAULT 0,
+    role     TEXT    NOT NULL DEFAULT 'note',
+    source   TEXT    NOT NULL DEFAULT 'pepper',
+    conv_id  TEXT
+);
+CREATE INDEX IF NOT EXISTS memories_category ON memories (category);
+CREATE INDEX IF NOT EXISTS memories_category_ts ON memories (category, ts);
+CREATE INDEX IF NOT EXISTS memories_pinned ON memories (pinned) WHERE pinned = 1;
+CREATE INDEX IF NOT EXISTS memories_ts ON memories (ts);
+CREATE INDEX IF NOT EXISTS memories_conv_id ON memories (conv_id);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS memories_fts USING fts5 (
+    text, content='memories', content_rowid='seq'
+);
+CREATE TRIGGER IF NOT EXISTS memories_fts_insert AFTER INSERT ON memories BEGIN
+    INSERT INTO memories_fts (rowid, text) VALUES (new.seq, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS memories_fts_delete AFTER DELETE ON memories BEGIN
+    INSERT INTO memories_fts (memories_fts, rowid, text) VALUES ('delete', old.seq, old.text);
+END;
+"""
+
+_COLUMNS = "seq, text, category, ts, pinned, role, source, conv_id"
+_M_COLUMNS = ", ".join("m." + column for column in _COLUMNS.split(", "))
+
+
+def _row_to_entry(row: Tuple[Any, ...]) -> MemoryEntry:
+    seq, text, category, ts, pinned, role, source, conv_id = row
+    return MemoryEntry(
+        text=text,
+        category=category,
+        id=f"m{seq}",
+        ts=ts,
+        pinned=bool(pinned),
+        role=role,
+        source=source,
+        conv_id=conv_id,
+    )
+
+
+def _entry_to_row(seq: int, entry: MemoryEntry) -> Tuple[Any, ...]:
+    return (
+        seq,
+        entry.text,
+        entry.category,
+        entry.ts,
+        int(entry.pinned),
+        entry.role,
+        entry.source,
+        entry.conv_id,
+    )
+
+
+class SqliteMemoryStore(BaseMemoryStore):
+    """:class:`~app.memory.MemoryStore` API on top of SQLite (WAL + FTS5).
+
+    Memory ids keep the ``m{seq}`` form with ``seq`` as the integer
+    primary key, so ids, the vector index and migrated JSON memories line
+    up.  Pruning to ``max_memories`` happens every *compact_every*
+    additions, as with the JSON back-end.
+
+    Several processes may open the same database: writes run in
+    ``BEGIN IMMEDIATE`` transactions that take the next ``seq`` from the
+    table itself, and a ``generation`` counter in ``meta`` is bumped by
+    every write.  ``PRAGMA data_version`` tells a process when someone
+    else committed, so its running aggregates are reloaded.  If the SQLite build lacks FTS5
+    :meth:`search` falls back to a ``LIKE`` scan.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        max_memories: int = DEFAULT_MAX_MEMORIES,
+        compact_every: int = DEFAULT_COMPACT_EVERY,
+        embedder: Optional[Embedder] = None,
+        embed_batch: int = 32,
+        bias_window: int = DEFAULT_BIAS_WINDOW,
+        categoriser: Optional[Categoriser] = None,
+    ) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_memories = max_memories
+        self.compact_every = max(1, compact_every)
+        self.categoriser = categoriser or _DEFAULT_CATEGORISER
+        self.embed_batch = max(1, embed_batch)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._since_compact = 0
+        self._stats = MemoryAggregates(bias_window)
+        self._writer = self._connect()
+        self._writer.execute("PRAGMA journal_mode=WAL")
+        self._writer.executescript(_SCHEMA)
+        try:
+            self._writer.executescript(_FTS_SCHEMA)
+            self.fts = True
+        except sqlite3.OperationalError:
+            LOGGER.warning("SQLite was built without FTS5; memory search will scan")
+            self.fts = False
+        self._writer.execute(
+            "INSERT OR IGNORE INTO meta (key, value) VALUES ('schema', ?)", (str(SCHEMA_VERSION),)
+        )
+        self._writer.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', '0')")
+        self._writer.commit()
+        self._data_version = self._writer.execute("PRAGMA data_version").fetchone()[0]
+        self._seq = self._writer.execute("SELECT COALESCE(MAX(seq), 0) FROM memories").fetchone()[0]
+        self._load_stats()
+        self._vectors = VectorIndex(self.path, embedder) if embedder else None
+        self._pending_vectors: List[MemoryEntry] = []
+        if self._vectors is not None:
+            # Rows missing after a crash (or a new embedder) are re-embedded lazily.
+            self._pending_vectors = self._query(
+                f"SELECT {_COLUMNS} FROM memories WHERE seq > ? ORDER BY seq",
+                (self._vectors.last_seq,),
+            )
+
+    # ------------------------------------------------------------------
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        connection.execute("PRAGMA busy_timeout=5000")
+        # WAL with NORMAL sync only fsyncs at checkpoints: the same
+        # durability trade-off as the JSON journal's group commit.
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def _reader(self) -> sqlite3.Connection:
+        """Return this thread's read-only connection."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = self._connect()
+            connection.execute("PRAGMA query_only=1")
+            self._local.connection = connection
+            with self._readers_lock:
+                self._readers.append(connection)
+        return connection
+
+    def _load_stats(self) -> None:
+        """Seed the running aggregates from the category index."""
+        counts = self._writer.execute(
+            "SELECT category, COUNT(*) FROM memories GROUP BY category"
+        ).fetchall()
+        recent = self._writer.execute(
+            "SELECT category FROM memories ORDER BY seq DESC LIMIT ?", (self._stats.window,)
+        ).fetchall()
+        self._stats.seed(dict(counts), [category for (category,) in reversed(recent)])
+
+    def _sync_locked(self) -> None:
+        """Reload aggregates after another connection committed.
+
+        Callers must hold ``self._lock``.
+        """
+        version = self._writer.execute("PRAGMA data_version").fetchone()[0]
+        if version != self._data_version:
+            self._data_version = version
+            self._load_stats()
+
+    def _bump_generation(self) -> None:
+        self._writer.execute(
+            "UPDATE meta SET value = CAST(value AS INTEGER) + 1 WHERE key = 'generation'"
+        )
+
+    def generation(self) -> int:
+        """Return the shared write counter from the ``meta`` table."""
+        row = self._reader().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _query(self, sql: str, params: Tuple[Any, ...] = ()) -> List[MemoryEntry]:
+        return [_row_to_entry(row) for row in self._reader().execute(sql, params)]
+
+    # ------------------------------------------------------------------
+    def import_json(self, json_path: Path) -> int:
+        """One-shot import of a JSON snapshot + journal into the database.
+
+        Runs only while the database is empty and records the source in
+        the ``meta`` table, so calling it on every start-up is cheap.
+        Existing ids are preserved.  Returns the number of rows imported.
+        """
+
+        json_path = Path(json_path)
+        marker = self._writer.execute(
+            "SELECT value FROM meta WHERE key = 'imported_from'"
+        ).fetchone()
+        journal = MemoryJournal(json_path, fsync_interval=0)
+        if marker is not None or self._seq:
+            return 0
+        if not (journal.snapshot_path.exists() or journal.log_path.exists()):
+            return 0
+        entries, _ = entries_from_replay(*journal.replay())
+        journal.close()
+        with self._lock:
+            with self._writer:
+                self._writer.executemany(
+                    f"INSERT OR IGNORE INTO memories ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (_entry_to_row(_seq_of(entry), entry) for entry in entries),
+                )
+                self._writer.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('imported_from', ?)",
+                    (str(json_path),),
+                )
+                self._bump_generation()
+            self._seq = self._writer.execute(
+                "SELECT COALESCE(MAX(seq), 0) FROM memories"
+            ).fetchone()[0]
+            self._load_stats()
+            if self._vectors is not None:
+                last = self._vectors.last_seq
+                self._pending_vectors.extend(e for e in entries if _seq_of(e) > last)
+        LOGGER.info("Imported %d memories from %s", len(entries), json_path)
+        return len(entries)
+
+    # ------------------------------------------------------------------
+    def _compact(self) -> None:
+        """Prune to ``max_memories`` and checkpoint the WAL.
+
+        Callers must hold ``self._lock``.
+        """
+        pruned: List[Tuple[str, int]] = []
+        with self._writer:
+            self._writer.execute("BEGIN IMMEDIATE")
+            self._sync_locked()
+            cutoff = self._writer.execute(
+                "SELECT seq FROM memories ORDER BY seq DESC LIMIT 1 OFFSET ?",
+                (self.max_memories,),
+            ).fetchone()
+            if cutoff is not None:
+                pruned = self._writer.execute(
+                    "SELECT category, COUNT(*) FROM memories WHERE seq <= ? GROUP BY category",
+                    cutoff,
+                ).fetchall()
+                self._writer.execute("DELETE FROM memories WHERE seq <= ?", cutoff)
+                self._bump_generation()
+            (first,) = self._writer.execute("SELECT MIN(seq) FROM memories").fetchone()
+        self._stats.removed(dict(pruned))
+        if self._vectors is not None and first is not None:
+            self._vectors.prune(first)
+            self._vectors.flush()
+        try:
+            self._writer.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+            self._writer.execute("PRAGMA optimize").fetchall()
+        except sqlite3.OperationalError as exc:
+            # Housekeeping only; another process holding the lock is fine.
+            LOGGER.debug("Skipped SQLite maintenance: %s", exc)
+        self._since_compact = 0
+
+    def compact(self) -> None:
+        """Force pruning and a WAL checkpoint."""
+        with self._lock:
+            self._compact()
+
+    def close(self) -> None:
+        """Flush embeddings and close every connection."""
+        self.embed_pending()
+        with self._lock:
+            self._writer.close()
+            if self._vectors is not None:
+                self._vectors.close()
+        with self._readers_lock:
+            for connection in self._readers:
+                connection.close()
+            self._readers.clear()
+
+    # ------------------------------------------------------------------
+    def add_many(self, records: Iterable[Dict[str, Any]]) -> List[MemoryEntry]:
+        """Store many memories in a single transaction.
+
+        Each record takes the keyword arguments of :meth:`add` plus an
+        optional ``ts`` (epoch seconds) to preserve original timestamps.
+        """
+
+        now = time.time()
+        prepared = self._prepare(records)
+        if not prepared:
+            return []
+
+        entries: List[MemoryEntry] = []
+        with self._lock:
+            with self._writer:
+                # Taking the write lock up front makes MAX(seq) safe to
+                # extend even with other processes writing.
+                self._writer.execute("BEGIN IMMEDIATE")
+                self._sync_locked()
+                self._seq = self._writer.execute(
+                    "SELECT COALESCE(MAX(seq), 0) FROM memories"
+                ).fetchone()[0]
+                for text, category, record in prepared:
+                    self._seq += 1
+                    entries.append(
+                        MemoryEntry(
+                            text=text,
+                            category=category,
+                            id=f"m{self._seq}",
+                            ts=float(record.get("ts") or now),
+                            pinned=bool(record.get("pinned", False)),
+                            role=record.get("role") or "note",
+                            source=record.get("source") or "pepper",
+                            conv_id=record.get("conv_id"),
+                        )
+                    )
+                self._writer.executemany(
+                    f"INSERT INTO memories ({_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (_entry_to_row(_seq_of(entry), entry) for entry in entries),
+                )
+                self._bump_generation()
+            self._stats.added(entry.category for entry in entries)
+            if self._vectors is not None:
+                self._pending_vectors.extend(entries)
+            self._since_compact += len(entries)
+            if self._since_compact >= self.compact_every:
+                self._compact()
+            flush_vectors = len(self._pending_vectors) >= self.embed_batch
+        if flush_vectors:
+            self.embed_pending()
+        return entries
+
+    # ------------------------------------------------------------------
+    def _entries_by_seq(self, seqs: List[int]) -> Dict[int, MemoryEntry]:
+        if not seqs:
+            return {}
+        marks = ", ".join("?" for _ in seqs)
+        entries = self._query(f"SELECT {_COLUMNS} FROM memories WHERE seq IN ({marks})", tuple(seqs))
+        return {_seq_of(entry): entry for entry in entries}
+
+    def since(self, seq: int, limit: int = 50) -> List[MemoryEntry]:
+        """Return up to *limit* of the newest memories stored after *seq*."""
+        entries = self._query(
+            f"SELECT {_COLUMNS} FROM memories WHERE seq > ? ORDER BY seq DESC LIMIT ?",
+            (seq, limit),
+        )
+        entries.reverse()
+        return entries
+
+    # ------------------------------------------------------------------
+    def list(self, limit: int = 15) -> List[MemoryEntry]:
+        """Return the last *limit* memories."""
+        limit = min(limit, self.max_memories)
+        entries = self._query(
+            f"SELECT {_COLUMNS} FROM memories ORDER BY seq DESC LIMIT ?", (limit,)
+        )
+        entries.reverse()
+        return entries
+
+    # ------------------------------------------------------------------
+    def get(self, entry_id: str) -> Optional[MemoryEntry]:
+        """Return the memory stored under *entry_id*, if any."""
+        if not entry_id[1:].isdigit():
+            return None
+        return self._entries_by_seq([int(entry_id[1:])]).get(int(entry_id[1:]))
+
+    # ------------------------------------------------------------------
+    def pinned(self) -> List[MemoryEntry]:
+        """Return all pinned memories, oldest first."""
+        return self._query(f"SELECT {_COLUMNS} FROM memories WHERE pinned = 1 ORDER BY seq")
+
+    def _recent_candidates(self, k: int) -> List[MemoryEntry]:
+        with self._lock:
+            self._sync_locked()
+            categories = list(self._stats.categories)
+        # One short walk of the (category, ts) index per category.
+        entries: List[MemoryEntry] = []
+        for category in categories:
+            entries += self._query(
+                f"SELECT {_COLUMNS} FROM memories WHERE category = ? ORDER BY ts DESC LIMIT ?", (category, k)
+            )
+        return entries
+
+    # ------------------------------------------------------------------
+    def search(self, query: str, k: int = 6) -> List[Tuple[MemoryEntry, float]]:
+        """Return the *k* memories most relevant to *query* with BM25 scores."""
+        terms = tokenize(query)
+        if not terms or k <= 0:
+            return []
+        if self.fts:
+            quoted = ['"{}"'.format(term.replace('"', '""')) for term in terms]
+            # Memories containing every term are tried first: far fewer rows
+            # to score than the OR query when the terms are common.
+            hits = self._fts_search(" AND ".join(quoted), k)
+            if len(hits) < k and len(quoted) > 1:
+                seen = {entry.id for entry, _ in hits}
+                extra = self._fts_search(" OR ".join(quoted), k)
+                hits += [hit for hit in extra if hit[0].id not in seen][: k - len(hits)]
+            return hits
+        like = " OR ".join("text LIKE ?" for _ in terms)
+        rows = self._reader().execute(
+            f"SELECT {_COLUMNS} FROM memories WHERE {like} ORDER BY seq DESC LIMIT ?",
+            (*(f"%{term}%" for term in terms), k),
+        ).fetchall()
+        return [(_row_to_entry(row), 1.0) for row in rows]
+
+    def _fts_search(self, match: str, k: int) -> List[Tuple[MemoryEntry, float]]:
+        rows = self._reader().execute(
+            f"SELECT {_M_COLUMNS}, hits.score"
+            " FROM (SELECT rowid, bm25(memories_fts) AS score FROM memories_fts"
+            "       WHERE memories_fts MATCH ? ORDER BY score LIMIT ?) AS hits"
+            " JOIN memories AS m ON m.seq = hits.rowid ORDER BY hits.score",
+            (match, k),
+        ).fetchall()
+        # FTS5's bm25() is negative, lower meaning more relevant.
+        return [(_row_to_entry(row[:-1]), -row[-1]) for row in rows]
+
+
+__all__ = ["SqliteMemoryStore", "SCHEMA_VERSION"]
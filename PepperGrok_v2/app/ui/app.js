@@ -5,20 +5,57 @@ const modeSelect = document.getElementById("mode");
 const rememberForm = document.getElementById("remember-form");
 const memoryText = document.getElementById("memory-text");
 const memoryCategory = document.getElementById("memory-category");
+const memoryPinned = document.getElementById("memory-pinned");
 const memoriesContainer = document.getElementById("memories");
 const statusLabel = document.getElementById("online-status");
+const statsLabel = document.getElementById("memory-stats");
+// One chat session per page load; the server keeps its recent turns.
+const sessionId = (crypto.randomUUID && crypto.randomUUID()) || `s${Date.now()}${Math.random()}`;
 
 async function fetchStatus() {
   try {
     const res = await fetch("/status");
     if (!res.ok) throw new Error("status failed");
     const data = await res.json();
-    statusLabel.textContent = data.grok_online ? "Online" : "Offline";
+    const backend = data.latency && data.latency.backend;
+    statusLabel.textContent = (data.grok_online ? "Online" : "Offline") +
+      (backend ? ` · ${Math.round(backend.p50_ms)} ms` : "");
+    statusLabel.title = backend ? `backend p50 ${backend.p50_ms} ms · p95 ${backend.p95_ms} ms` : "";
   } catch (error) {
     statusLabel.textContent = "Status unavailable";
   }
 }
 
+function showStats(data) {
+  statsLabel.textContent = `${data.memories} memories · bias ${data.emotional_bias.toFixed(2)}`;
+  statsLabel.title = Object.entries(data.categories)
+    .map(([category, count]) => `${category}: ${count}`)
+    .join("\n");
+}
+
+async function fetchStats() {
+  try {
+    const res = await fetch("/stats");
+    if (!res.ok) return;
+    showStats(await res.json());
+  } catch (error) {
+    statsLabel.textContent = "";
+  }
+}
+
+function watchMemories() {
+  if (!window.EventSource) {
+    setInterval(fetchStats, 5000);
+    return;
+  }
+  const source = new EventSource("/memories/stream");
+  source.addEventListener("stats", (event) => showStats(JSON.parse(event.data)));
+  source.addEventListener("memories", (event) => {
+    showStats(JSON.parse(event.data));
+    loadMemories();
+  });
+}
+
 async function loadMemories() {
   const res = await fetch("/memories?limit=15");
   if (!res.ok) return;
@@ -42,6 +79,63 @@ function addMessage(role, text) {
   wrapper.innerHTML = `<strong>${role}:</strong> ${text}`;
   conversation.appendChild(wrapper);
   conversation.scrollTop = conversation.scrollHeight;
+  return wrapper;
+}
+
+function addAugmentation(augmentation) {
+  if (!augmentation || !augmentation.memories) return;
+  const note = document.createElement("div");
+  note.className = "augmentation";
+  note.textContent = `Pepper added ${augmentation.memories} (≈${augmentation.memory_tokens} tks)`;
+  note.title = Object.entries(augmentation.categories)
+    .map(([category, tokens]) => `${category}: ${tokens} tks`)
+    .join("\n");
+  conversation.appendChild(note);
+}
+
+function parseEvent(frame) {
+  let event = "message";
+  let data = "";
+  frame.split("\n").forEach((line) => {
+    if (line.startsWith("event:")) event = line.slice(6).trim();
+    else if (line.startsWith("data:")) data += line.slice(5).trim();
+  });
+  return { event, data: data ? JSON.parse(data) : null };
+}
+
+async function renderStream(stream) {
+  const reader = stream.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let bubble = null;
+  let text = "";
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const { event, data } = parseEvent(buffer.slice(0, boundary));
+      buffer = buffer.slice(boundary + 2);
+      if (event === "augmentation") {
+        addAugmentation(data);
+      } else if (event === "message" && data) {
+        text += data.delta;
+        if (!bubble) bubble = addMessage("Pepper", "");
+        bubble.innerHTML = `<strong>Pepper:</strong> ${text}`;
+        conversation.scrollTop = conversation.scrollHeight;
+      } else if (event === "error") {
+        const detail = (data && data.detail) || "something went wrong";
+        if (!bubble) bubble = addMessage("Pepper", "");
+        bubble.classList.add("error");
+        bubble.innerHTML = text
+          ? `<strong>Pepper:</strong> ${text} <em>[${detail}]</em>`
+          : `<strong>Pepper:</strong> <em>I hit a snag reaching my mind (${detail}).</em>`;
+        conversation.scrollTop = conversation.scrollHeight;
+      }
+    }
+  }
+  if (!bubble) addMessage("Pepper", "Pepper stayed quiet.");
 }
 
 promptForm.addEventListener("submit", async (event) => {
@@ -54,26 +148,26 @@ promptForm.addEventListener("submit", async (event) => {
   const body = {
     prompt,
     mode: modeSelect.value,
+    session: sessionId,
   };
 
-  const res = await fetch("/query", {
+  const res = await fetch("/query/stream", {
     method: "POST",
     headers: { "Content-Type": "application/json" },
     body: JSON.stringify(body),
   });
-  if (!res.ok) {
+  if (!res.ok || !res.body) {
     addMessage("Pepper", "I hit a snag reaching my mind.");
     return;
   }
-  const data = await res.json();
-  addMessage("Pepper", data.response);
+  await renderStream(res.body);
 });
 
 rememberForm.addEventListener("submit", async (event) => {
   event.preventDefault();
   const text = memoryText.value.trim();
   if (!text) return;
-  const body = { text, category: memoryCategory.value };
+  const body = { text, category: memoryCategory.value, pinned: memoryPinned.checked };
 
   const res = await fetch("/remember", {
     method: "POST",
@@ -82,9 +176,12 @@ rememberForm.addEventListener("submit", async (event) => {
   });
   if (res.ok) {
     memoryText.value = "";
+    memoryPinned.checked = false;
     await loadMemories();
   }
 });
 
 fetchStatus();
+setInterval(fetchStatus, 10000);
 loadMemories();
+watchMemories();
@@ -0,0 +1,349 @@
+"""Semantic recall over Pepper memories using local embeddings.
+
+Embeddings live in a contiguous ``float32`` matrix that is memory-mapped
+from ``pepper_memory.vectors.f32`` (one row per memory) with a parallel
+``int64`` array of journal sequence numbers.  A query is scored with one
+matrix-vector product and ``argpartition`` top-K, so recall never builds
+Python objects for memories that are not returned.
+
+Several worker processes may share the files.  Appends and pruning hold
+an exclusive :class:`~app.locking.ProcessLock` on
+``pepper_memory.vectors.lock`` and re-read the row count from the ids
+file first, so writers never overwrite each other's rows; searches take
+the lock shared and pick up rows other processes appended.
+
+:mod:`numpy` is optional; without it semantic recall is simply disabled.
+It and :mod:`requests` are imported on first use, so processes that never
+enable semantic recall do not pay for them at startup.
+"""
+from __future__ import annotations
+
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import hashlib
+import json
+import logging
+import threading
+
+from .locking import ProcessLock
+from .search import tokenize
+
+# Bound by _load_numpy() / OllamaEmbedder on first use.
+np: Any = None
+requests: Any = None
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _load_numpy() -> bool:
+    """Import numpy on demand; ``False`` when it is not installed."""
+    global np
+    if np is None:
+        try:
+            import numpy  # type: ignore
+        except ImportError:  # pragma: no cover - optional dependency
+            return False
+        np = numpy
+    return True
+
+# Rows reserved up front and on every growth step of the mapped matrix.
+_MIN_CAPACITY = 1024
+
+
+class Embedder:
+    """Interface for local embedding providers."""
+
+    name = "base"
+    dim = 0
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        """Return an ``(len(texts), dim)`` float32 array of unit vectors."""
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """Deterministic feature-hashing embedder.
+
+    Needs no model and no network, which makes it suitable for tests and
+    as a fallback when Ollama is unavailable.
+    """
+
+    def __init__(self, dim: int = 256) -> None:
+        if not _load_numpy():
+            raise RuntimeError("numpy is required for embeddings")
+        self.dim = dim
+        self.name = f"hashing:{dim}"
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in tokenize(text):
+                digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                matrix[row, (value >> 1) % self.dim] += sign
+        return _normalise(matrix)
+
+
+class OllamaEmbedder(Embedder):
+    """Embeddings from a local Ollama daemon (``/api/embed``)."""
+
+    def __init__(
+        self,
+        model: str = "nomic-embed-text",
+        base_url: str = "http://127.0.0.1:11434",
+        timeout: float = 30.0,
+    ) -> None:
+        global requests
+        if requests is None:
+            try:
+                import requests  # type: ignore
+            except ImportError:  # pragma: no cover - optional dependency
+                raise RuntimeError("requests is required for Ollama embeddings") from None
+        if not _load_numpy():
+            raise RuntimeError("numpy is required for embeddings")
+        self.model = model
+        self.name = f"ollama:{model}"
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.dim = 0
+        self._session = requests.Session()
+
+    def embed(self, texts: Sequence[str]) -> "np.ndarray":
+        response = self._session.post(
+            f"{self.base_url}/api/embed",
+            json={"model": self.model, "input": list(texts)},
+            timeout=self.timeout,
+        )
+        response.raise_for_status()
+        matrix = np.asarray(response.json().get("embeddings") or [], dtype=np.float32)
+        if matrix.shape[0] != len(texts):
+            raise RuntimeError("Ollama returned an unexpected number of embeddings")
+        self.dim = int(matrix.shape[1])
+        return _normalise(matrix)
+
+
+def _normalise(matrix: "np.ndarray") -> "np.ndarray":
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32, copy=False)
+
+
+def make_embedder(config: Dict[str, Any]) -> Optional[Embedder]:
+    """Build the embedder selected in *config*, or ``None`` if disabled."""
+
+    if not config.get("semantic_recall", False):
+        return None
+    if not _load_numpy():
+        LOGGER.warning("numpy is not installed; semantic recall disabled")
+        return None
+    provider = config.get("embedder", "hashing")
+    if provider == "ollama":
+        try:
+            return OllamaEmbedder(
+                model=config.get("embedding_model", "nomic-embed-text"),
+                base_url=config.get("ollama_url", "http://127.0.0.1:11434"),
+            )
+        except RuntimeError as exc:
+            LOGGER.warning("Ollama embedder unavailable (%s); using hashing embedder", exc)
+    return HashingEmbedder(dim=int(config.get("embedding_dim", 256)))
+
+
+class VectorIndex:
+    """Memory-mapped embedding matrix keyed by journal sequence number."""
+
+    def __init__(self, base_path: Path, embedder: Embedder) -> None:
+        if not _load_numpy():
+            raise RuntimeError("numpy is required for the vector index")
+        base_path = Path(base_path)
+        self.matrix_path = base_path.with_suffix(".vectors.f32")
+        self.ids_path = base_path.with_suffix(".vectors.ids")
+        self.meta_path = base_path.with_suffix(".vectors.json")
+        self.embedder = embedder
+        self.dim = 0
+        self.count = 0
+        self._capacity = 0
+        self._max_seq = 0
+        self._matrix: Optional["np.memmap"] = None
+        self._ids: Optional["np.memmap"] = None
+        self._lock = threading.Lock()
+        # Its own lock file: flock is per open file, so sharing the store's
+        # descriptor would let one thread's unlock release another's lock.
+        self._process_lock = ProcessLock(base_path.with_suffix(".vectors.lock"))
+        with self._process_lock.shared():
+            self._open()
+
+    # ------------------------------------------------------------------
+    def _open(self) -> None:
+        meta: Dict[str, Any] = {}
+        if self.meta_path.exists():
+            try:
+                meta = json.loads(self.meta_path.read_text("utf-8"))
+            except json.JSONDecodeError:
+                meta = {}
+        if meta.get("embedder") != self.embedder.name or not self.matrix_path.exists():
+            # Different provider (or first run): vectors are not comparable.
+            self.dim = 0
+            return
+        self.dim = int(meta.get("dim", 0))
+        if not self.dim:
+            return
+        self._capacity = self.ids_path.stat().st_size // 8
+        self._map()
+        self.count = int(np.count_nonzero(self._ids))
+        self._max_seq = int(self._ids[: self.count].max()) if self.count else 0
+
+    def _refresh(self) -> None:
+        """Pick up rows, growth or pruning done by other processes.
+
+        Callers hold ``_lock`` and the process lock.  Rows are appended
+        contiguously and seq numbers are never 0, so the first zero id
+        marks the end.
+        """
+        if not self.dim:
+            self._open()
+            return
+        capacity = self.ids_path.stat().st_size // 8
+        if capacity != self._capacity:
+            self._matrix = self._ids = None
+            self._capacity = capacity
+            self._map()
+        count = self.count
+        if count > capacity or (count and self._ids[count - 1] == 0):
+            # Another process pruned: recount from scratch.
+            count = int(np.count_nonzero(self._ids))
+            self._max_seq = int(self._ids[:count].max()) if count else 0
+        if count < capacity and self._ids[count] != 0:
+            tail = np.asarray(self._ids[count:])
+            zeros = np.flatnonzero(tail == 0)
+            added = int(zeros[0]) if len(zeros) else len(tail)
+            self._max_seq = max(self._max_seq, int(tail[:added].max()))
+            count += added
+        self.count = count
+
+    def _map(self) -> None:
+        self._matrix = np.memmap(
+            self.matrix_path, dtype=np.float32, mode="r+", shape=(self._capacity, self.dim)
+        )
+        self._ids = np.memmap(self.ids_path, dtype=np.int64, mode="r+", shape=(self._capacity,))
+
+    def _create(self, dim: int, capacity: int) -> None:
+        self.dim = dim
+        self._capacity = max(_MIN_CAPACITY, capacity)
+        for path, itemsize in ((self.matrix_path, 4 * dim), (self.ids_path, 8)):
+            with path.open("wb") as handle:
+                handle.truncate(self._capacity * itemsize)
+        self.meta_path.write_text(
+            json.dumps({"embedder": self.embedder.name, "dim": dim}), encoding="utf-8"
+        )
+        self.count = 0
+        self._max_seq = 0
+        self._map()
+
+    def _grow(self, needed: int) -> None:
+        capacity = self._capacity
+        while capacity < needed:
+            capacity = max(_MIN_CAPACITY, capacity * 2)
+        self._flush_maps()
+        self._matrix = self._ids = None
+        for path, itemsize in ((self.matrix_path, 4 * self.dim), (self.ids_path, 8)):
+            with path.open("r+b") as handle:
+                handle.truncate(capacity * itemsize)
+        self._capacity = capacity
+        self._map()
+
+    def _flush_maps(self) -> None:
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._ids.flush()
+
+    # ------------------------------------------------------------------
+    @property
+    def last_seq(self) -> int:
+        """Highest sequence number that has a stored vector."""
+        return self._max_seq
+
+    def add_batch(self, seqs: Sequence[int], texts: Sequence[str]) -> None:
+        """Embed *texts* in one provider call and append their rows.
+
+        Seqs another process has embedded in the meantime are skipped.
+        """
+        if not texts:
+            return
+        vectors = self.embedder.embed(texts)
+        seq_array = np.asarray(seqs, dtype=np.int64)
+        with self._lock, self._process_lock.exclusive():
+            self._refresh()
+            if not self.dim:
+                self._create(int(vectors.shape[1]), len(texts))
+            if vectors.shape[1] != self.dim:
+                raise RuntimeError("Embedding dimension changed; rebuild the vector index")
+            if self.count:
+                fresh = ~np.isin(seq_array, self._ids[: self.count])
+                vectors, seq_array = vectors[fresh], seq_array[fresh]
+            if not len(seq_array):
+                return
+            end = self.count + len(seq_array)
+            if end > self._capacity:
+                self._grow(end)
+            self._matrix[self.count : end] = vectors
+            self._ids[self.count : end] = seq_array
+            self.count = end
+            self._max_seq = max(self._max_seq, int(seq_array.max()))
+
+    def search(self, query: str, k: int = 6) -> List[Tuple[int, float]]:
+        """Return up to *k* ``(seq, cosine)`` pairs, best first."""
+        if k <= 0:
+            return []
+        with self._lock, self._process_lock.shared():
+            self._refresh()
+            if not self.count:
+                return []
+        vector = self.embedder.embed([query])[0]
+        with self._lock, self._process_lock.shared():
+            self._refresh()
+            if not self.count:
+                return []
+            scores = self._matrix[: self.count] @ vector
+            k = min(k, self.count)
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(self._ids[row]), float(scores[row])) for row in top]
+
+    def prune(self, min_seq: int) -> None:
+        """Drop rows for memories older than *min_seq* (compaction only)."""
+        with self._lock, self._process_lock.exclusive():
+            self._refresh()
+            if not self.count:
+                return
+            ids = np.asarray(self._ids[: self.count])
+            # Processes append in their own order, so ids are not sorted.
+            keep_rows = np.flatnonzero(ids >= min_seq)
+            keep = len(keep_rows)
+            if keep == self.count:
+                return
+            self._matrix[:keep] = self._matrix[keep_rows]
+            self._ids[:keep] = ids[keep_rows]
+            self._ids[keep : self.count] = 0
+            self.count = keep
+            self._max_seq = int(ids[keep_rows].max()) if keep else 0
+
+    def flush(self) -> None:
+        """Write dirty pages of the mapped files back to disk."""
+        with self._lock:
+            self._flush_maps()
+
+    def close(self) -> None:
+        """Flush the mapped files and release the lock file."""
+        with self._lock:
+            self._flush_maps()
+            self._process_lock.close()
+
+
+__all__ = [
+    "Embedder",
+    "HashingEmbedder",
+    "OllamaEmbedder",
+    "VectorIndex",
+    "make_embedder",
+]
@@ -1,45 +1,325 @@
-"""Offline text-to-speech integration via pyttsx3."""
+"""Offline text-to-speech via pyttsx3, driven by one background worker.
+
+pyttsx3 engines are not thread-safe and ``runAndWait`` blocks for the
+whole utterance, so a single :class:`VoiceWorker` thread owns the engine
+and speaks jobs taken from a bounded priority queue.  Callers get a job id
+back immediately.  Submitting with ``interrupt=True`` cancels everything
+still queued and cuts off the current utterance (barge-in), which is what
+a fresh reply wants.
+
+Phrases that repeat (the boot greeting, heartbeat lines) can be
+synthesised once into an on-disk cache of WAV files and replayed through
+:mod:`simpleaudio` when it is installed.
+
+If the engine cannot be initialised, the worker marks itself unavailable
+and fails every job instead of leaving it queued.  :func:`speak_text`
+keeps the old one-call helper working on top of a process-wide worker.
+"""
 from __future__ import annotations
 
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from itertools import count
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+import hashlib
 import logging
-from typing import Optional
+import os
+import queue
+import threading
+import time
+import uuid
 
 try:
     import pyttsx3  # type: ignore
 except ImportError:  # pragma: no cover - optional dependency
     pyttsx3 = None
 
+try:
+    import simpleaudio  # type: ignore
+except ImportError:  # pragma: no cover - optional dependency
+    simpleaudio = None
+
 LOGGER = logging.getLogger(__name__)
 
+DEFAULT_VOICE_CACHE = Path.home() / "bje" / "pepper_dir" / "voice_cache"
+
+PRIORITIES = {"high": 0, "normal": 5, "low": 9}
+
+# Finished jobs kept around for status lookups.
+_JOB_HISTORY = 256
 
-class VoiceSynthesiser:
-    """Wrapper around :mod:`pyttsx3` with graceful fallbacks."""
 
-    def __init__(self) -> None:
-        if pyttsx3 is None:
+class VoiceQueueFull(Exception):
+    """Raised when the speech queue is at capacity."""
+
+
+@dataclass
+class SpeechJob:
+    """One utterance waiting for, or handled by, the voice worker."""
+
+    text: str
+    voice_id: Optional[str] = None
+    priority: int = PRIORITIES["normal"]
+    cache: bool = False
+    id: str = field(default_factory=lambda: uuid.uuid4().hex[:12])
+    status: str = "queued"  # queued | speaking | done | cancelled | failed
+    created: float = field(default_factory=time.time)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "cached": self.cache,
+            "text": self.text,
+            "created": self.created,
+        }
+
+
+class VoiceWorker(threading.Thread):
+    """Owns the pyttsx3 engine and speaks queued jobs one at a time."""
+
+    def __init__(
+        self,
+        max_queue: int = 16,
+        cache_dir: Optional[Path] = DEFAULT_VOICE_CACHE,
+        cache_phrases: Iterable[str] = (),
+        rate: Optional[int] = None,
+    ) -> None:
+        super().__init__(daemon=True, name="pepper-voice")
+        self.available = pyttsx3 is not None
+        if not self.available:
             LOGGER.warning("pyttsx3 is not installed; voice output disabled")
-            self.engine = None
-        else:
-            self.engine = pyttsx3.init()
+        self.cache_dir = Path(cache_dir) if cache_dir and simpleaudio is not None else None
+        if cache_dir and simpleaudio is None and self.available:
+            LOGGER.info("simpleaudio is not installed; cached phrases are spoken live instead")
+        self.cache_phrases = {phrase for phrase in cache_phrases if phrase}
+        self.rate = rate
+        self._queue: "queue.PriorityQueue[Any]" = queue.PriorityQueue(maxsize=max(1, max_queue))
+        self._order = count()
+        self._jobs: "OrderedDict[str, SpeechJob]" = OrderedDict()
+        self._current: Optional[SpeechJob] = None
+        self._lock = threading.Lock()
+        self._engine: Any = None
+        self._default_voice: Optional[str] = None
+        self._ready = threading.Event()
+
+    # ------------------------------------------------------------------
+    def submit(
+        self,
+        text: str,
+        voice_id: Optional[str] = None,
+        priority: int = PRIORITIES["normal"],
+        interrupt: bool = False,
+        cache: bool = False,
+    ) -> SpeechJob:
+        """Queue *text* and return its job without waiting for speech.
 
-    def speak(self, text: str, voice_id: Optional[str] = None) -> None:
-        """Speak *text* aloud if the engine is available."""
+        With *interrupt*, queued jobs are cancelled and the utterance in
+        progress is cut off first.  Raises :class:`VoiceQueueFull` when
+        the queue is at capacity.
+        """
+        job = SpeechJob(
+            text=text,
+            voice_id=voice_id,
+            priority=priority,
+            cache=cache or text in self.cache_phrases,
+        )
+        with self._lock:
+            if interrupt:
+                self._cancel_all()
+            try:
+                self._queue.put_nowait((job.priority, next(self._order), job))
+            except queue.Full:
+                raise VoiceQueueFull(f"{self._queue.maxsize} utterances already queued") from None
+            self._remember(job)
+        return job
 
-        if not text or self.engine is None:
+    def cancel(self, job_id: str) -> Optional[SpeechJob]:
+        """Cancel one job; a job being spoken is cut off."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status in ("queued", "speaking"):
+                job.status = "cancelled"
+        return job
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the engine is initialised (or failed to); ``available`` says which."""
+        return self._ready.wait(timeout)
+
+    def job(self, job_id: str) -> Optional[SpeechJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "available": self.available,
+                "queued": self._queue.qsize(),
+                "speaking": self._current.id if self._current else None,
+                "cache": str(self.cache_dir) if self.cache_dir else None,
+            }
+
+    def stop(self) -> None:
+        with self._lock:
+            self._cancel_all()
+            self._queue.put_nowait((-1, next(self._order), None))
+
+    def _cancel_all(self) -> None:
+        while True:
+            try:
+                _, _, job = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is not None:
+                job.status = "cancelled"
+        if self._current is not None:
+            self._current.status = "cancelled"
+
+    def _remember(self, job: SpeechJob) -> None:
+        self._jobs[job.id] = job
+        while len(self._jobs) > _JOB_HISTORY:
+            self._jobs.popitem(last=False)
+
+    # ------------------------------------------------------------------
+    def run(self) -> None:  # pragma: no cover - background behaviour
+        try:
+            self._start_engine()
+        finally:
+            self._ready.set()
+        while True:
+            _, _, job = self._queue.get()
+            if job is None:
+                break
+            with self._lock:
+                if job.status != "queued":
+                    continue
+                if self._engine is None:
+                    job.status = "failed"
+                    continue
+                job.status = "speaking"
+                self._current = job
+            try:
+                self._speak(job)
+            except Exception:
+                LOGGER.exception("Speech job %s failed", job.id)
+                job.status = "failed"
+            finally:
+                with self._lock:
+                    self._current = None
+                    if job.status == "speaking":
+                        job.status = "done"
+
+    def _start_engine(self) -> None:
+        if not self.available:
             return
-        if voice_id:
-            self.engine.setProperty("voice", voice_id)
-        self.engine.say(text)
-        self.engine.runAndWait()
+        try:
+            self._engine = pyttsx3.init()
+            if self.rate:
+                self._engine.setProperty("rate", self.rate)
+            self._default_voice = self._engine.getProperty("voice")
+            self._engine.connect("started-word", self._on_word)
+        except Exception:
+            # e.g. no speech driver (espeak, NSSpeechSynthesizer, SAPI5) installed.
+            LOGGER.exception("Could not initialise pyttsx3; voice output disabled")
+            self._engine = None
+            self.available = False
+            return
+        for phrase in sorted(self.cache_phrases):
+            try:
+                self._clip(phrase)
+            except Exception:
+                LOGGER.exception("Could not cache speech for %r", phrase[:40])
+
+    def _on_word(self, name: Any, location: int, length: int) -> None:
+        # Runs inside runAndWait on the worker thread, where stop() is safe.
+        job = self._current
+        if job is not None and job.status == "cancelled":
+            self._engine.stop()
+
+    def _speak(self, job: SpeechJob) -> None:
+        self._engine.setProperty("voice", job.voice_id or self._default_voice)
+        clip = self._clip(job.text, job.voice_id) if job.cache else None
+        if clip is None:
+            self._engine.say(job.text)
+            self._engine.runAndWait()
+            return
+        playing = simpleaudio.WaveObject.from_wave_file(str(clip)).play()
+        while playing.is_playing():
+            if job.status == "cancelled":
+                playing.stop()
+                break
+            time.sleep(0.05)
+
+    def _clip(self, text: str, voice_id: Optional[str] = None) -> Optional[Path]:
+        """Return the cached WAV for *text*, synthesising it on a miss."""
+        if self.cache_dir is None or self._engine is None:
+            return None
+        voice = voice_id or self._default_voice or ""
+        digest = hashlib.sha256(f"{voice}\0{self.rate}\0{text}".encode("utf-8")).hexdigest()
+        path = self.cache_dir / f"{digest[:32]}.wav"
+        if path.exists():
+            return path
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp.wav")
+        try:
+            self._engine.setProperty("voice", voice or self._default_voice)
+            self._engine.save_to_file(text, str(tmp))
+            self._engine.runAndWait()
+            os.replace(tmp, path)
+        except OSError as exc:
+            LOGGER.warning("Could not cache speech for %r: %s", text[:40], exc)
+            return None
+        return path
+
+
+# ---------------------------------------------------------------------------
+_WORKER: Optional[VoiceWorker] = None
+_WORKER_LOCK = threading.Lock()
+
 
+def start_worker(**options: Any) -> VoiceWorker:
+    """Start the process-wide :class:`VoiceWorker` with *options*.
 
-VOICE = VoiceSynthesiser()
+    A previous worker is stopped first: pyttsx3 hands every caller the same
+    engine, so only one thread may drive it.
+    """
+    global _WORKER
+    with _WORKER_LOCK:
+        if _WORKER is not None and _WORKER.is_alive():
+            _WORKER.stop()
+        _WORKER = VoiceWorker(**options)
+        _WORKER.start()
+        return _WORKER
 
 
-def speak_text(text: str, voice_id: Optional[str] = None) -> None:
-    """Public helper matching the FastAPI endpoint signature."""
+def speak_text(text: str, voice_id: Optional[str] = None) -> Optional[SpeechJob]:
+    """Queue *text* on the process-wide worker, starting one if needed.
 
-    VOICE.speak(text, voice_id=voice_id)
+    Returns the job without waiting for speech, or ``None`` when there is
+    nothing to say, voice output is unavailable or the queue is full.
+    """
+    if not text:
+        return None
+    with _WORKER_LOCK:
+        worker = _WORKER if _WORKER is not None and _WORKER.is_alive() else None
+    if worker is None:
+        worker = start_worker()
+    if not worker.available:
+        return None
+    try:
+        return worker.submit(text, voice_id=voice_id)
+    except VoiceQueueFull as exc:
+        LOGGER.warning("Dropped speech: %s", exc)
+        return None
 
 
-__all__ = ["speak_text", "VoiceSynthesiser"]
+__all__ = [
+    "PRIORITIES",
+    "SpeechJob",
+    "VoiceQueueFull",
+    "VoiceWorker",
+    "speak_text",
+    "start_worker",
+]
@@ -0,0 +1,144 @@
+"""Memory footprint and serialisation throughput of the in-memory layouts.
+
+Run from ``PepperGrok_v2``::
+
+    python benchmarks/bench_layout.py --sizes 5000 100000 600000
+
+Compares the original layout (a list of ``__dict__`` dataclasses plus an
+id dictionary, serialised with ``asdict``), a list of slotted
+:class:`~app.entry.MemoryEntry` objects, and :class:`~app.columns.MemoryColumns`.
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.columns import MemoryColumns  # noqa: E402
+from app.entry import MemoryEntry  # noqa: E402
+
+_WORDS = (
+    "morning tea ritual journal gratitude love hug evening walk garden rain "
+    "music laugh joke play task reminder todo code bug deploy friend family"
+).split()
+_CATEGORIES = ["system", "emotional", "ritual", "light"]
+
+
+@dataclass
+class LegacyEntry:
+    """The pre-columnar entry: a regular dataclass with a ``__dict__``."""
+
+    text: str
+    category: str = "system"
+    id: str = ""
+    ts: float = 0.0
+    pinned: bool = False
+    role: str = "note"
+    source: str = "pepper"
+    conv_id: Optional[str] = None
+
+
+def _dump(data: Any) -> str:
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+
+
+def _lines(count: int) -> List[str]:
+    """Snapshot-style JSON records, so every layout decodes its own strings."""
+    rng = random.Random(count)
+    lines = []
+    for index in range(count):
+        record = {
+            "text": " ".join(rng.choices(_WORDS, k=rng.randint(6, 24))),
+            "category": rng.choice(_CATEGORIES),
+            "id": f"m{index + 1}",
+            "ts": 1.7e9 + index,
+            "role": "user" if index % 2 else "assistant",
+            "conv_id": f"c{index // 20}",
+        }
+        lines.append(_dump(record))
+    return lines
+
+
+def _measure(build: Callable[[], Any]) -> Tuple[Any, float, int]:
+    gc.collect()
+    tracemalloc.start()
+    started = time.perf_counter()
+    built = build()
+    elapsed = time.perf_counter() - started
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return built, elapsed, current
+
+
+def _timed(call: Callable[[], Any], repeat: int = 3) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def _objects(cls: type, lines: List[str]) -> Tuple[List[Any], Dict[str, Any]]:
+    items = [cls(**json.loads(line)) for line in lines]
+    return items, {entry.id: entry for entry in items}
+
+
+def bench(size: int) -> Dict[str, Dict[str, float]]:
+    lines = _lines(size)
+    probes = range(1, size + 1, 97)
+    results: Dict[str, Dict[str, float]] = {}
+
+    for layout, cls, to_dict in (
+        ("dataclass", LegacyEntry, asdict),
+        ("slots", MemoryEntry, MemoryEntry.to_dict),
+    ):
+        (items, by_id), build_s, nbytes = _measure(lambda: _objects(cls, lines))
+        results[layout] = {
+            "build_s": build_s,
+            "heap_mb": nbytes / 1e6,
+            "page15_ms": _timed(lambda: _dump([to_dict(e) for e in items[-15:]])),
+            "snapshot_ms": _timed(lambda: _dump([to_dict(e) for e in items]), 1),
+            "get_us": _timed(lambda: [by_id[f"m{seq}"] for seq in probes]) * 1000 / len(probes),
+        }
+    del items, by_id
+
+    columns, build_s, nbytes = _measure(
+        lambda: MemoryColumns(MemoryEntry(**json.loads(line)) for line in lines)
+    )
+    results["columns"] = {
+        "build_s": build_s,
+        "heap_mb": nbytes / 1e6,
+        "page15_ms": _timed(lambda: columns.tail_json(15)),
+        "snapshot_ms": _timed(lambda: b",".join(columns.iter_json()), 1),
+        "get_us": _timed(lambda: [columns.get(seq) for seq in probes]) * 1000 / len(probes),
+    }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 100000, 600000])
+    args = parser.parse_args()
+
+    columns = ["build_s", "heap_mb", "page15_ms", "snapshot_ms", "get_us"]
+    print(f"{'layout':<10}{'size':>8}" + "".join(f"{name:>13}" for name in columns))
+    for size in args.sizes:
+        for layout, result in bench(size).items():
+            print(
+                f"{layout:<10}{size:>8}" + "".join(f"{result[name]:>13.3f}" for name in columns),
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Size and cold-load time of the JSON and binary memory snapshots.
+
+Run from ``PepperGrok_v2``::
+
+    python benchmarks/bench_snapshot.py --sizes 5000 100000 600000
+
+For each size a synthetic store is written as a JSON snapshot and as
+binary snapshots (uncompressed, zlib and, when ``zstandard`` is installed,
+zstd).  Loading is timed up to the first ``/memories`` page: the JSON path
+parses every row into an entry, and the binary path maps the file and
+views the column buffers in place.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.columns import MemoryColumns  # noqa: E402
+from app.entry import MemoryEntry  # noqa: E402
+from app.memory import entries_from_replay  # noqa: E402
+from app.snapshot import dump_binary, dump_json, read_binary, write_file, zstandard  # noqa: E402
+
+_WORDS = (
+    "morning tea ritual journal gratitude love hug evening walk garden rain "
+    "music laugh joke play task reminder todo code bug deploy friend family"
+).split()
+_CATEGORIES = ["system", "emotional", "ritual", "light"]
+
+
+def _columns(size: int) -> MemoryColumns:
+    rng = random.Random(size)
+    now = time.time()
+    return MemoryColumns(
+        MemoryEntry(
+            text=" ".join(rng.choices(_WORDS, k=rng.randint(6, 24))),
+            category=rng.choice(_CATEGORIES),
+            id=f"m{seq}",
+            ts=now - size + seq,
+            pinned=rng.random() < 0.001,
+            conv_id=f"c{seq // 40}",
+        )
+        for seq in range(1, size + 1)
+    )
+
+
+def _load_json(path: Path) -> MemoryColumns:
+    data = json.loads(path.read_bytes())
+    entries, _ = entries_from_replay(data["seq"], data["memories"], [])
+    columns = MemoryColumns(entries)
+    columns.tail(15)
+    return columns
+
+
+def _load_binary(path: Path) -> MemoryColumns:
+    _, columns = read_binary(path)
+    columns.tail(15)
+    return columns
+
+
+def bench(size: int, directory: Path) -> Dict[str, Dict[str, float]]:
+    columns = _columns(size)
+    results: Dict[str, Dict[str, float]] = {}
+    codecs: Dict[str, Optional[str]] = {"binary": None, "zlib": "zlib"}
+    if zstandard is not None:
+        codecs["zstd"] = "zstd"
+    targets = {"json": directory / f"{size}.json"}
+    started = time.perf_counter()
+    write_file(targets["json"], lambda handle: dump_json(handle, size, columns.iter_json()))
+    write_s = {"json": time.perf_counter() - started}
+    for name, codec in codecs.items():
+        targets[name] = directory / f"{size}.{name}.snap"
+        started = time.perf_counter()
+        write_file(targets[name], lambda handle: dump_binary(handle, size, columns, codec))
+        write_s[name] = time.perf_counter() - started
+    for name, path in targets.items():
+        load = _load_json if name == "json" else _load_binary
+        started = time.perf_counter()
+        loaded = load(path)
+        assert len(loaded) == size
+        results[name] = {
+            "mb": path.stat().st_size / 1e6,
+            "write_ms": write_s[name] * 1000,
+            "load_ms": (time.perf_counter() - started) * 1000,
+        }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 100000, 600000])
+    args = parser.parse_args()
+
+    columns = ["mb", "write_ms", "load_ms"]
+    print(f"{'format':<10}{'size':>8}" + "".join(f"{name:>13}" for name in columns))
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in args.sizes:
+            for name, result in bench(size, Path(tmp)).items():
+                print(
+                    f"{name:<10}{size:>8}" + "".join(f"{result[key]:>13.3f}" for key in columns),
+                    flush=True,
+                )
+
+
+if __name__ == "__main__":
+    main()
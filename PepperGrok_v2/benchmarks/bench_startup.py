@@ -0,0 +1,114 @@
+"""Startup latency of the FastAPI bridge.
+
+Run from ``PepperGrok_v2``::
+
+    python benchmarks/bench_startup.py --memories 5000 --repeat 5
+
+Each run uses a temporary ``HOME`` holding a memory store seeded with
+``--memories`` synthetic entries, and reports the median of:
+
+* ``python``: bare interpreter start, the floor for everything below;
+* ``import``: ``import app.server`` in a fresh interpreter;
+* ``status``: launching uvicorn until ``/status`` first answers;
+* ``memories``: launching uvicorn until ``/memories`` first answers,
+  which needs the memory store fully loaded.
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import httpx
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.memory import MemoryStore  # noqa: E402
+
+_WORDS = (
+    "morning tea ritual journal gratitude love hug evening walk garden rain "
+    "music laugh joke play task reminder todo code bug deploy friend family"
+).split()
+
+
+def _seed(home: Path, count: int) -> None:
+    path = home / "bje" / "pepper_dir" / "identity" / "pepper_memory.json"
+    store = MemoryStore(path=path, max_memories=max(count, 1))
+    rng = random.Random(count)
+    for start in range(0, count, 1000):
+        store.add_many(
+            {"text": " ".join(rng.choices(_WORDS, k=rng.randint(6, 24)))}
+            for _ in range(min(1000, count - start))
+        )
+    store.compact()
+    store.close()
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _run(code: str, env: Dict[str, str]) -> float:
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True)
+    return time.perf_counter() - started
+
+
+def _first_response(route: str, env: Dict[str, str], timeout: float = 60.0) -> float:
+    port = _free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT,
+        env=env,
+    )
+    try:
+        with httpx.Client(timeout=timeout) as client:
+            while time.perf_counter() - started < timeout:
+                try:
+                    if client.get(f"http://127.0.0.1:{port}{route}").status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.TransportError:
+                    pass
+                time.sleep(0.005)
+        raise TimeoutError(f"{route} did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--memories", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        home = Path(tmp)
+        _seed(home, args.memories)
+        env = dict(os.environ, HOME=str(home), PYTHONDONTWRITEBYTECODE="1")
+        samples: Dict[str, List[float]] = {"python": [], "import": [], "status": [], "memories": []}
+        for _ in range(args.repeat):
+            samples["python"].append(_run("pass", env))
+            samples["import"].append(_run("import app.server", env))
+            samples["status"].append(_first_response("/status", env))
+            samples["memories"].append(_first_response("/memories", env))
+
+    print(f"{'phase':<10}{'median_ms':>12}{'min_ms':>10}   ({args.memories} memories)")
+    for phase, values in samples.items():
+        print(f"{phase:<10}{statistics.median(values) * 1000:>12.1f}{min(values) * 1000:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Compare the JSON and SQLite memory back-ends.
+
+Run from ``PepperGrok_v2``::
+
+    python benchmarks/bench_storage.py --sizes 5000 100000 600000
+
+For each back-end and size the store is bulk-loaded with synthetic
+memories in a temporary directory, then timed on single adds, ``list``,
+``search``, ``pinned``, a cold re-open, and reads running concurrently
+with a writer.  The JSON back-end rewrites its whole snapshot at every
+compaction, so its bulk load grows quadratically; expect the 600k JSON
+run to take a long time (``--backends sqlite`` skips it).
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.memory import BaseMemoryStore, MemoryStore  # noqa: E402
+from app.sqlite_store import SqliteMemoryStore  # noqa: E402
+
+_COMMON = (
+    "morning tea ritual journal gratitude love hug evening walk garden rain "
+    "music laugh joke play task reminder todo code bug deploy friend family "
+    "coffee dream sleep book film travel ocean mountain city quiet storm"
+).split()
+# Zipf-like vocabulary: a few common words and a long tail of rare ones.
+_WORDS = _COMMON + [f"w{index}" for index in range(20000)]
+_CUM_WEIGHTS = list(itertools.accumulate(1.0 / rank for rank in range(1, len(_WORDS) + 1)))
+_QUERIES = ["morning tea", "gratitude journal", "deploy bug w120", "w4051 storm", "w77 w9000"]
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choices(_WORDS, cum_weights=_CUM_WEIGHTS, k=words))
+
+
+def _records(count: int, rng: random.Random) -> List[Dict[str, object]]:
+    return [
+        {
+            "text": _text(rng, rng.randint(6, 24)),
+            "pinned": rng.random() < 0.001,
+            "conv_id": f"c{index // 20}",
+        }
+        for index in range(count)
+    ]
+
+
+def _open(backend: str, root: Path, size: int, compact_every: int) -> BaseMemoryStore:
+    if backend == "json":
+        return MemoryStore(
+            root / "pepper_memory.json", max_memories=size * 2, compact_every=compact_every
+        )
+    return SqliteMemoryStore(
+        root / "pepper_memory.db", max_memories=size * 2, compact_every=compact_every
+    )
+
+
+def _per_call_ms(call: Callable[[], object], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def _p(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(pct * len(ordered)))]
+
+
+def _disk_bytes(root: Path) -> int:
+    return sum(path.stat().st_size for path in root.iterdir() if path.is_file())
+
+
+def bench(backend: str, size: int, compact_every: int, readers: int) -> Dict[str, float]:
+    rng = random.Random(size)
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        store = _open(backend, root, size, compact_every)
+        records = _records(size, rng)
+        started = time.perf_counter()
+        for start in range(0, size, 1000):
+            store.add_many(records[start : start + 1000])
+        load_s = time.perf_counter() - started
+
+        add_ms = _per_call_ms(lambda: store.add(_text(rng, 12)), 200)
+        list_ms = _per_call_ms(lambda: store.list(15), 200)
+        search_ms = _per_call_ms(lambda: store.search(rng.choice(_QUERIES), 6), 200)
+        pinned_ms = _per_call_ms(store.pinned, 50)
+
+        stop = threading.Event()
+        reads = [0] * readers
+
+        def reader(slot: int) -> None:
+            while not stop.is_set():
+                store.list(15)
+                store.search(rng.choice(_QUERIES), 6)
+                reads[slot] += 1
+
+        threads = [threading.Thread(target=reader, args=(slot,)) for slot in range(readers)]
+        for thread in threads:
+            thread.start()
+        started = time.perf_counter()
+        for _ in range(20):
+            store.add_many(_records(50, rng))
+        mixed_s = time.perf_counter() - started
+        stop.set()
+        for thread in threads:
+            thread.join()
+        store.close()
+
+        started = time.perf_counter()
+        _open(backend, root, size, compact_every).close()
+        reopen_s = time.perf_counter() - started
+
+        return {
+            "load_s": load_s,
+            "add_p50_ms": _p(add_ms, 0.5),
+            "add_p99_ms": _p(add_ms, 0.99),
+            "list_ms": statistics.mean(list_ms),
+            "search_ms": statistics.mean(search_ms),
+            "pinned_ms": statistics.mean(pinned_ms),
+            "reads_per_s": sum(reads) / mixed_s,
+            "reopen_s": reopen_s,
+            "disk_mb": _disk_bytes(root) / 1e6,
+        }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5000, 100000, 600000])
+    parser.add_argument("--backends", nargs="+", default=["json", "sqlite"])
+    parser.add_argument("--compact-every", type=int, default=1000)
+    parser.add_argument("--readers", type=int, default=4, help="Reader threads in the mixed test")
+    args = parser.parse_args()
+
+    columns = [
+        "load_s", "add_p50_ms", "add_p99_ms", "list_ms", "search_ms",
+        "pinned_ms", "reads_per_s", "reopen_s", "disk_mb",
+    ]
+    print(f"{'backend':<8}{'size':>8}" + "".join(f"{name:>13}" for name in columns))
+    for size in args.sizes:
+        for backend in args.backends:
+            result = bench(backend, size, args.compact_every, args.readers)
+            print(
+                f"{backend:<8}{size:>8}"
+                + "".join(f"{result[name]:>13.3f}" for name in columns),
+                flush=True,
+            )
+
+
+if __name__ == "__main__":
+    main()
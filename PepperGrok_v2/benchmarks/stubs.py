@@ -0,0 +1,186 @@
+"""Deterministic local stand-ins for the Grok and Ollama HTTP APIs.
+
+:class:`StubBackend` serves ``POST /chat/completions`` (Grok, including
+SSE streaming) plus ``POST /api/generate`` and ``POST /api/chat`` (Ollama,
+including NDJSON streaming) from one threaded HTTP server.  Replies depend only on
+the prompt and every request sleeps for a fixed latency, so benchmark
+runs are reproducible offline.  :meth:`StubBackend.fail_next` scripts error
+responses and :attr:`StubBackend.connections` counts accepted TCP
+connections, which is what the client tests assert on.
+
+Run standalone to point a dev server at it::
+
+    python benchmarks/stubs.py --port 11434 --latency-ms 50
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+
+def stub_reply(prompt: str, words: int = 24) -> str:
+    """The reply every stub endpoint returns for *prompt*."""
+    digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+    return " ".join(f"w{digest[index % 56 : index % 56 + 8]}" for index in range(words))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_Server"
+    protocol_version = "HTTP/1.1"
+    # Send headers and body in one segment; split writes plus delayed ACKs
+    # would add ~40 ms to every keep-alive request.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - stdlib signature
+        pass
+
+    def setup(self) -> None:
+        super().setup()
+        self.server.connected()
+
+    def do_POST(self) -> None:  # noqa: N802 - stdlib naming
+        length = int(self.headers.get("Content-Length") or 0)
+        payload: Dict[str, Any] = json.loads(self.rfile.read(length) or b"{}")
+        self.server.count()
+        time.sleep(self.server.latency)
+        failure = self.server.next_failure()
+        if failure is not None:
+            status, retry_after = failure
+            headers = {} if retry_after is None else {"Retry-After": str(retry_after)}
+            body = json.dumps({"error": {"code": status, "message": "scripted stub failure"}}).encode()
+            self._send([body], "application/json", status, headers)
+            return
+        if self.path.endswith("/chat/completions"):
+            messages = payload.get("messages") or [{}]
+            reply = stub_reply(messages[-1].get("content", ""), self.server.words)
+            if payload.get("stream"):
+                frames = [
+                    b"data: " + json.dumps({"choices": [{"delta": {"content": word + " "}}]}).encode() + b"\n\n"
+                    for word in reply.split()
+                ]
+                self._send(frames + [b"data: [DONE]\n\n"], "text/event-stream")
+            else:
+                body = {"choices": [{"message": {"role": "assistant", "content": reply}}]}
+                self._send([json.dumps(body).encode()], "application/json")
+        elif self.path == "/api/generate":
+            reply = stub_reply(payload.get("prompt", ""), self.server.words) if payload.get("prompt") else ""
+            if payload.get("stream"):
+                lines = [json.dumps({"response": word + " ", "done": False}).encode() + b"\n" for word in reply.split()]
+                self._send(lines + [b'{"response":"","done":true}\n'], "application/x-ndjson")
+            else:
+                self._send([json.dumps({"response": reply, "done": True}).encode()], "application/json")
+        elif self.path == "/api/chat":
+            messages = payload.get("messages") or [{}]
+            reply = stub_reply(messages[-1].get("content", ""), self.server.words)
+            if payload.get("stream"):
+                lines = [
+                    json.dumps({"message": {"role": "assistant", "content": word + " "}, "done": False}).encode() + b"\n"
+                    for word in reply.split()
+                ]
+                self._send(lines + [b'{"message":{"role":"assistant","content":""},"done":true}\n'], "application/x-ndjson")
+            else:
+                body = {"message": {"role": "assistant", "content": reply}, "done": True}
+                self._send([json.dumps(body).encode()], "application/json")
+        else:
+            self.send_error(404)
+
+    def _send(
+        self,
+        chunks: List[bytes],
+        content_type: str,
+        status: int = 200,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> None:
+        body = b"".join(chunks)
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, latency: float, words: int) -> None:
+        super().__init__(("127.0.0.1", port), _Handler)
+        self.latency = latency
+        self.words = words
+        self.requests = 0
+        self.connections = 0
+        self.failures: Deque[Tuple[int, Optional[float]]] = deque()
+        self._lock = threading.Lock()
+
+    def count(self) -> None:
+        with self._lock:
+            self.requests += 1
+
+    def connected(self) -> None:
+        with self._lock:
+            self.connections += 1
+
+    def next_failure(self) -> Optional[Tuple[int, Optional[float]]]:
+        with self._lock:
+            return self.failures.popleft() if self.failures else None
+
+
+class StubBackend:
+    """Grok + Ollama stub on ``127.0.0.1`` with a fixed per-request latency."""
+
+    def __init__(self, latency_ms: float = 20.0, words: int = 24, port: int = 0) -> None:
+        self._server = _Server(port, latency_ms / 1000.0, words)
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    @property
+    def connections(self) -> int:
+        """TCP connections accepted so far; keep-alive clients reuse one."""
+        return self._server.connections
+
+    def fail_next(self, *statuses: int, retry_after: Optional[float] = None) -> None:
+        """Answer the next requests with *statuses*, in order, then recover."""
+        with self._server._lock:
+            self._server.failures.extend((status, retry_after) for status in statuses)
+
+    def __enter__(self) -> "StubBackend":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--words", type=int, default=24)
+    args = parser.parse_args()
+    with StubBackend(args.latency_ms, args.words, args.port) as stub:
+        print(f"Stub Grok/Ollama listening on {stub.url} (Grok base URL: {stub.url}/v1)")
+        try:
+            threading.Event().wait()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""Benchmark suite for the memory, prompt and request hot paths.
+
+Run from ``PepperGrok_v2``::
+
+    python benchmarks/suite.py --output results.json
+    python benchmarks/suite.py --only memory asgi --compare results.json
+
+Groups (all by default):
+
+* ``memory``: ``MemoryStore.add``, ``list`` and a cold load at each of
+  ``--sizes``;
+* ``prompt``: ``build_prompt`` assembly for 6 and 24 memories;
+* ``asgi``: ``/remember`` and ``/query`` (Grok and Ollama routes) through
+  an in-process ASGI client, reporting throughput and latency percentiles;
+* ``migrate``: ``migrate_openai.py`` on a synthetic ``conversations.json``.
+
+Grok and Ollama are replaced by :class:`stubs.StubBackend` with
+``--latency-ms`` per call, and everything runs under a temporary ``HOME``,
+so results are reproducible offline and never touch real memories.
+Results are written as JSON; ``--compare`` prints the ratio of each
+metric to an earlier results file.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from stubs import StubBackend  # noqa: E402
+
+# app.* is imported inside the groups, after HOME points at a scratch
+# directory, because the default memory path is resolved at import time.
+
+_WORDS = (
+    "morning tea ritual journal gratitude love hug evening walk garden rain "
+    "music laugh joke play task reminder todo code bug deploy friend family"
+).split()
+
+
+def _text(rng: random.Random) -> str:
+    return " ".join(rng.choices(_WORDS, k=rng.randint(6, 24)))
+
+
+def _timed(call: Callable[[], Any], repeat: int) -> List[float]:
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pick(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000
+
+    return {
+        "p50_ms": round(pick(0.50), 3),
+        "p90_ms": round(pick(0.90), 3),
+        "p99_ms": round(pick(0.99), 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+# ---------------------------------------------------------------------------
+def bench_memory(sizes: List[int], scratch: Path) -> Dict[str, Any]:
+    from app.memory import MemoryStore
+
+    results: Dict[str, Any] = {}
+    for size in sizes:
+        rng = random.Random(size)
+        path = scratch / f"memory-{size}" / "pepper_memory.json"
+        store = MemoryStore(path=path, max_memories=size, compact_every=max(1000, size))
+        for start in range(0, size, 5000):
+            store.add_many({"text": _text(rng)} for _ in range(min(5000, size - start)))
+        store.compact()
+        add = _timed(lambda: store.add(_text(rng)), 200)
+        listing = _timed(lambda: store.list(limit=15), 200)
+        store.close()
+        load = _timed(lambda: MemoryStore(path=path, max_memories=size).close(), 3)
+        results[str(size)] = {
+            "add_p50_us": round(statistics.median(add) * 1e6, 2),
+            "list15_p50_us": round(statistics.median(listing) * 1e6, 2),
+            "load_ms": round(min(load) * 1000, 2),
+        }
+    return results
+
+
+def bench_prompt() -> Dict[str, Any]:
+    from app.bridge import build_prompt
+    from app.memory import MemoryEntry
+
+    rng = random.Random(7)
+    results: Dict[str, Any] = {}
+    for count in (6, 24):
+        memories = [
+            MemoryEntry(text=_text(rng), category=rng.choice(["system", "emotional", "ritual"]), id=f"m{i}")
+            for i in range(count)
+        ]
+        samples = _timed(lambda: build_prompt("tell me about my morning tea", memories), 500)
+        results[f"build_prompt_{count}_us"] = round(statistics.median(samples) * 1e6, 2)
+    return results
+
+
+async def _drive(
+    client: Any, method: str, route: str, bodies: List[Dict[str, Any]], concurrency: int
+) -> Dict[str, Any]:
+    gate = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+
+    async def one(body: Dict[str, Any]) -> None:
+        async with gate:
+            started = time.perf_counter()
+            response = await client.request(method, route, json=body)
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(body) for body in bodies))
+    elapsed = time.perf_counter() - started
+    return {"requests": len(bodies), "rps": round(len(bodies) / elapsed, 1), **_percentiles(latencies)}
+
+
+async def _bench_asgi(requests: int, concurrency: int, stub: StubBackend) -> Dict[str, Any]:
+    import httpx
+
+    from app import server
+    from app.clients import aclose_clients
+
+    server.config.update(
+        grok_online=True,
+        grok_api_key="benchmark",
+        grok_base_url=f"{stub.url}/v1",
+        ollama_url=stub.url,
+        response_cache=False,
+    )
+    server.response_cache = None
+    rng = random.Random(11)
+    transport = httpx.ASGITransport(app=server.app)
+    results: Dict[str, Any] = {}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        results["remember"] = await _drive(
+            client, "POST", "/remember", [{"text": _text(rng)} for _ in range(requests)], concurrency
+        )
+        # Distinct prompts, so the scheduler never coalesces two requests.
+        for label, mode in (("query_grok", "grok"), ("query_ollama", "local")):
+            bodies = [{"prompt": f"{_text(rng)} #{index}", "mode": mode} for index in range(requests)]
+            results[label] = await _drive(client, "POST", "/query", bodies, concurrency)
+    await aclose_clients()
+    results["stub_calls"] = stub.requests
+    return results
+
+
+def bench_asgi(requests: int, concurrency: int, latency_ms: float) -> Dict[str, Any]:
+    with StubBackend(latency_ms=latency_ms) as stub:
+        return asyncio.run(_bench_asgi(requests, concurrency, stub))
+
+
+def bench_migrate(conversations: int, scratch: Path) -> Dict[str, Any]:
+    rng = random.Random(13)
+    source = scratch / "conversations.json"
+    items = []
+    for index in range(conversations):
+        mapping: Dict[str, Any] = {}
+        parent = None
+        for turn in range(10):
+            node = f"c{index}-n{turn}"
+            mapping[node] = {
+                "id": node,
+                "parent": parent,
+                "message": {
+                    "author": {"role": "user" if turn % 2 == 0 else "assistant"},
+                    "content": {"parts": [_text(rng)]},
+                    "create_time": 1.7e9 + index * 100 + turn,
+                },
+            }
+            parent = node
+        items.append({"id": f"c{index}", "current_node": parent, "mapping": mapping})
+    source.write_text(json.dumps(items), encoding="utf-8")
+    home = scratch / "migrate-home"
+    home.mkdir()
+    started = time.perf_counter()
+    subprocess.run(
+        [sys.executable, str(ROOT / "migrate_openai.py"), str(source), "--restart"],
+        cwd=ROOT,
+        env=dict(os.environ, HOME=str(home)),
+        check=True,
+        stdout=subprocess.DEVNULL,
+    )
+    elapsed = time.perf_counter() - started
+    messages = conversations * 10
+    return {
+        "messages": messages,
+        "seconds": round(elapsed, 3),
+        "messages_per_s": round(messages / elapsed, 1),
+        "source_mb": round(source.stat().st_size / 1e6, 2),
+    }
+
+
+# ---------------------------------------------------------------------------
+def _flatten(data: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat: Dict[str, float] = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)):
+            flat[name] = float(value)
+    return flat
+
+
+def _compare(current: Dict[str, Any], baseline_path: Path) -> None:
+    baseline = _flatten(json.loads(baseline_path.read_text(encoding="utf-8"))["results"])
+    print(f"\n{'metric':<40}{'baseline':>12}{'current':>12}{'ratio':>8}")
+    for name, value in _flatten(current).items():
+        old = baseline.get(name)
+        if old:
+            print(f"{name:<40}{old:>12.2f}{value:>12.2f}{value / old:>8.2f}")
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main() -> None:
+    groups = ["memory", "prompt", "asgi", "migrate"]
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=groups, default=groups)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000])
+    parser.add_argument("--requests", type=int, default=300, help="Requests per ASGI route")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=20.0, help="Stub back-end latency")
+    parser.add_argument("--conversations", type=int, default=2000, help="Conversations in the migrate export")
+    parser.add_argument("--output", type=Path, help="Write results JSON here")
+    parser.add_argument("--compare", type=Path, help="Earlier results JSON to compare against")
+    args = parser.parse_args()
+
+    results: Dict[str, Any] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        scratch = Path(tmp)
+        os.environ["HOME"] = str(scratch / "home")
+        for group in args.only:
+            started = time.perf_counter()
+            if group == "memory":
+                results[group] = bench_memory(args.sizes, scratch)
+            elif group == "prompt":
+                results[group] = bench_prompt()
+            elif group == "asgi":
+                results[group] = bench_asgi(args.requests, args.concurrency, args.latency_ms)
+            else:
+                results[group] = bench_migrate(args.conversations, scratch)
+            print(f"[{group}] {time.perf_counter() - started:.1f}s", file=sys.stderr)
+
+    report = {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "args": {key: str(value) if isinstance(value, Path) else value for key, value in vars(args).items()},
+        },
+        "results": results,
+    }
+    print(json.dumps(results, indent=2))
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2), encoding="utf-8")
+    if args.compare:
+        _compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,277 @@
-"""Utility to migrate historical OpenAI chat logs into Pepper memories."""
+"""Utility to migrate historical OpenAI chat logs into Pepper memories.
+
+Accepts either the ChatGPT ``conversations.json`` export (a list of
+conversations whose messages live in a ``mapping`` tree) or a flat list of
+``{"content": ...}`` messages.  The export is parsed incrementally, one
+conversation at a time, and memories are written with
+:meth:`~app.memory.BaseMemoryStore.add_many` in batches.  Progress is
+checkpointed after every batch so an interrupted import resumes where it
+stopped.  A crash between a batch's write and its checkpoint is repaired on
+resume: records the store already holds from this importer, matched on
+conversation id, role, text and timestamp, are skipped.
+"""
 from __future__ import annotations
 
 import argparse
 import json
+from concurrent.futures import Executor, ProcessPoolExecutor
 from pathlib import Path
-from typing import Iterable
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
 
-from app.memory import MemoryStore
+from app.bridge import BridgeConfig
+from app.entry import MemoryEntry
+from app.memory import BaseMemoryStore, make_memory_store
 
 CATEGORY_MAP = {
     "default": "system",
     "emotional": "emotional",
     "ritual": "ritual",
     "light": "light",
+    "auto": None,
 }
 
+# Roles worth remembering; system prompts and tool output are skipped.
+_ROLES = ("user", "assistant")
+
+
+def iter_json_array(path: Path, chunk_size: int = 1 << 20) -> Iterator[Any]:
+    """Yield the items of a top-level JSON array without loading it whole."""
+
+    decoder = json.JSONDecoder()
+    with path.open("r", encoding="utf-8-sig") as handle:
+        buffer = handle.read(chunk_size).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"{path} does not contain a JSON array")
+        pos = 1
+        eof = False
+        while True:
+            while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buffer) and buffer[pos] == "]":
+                return
+            try:
+                if pos >= len(buffer):
+                    raise json.JSONDecodeError("need more data", buffer, pos)
+                item, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                more = handle.read(chunk_size)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+            yield item
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
+
+
+def iter_conversation_messages(conversation: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    """Yield memory records for the active branch of one exported conversation."""
+
+    mapping = conversation.get("mapping") or {}
+    conv_id = conversation.get("conversation_id") or conversation.get("id")
+    chain: List[Dict[str, Any]] = []
+    seen = set()
+    node_id = conversation.get("current_node")
+    while node_id in mapping and node_id not in seen:
+        seen.add(node_id)
+        chain.append(mapping[node_id])
+        node_id = mapping[node_id].get("parent")
+    if chain:
+        chain.reverse()
+    else:
+        chain = sorted(
+            mapping.values(),
+            key=lambda node: (node.get("message") or {}).get("create_time") or 0,
+        )
+
+    for node in chain:
+        message = node.get("message") or {}
+        role = (message.get("author") or {}).get("role")
+        if role not in _ROLES:
+            continue
+        parts = (message.get("content") or {}).get("parts") or []
+        text = "\n".join(part for part in parts if isinstance(part, str)).strip()
+        if not text:
+            continue
+        yield {
+            "text": text,
+            "role": role,
+            "ts": message.get("create_time") or conversation.get("create_time"),
+            "conv_id": conv_id,
+            "source": "openai",
+        }
+
+
+def iter_records(path: Path) -> Iterator[List[Dict[str, Any]]]:
+    """Yield one list of memory records per top-level item of the export."""
+
+    for item in iter_json_array(path):
+        if not isinstance(item, dict):
+            yield []
+        elif "mapping" in item:
+            yield list(iter_conversation_messages(item))
+        elif isinstance(item.get("content"), str):
+            yield [{"text": item["content"], "role": item.get("role") or "note", "source": "openai"}]
+        else:
+            yield []
+
 
 def iter_messages(path: Path) -> Iterable[str]:
-    """Yield messages from a JSON file exported from OpenAI."""
+    """Yield message texts from a JSON file exported from OpenAI."""
+
+    for records in iter_records(path):
+        for record in records:
+            yield record["text"]
+
+
+# ---------------------------------------------------------------------------
+def load_checkpoint(path: Path, source: Path) -> Dict[str, Any]:
+    """Return the saved progress for *source*: ``items``, ``memories`` and ``seq``.
+
+    ``items`` counts top-level items already imported and ``seq`` is the
+    store's last sequence number when the checkpoint was written, or
+    ``None`` for a missing, unreadable, foreign or older checkpoint.
+    """
 
-    payload = json.loads(path.read_text("utf-8"))
-    if isinstance(payload, list):
-        for item in payload:
-            content = item.get("content") if isinstance(item, dict) else None
-            if isinstance(content, str):
-                yield content
+    empty: Dict[str, Any] = {"items": 0, "memories": 0, "seq": None}
+    if not path.exists():
+        return empty
+    try:
+        data = json.loads(path.read_text("utf-8"))
+    except json.JSONDecodeError:
+        return empty
+    if data.get("source") != str(source.resolve()):
+        return empty
+    seq = data.get("seq")
+    return {
+        "items": int(data.get("items", 0)),
+        "memories": int(data.get("memories", 0)),
+        "seq": None if seq is None else int(seq),
+    }
+
+
+def save_checkpoint(path: Path, source: Path, items: int, memories: int, seq: int) -> None:
+    """Atomically record import progress."""
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    tmp_path.write_text(
+        json.dumps(
+            {"source": str(source.resolve()), "items": items, "memories": memories, "seq": seq}
+        ),
+        encoding="utf-8",
+    )
+    tmp_path.replace(path)
+
+
+def _record_key(record: Dict[str, Any]) -> Tuple[Any, ...]:
+    key = (record.get("conv_id"), record.get("role") or "note", str(record.get("text") or "").strip())
+    # Records without a timestamp are stored with the import time instead.
+    return key + (float(record["ts"]),) if record.get("ts") else key
+
+
+def _last_seq(store: BaseMemoryStore) -> int:
+    newest = store.list(1)
+    return int(newest[-1].id[1:]) if newest else 0
+
+
+def imported_since(store: BaseMemoryStore, seq: int) -> Set[Tuple[Any, ...]]:
+    """Keys of the memories this importer stored after *seq*.
+
+    These are the rows of a batch that was written but not checkpointed;
+    resuming skips records whose :func:`_record_key` is among them.
+    """
+
+    keys: Set[Tuple[Any, ...]] = set()
+    for entry in store.since(seq, limit=max(1, store.count())):
+        if entry.source == "openai":
+            keys.add((entry.conv_id, entry.role, entry.text))
+            keys.add((entry.conv_id, entry.role, entry.text, entry.ts))
+    return keys
+
+
+def _commit(
+    store: BaseMemoryStore,
+    batch: List[Dict[str, Any]],
+    category: Optional[str],
+    pool: Optional[Executor],
+) -> List[MemoryEntry]:
+    if category is not None:
+        for record in batch:
+            record["category"] = category
+    elif pool is not None:
+        texts = [str(record.get("text") or "") for record in batch]
+        guessed = store.categoriser.categorise_many(texts, pool, chunk_size=max(1, len(texts) // 32))
+        for record, category in zip(batch, guessed):
+            record["category"] = category
+    return store.add_many(batch)
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description=__doc__)
     parser.add_argument("source", type=Path, help="Path to OpenAI export JSON")
     parser.add_argument("--category", default="default", choices=CATEGORY_MAP.keys())
+    parser.add_argument("--batch-size", type=int, default=1000, help="Memories per write")
+    parser.add_argument(
+        "--workers", type=int, default=0, help="Processes for --category auto (0 = in-process)"
+    )
+    parser.add_argument("--checkpoint", type=Path, help="Progress file (default: <source>.checkpoint)")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
     args = parser.parse_args()
 
-    store = MemoryStore()
-    category = CATEGORY_MAP.get(args.category, "system")
-    for message in iter_messages(args.source):
-        store.add(message, category=category)
-    print("Migration complete.")
+    checkpoint = args.checkpoint or args.source.with_name(args.source.name + ".checkpoint")
+    progress: Dict[str, Any] = {"items": 0, "memories": 0, "seq": None}
+    if not args.restart:
+        progress = load_checkpoint(checkpoint, args.source)
+    done, imported, seq = progress["items"], progress["memories"], progress["seq"]
+    if done:
+        print(f"Resuming after {done} items.")
+
+    config = BridgeConfig(Path(__file__).resolve().parent / "app" / "config.json")
+    store = make_memory_store(config)
+    category = CATEGORY_MAP.get(args.category)
+    pool = ProcessPoolExecutor(args.workers) if category is None and args.workers > 1 else None
+    already: Set[Tuple[Any, ...]] = set()
+    if seq is not None:
+        already = imported_since(store, seq)
+    elif done:
+        print("Checkpoint predates duplicate detection; the last batch may be imported twice.")
+        seq = _last_seq(store)
+    else:
+        # Record where this import starts, so a crash inside the first batch is repaired too.
+        seq = _last_seq(store)
+        save_checkpoint(checkpoint, args.source, 0, 0, seq)
+    batch: List[Dict[str, Any]] = []
+
+    def commit(position: int) -> None:
+        nonlocal imported, seq
+        fresh = [record for record in batch if _record_key(record) not in already] if already else batch
+        # Records already stored by the interrupted run still count as imported.
+        imported += len(batch) - len(fresh)
+        entries = _commit(store, fresh, category, pool) if fresh else []
+        imported += len(entries)
+        if entries:
+            seq = int(entries[-1].id[1:])
+        save_checkpoint(checkpoint, args.source, position, imported, seq)
+
+    try:
+        for position, records in enumerate(iter_records(args.source), start=1):
+            if position <= done:
+                continue
+            batch.extend(records)
+            if len(batch) >= args.batch_size:
+                commit(position)
+                batch = []
+            done = position
+        commit(done)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        # Embeds any memories still queued for the vector index in one pass.
+        store.close()
+    print(f"Migration complete: {imported} memories imported.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,114 @@
+"""Export, import, back up and verify Pepper memory snapshots.
+
+Run from ``PepperGrok_v2``::
+
+    python pepper_snapshot.py export memories.snap [--compress zstd]
+    python pepper_snapshot.py export memories.json
+    python pepper_snapshot.py import memories.snap
+    python pepper_snapshot.py backup [--dir DIR] [--keep 7] [--compress zlib]
+    python pepper_snapshot.py verify backups/pepper_memory-*.snap
+
+``export`` writes the binary layout from :mod:`app.snapshot`, or the JSON
+snapshot layout when the target ends in ``.json``.  ``import`` reads either
+format and adds the memories to the configured store with their original
+text, category, timestamp, pin and provenance; they get fresh ids.
+``backup`` writes a checksummed binary snapshot into the backup directory,
+re-reads it to verify it and only then prunes backups beyond ``--keep``.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from app.bridge import BridgeConfig
+from app.memory import DEFAULT_MEMORY_PATH, BaseMemoryStore, make_memory_store
+from app.snapshot import (
+    CODECS,
+    SnapshotError,
+    dump_binary,
+    dump_json,
+    read_records,
+    verify,
+    write_backup,
+    write_file,
+)
+
+_FIELDS = ("text", "category", "ts", "pinned", "role", "source", "conv_id")
+
+
+def export(store: BaseMemoryStore, target: Path, compression: Optional[str]) -> int:
+    seq, columns = store.snapshot_columns()
+    if target.suffix == ".json":
+        write_file(target, lambda handle: dump_json(handle, seq, columns.iter_json()))
+    else:
+        write_file(target, lambda handle: dump_binary(handle, seq, columns, compression))
+    return len(columns)
+
+
+def import_records(store: BaseMemoryStore, source: Path, batch_size: int) -> int:
+    _, records = read_records(source)
+    imported = 0
+    for start in range(0, len(records), batch_size):
+        batch: List[Dict[str, Any]] = [
+            {field: record.get(field) for field in _FIELDS} for record in records[start : start + batch_size]
+        ]
+        imported += len(store.add_many(batch))
+    return imported
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_cmd = commands.add_parser("export", help="Write every memory to a snapshot file")
+    export_cmd.add_argument("target", type=Path)
+    export_cmd.add_argument("--compress", choices=CODECS, help="Compress binary snapshots per block")
+    import_cmd = commands.add_parser("import", help="Add the memories from a snapshot file")
+    import_cmd.add_argument("source", type=Path)
+    import_cmd.add_argument("--batch-size", type=int, default=1000, help="Memories per write")
+    backup_cmd = commands.add_parser("backup", help="Write a verified backup and rotate old ones")
+    backup_cmd.add_argument("--dir", type=Path, help="Backup directory (default: memory_backup_dir)")
+    backup_cmd.add_argument("--keep", type=int, help="Backups to keep (default: memory_backup_keep)")
+    backup_cmd.add_argument("--compress", choices=CODECS)
+    verify_cmd = commands.add_parser("verify", help="Check binary snapshots against their checksums")
+    verify_cmd.add_argument("paths", type=Path, nargs="+")
+    args = parser.parse_args()
+
+    if args.command == "verify":
+        failed = 0
+        for path in args.paths:
+            try:
+                info = verify(path)
+            except (OSError, SnapshotError) as exc:
+                failed += 1
+                print(f"{path}: FAILED ({exc})")
+            else:
+                print(f"{path}: ok, {info['count']} memories up to seq {info['seq']}")
+        sys.exit(1 if failed else 0)
+
+    config = BridgeConfig(Path(__file__).resolve().parent / "app" / "config.json")
+    store = make_memory_store(config)
+    try:
+        if args.command == "export":
+            count = export(store, args.target, args.compress)
+            print(f"Exported {count} memories to {args.target}.")
+        elif args.command == "import":
+            count = import_records(store, args.source, max(1, args.batch_size))
+            print(f"Imported {count} memories from {args.source}.")
+        else:
+            directory = args.dir or Path(
+                config.get("memory_backup_dir") or DEFAULT_MEMORY_PATH.parent / "backups"
+            ).expanduser()
+            keep = args.keep if args.keep is not None else int(config.get("memory_backup_keep", 7))
+            seq, columns = store.snapshot_columns()
+            target = write_backup(directory, seq, columns, keep=keep, compression=args.compress)
+            print(f"Backed up {len(columns)} memories to {target}.")
+    except SnapshotError as exc:
+        sys.exit(f"error: {exc}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""Shared fixtures: import paths, a throwaway HOME and the offline stub."""
+from __future__ import annotations
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+for path in (ROOT, ROOT / "benchmarks"):
+    if str(path) not in sys.path:
+        sys.path.insert(0, str(path))
+
+# Default paths (memory store, skill sandbox, voice cache) hang off HOME and
+# are computed at import time, so redirect it before anything imports app.
+os.environ["HOME"] = tempfile.mkdtemp(prefix="pepper-tests-")
+
+from stubs import StubBackend  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    """A fresh Grok + Ollama stub with negligible latency."""
+    with StubBackend(latency_ms=0, words=6) as backend:
+        yield backend
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    """``app.server`` with a fresh memory store, response cache and sessions."""
+    from app import server as module
+    from app.cache import ResponseCache
+    from app.lazy import Lazy
+    from app.memory import make_memory_store
+    from app.sessions import SessionStore
+
+    store = Lazy(lambda: make_memory_store(module.config, tmp_path / "memory.json"), "memory store")
+    monkeypatch.setattr(module, "memory_store", store)
+    monkeypatch.setattr(module, "response_cache", ResponseCache(max_items=32))
+    monkeypatch.setattr(module, "sessions", SessionStore(summarize=module._summarize))
+    yield module
+    if store.peek() is not None:
+        store.peek().close()
+
+
+@pytest.fixture
+def client(server):
+    """A TestClient without the lifespan hook (no heartbeat or voice threads)."""
+    from fastapi.testclient import TestClient
+
+    return TestClient(server.app)
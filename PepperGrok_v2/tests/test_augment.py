@@ -0,0 +1,88 @@
+"""Token-budgeted, deduplicated memory selection for prompts."""
+from __future__ import annotations
+
+from app.augment import (
+    DEFAULT_PERSONA,
+    EXCLUDED_CATEGORIES,
+    augment,
+    minhash,
+    select_memories,
+    similarity,
+)
+from app.entry import MemoryEntry
+from app.search import estimate_tokens
+
+
+def entry(seq, text, category="system", pinned=False, ts=None):
+    return MemoryEntry(text=text, category=category, id=f"m{seq}", ts=ts or float(seq), pinned=pinned)
+
+
+def ids(entries):
+    return [item.id for item in entries]
+
+
+def test_minhash_estimates_jaccard():
+    base = minhash("we walked the dog along the river every single morning")
+    assert similarity(base, minhash("we walked the dog along the river every single morning!")) == 1.0
+    assert similarity(base, minhash("deploy the new build to production on friday")) < 0.2
+
+
+def test_secrets_are_never_selected():
+    assert "secrets" in EXCLUDED_CATEGORIES
+    selected, _, _, _ = select_memories([entry(1, "my pin is 1234", "secrets"), entry(2, "tea at five")])
+    assert ids(selected) == ["m2"]
+
+
+def test_near_duplicates_and_repeated_ids_collapse():
+    memories = [
+        entry(1, "we walked the dog along the river every single morning"),
+        entry(2, "We walked the dog along the river every single morning."),
+        entry(1, "we walked the dog along the river every single morning"),
+        entry(3, "tea in the garden"),
+    ]
+    selected, _, duplicates, _ = select_memories(memories)
+    assert ids(selected) == ["m1", "m3"]
+    assert duplicates == 1
+
+
+def test_pinned_first_then_incoming_order():
+    memories = [entry(1, "alpha note"), entry(2, "bravo vow", pinned=True), entry(3, "charlie note")]
+    assert ids(select_memories(memories)[0]) == ["m2", "m1", "m3"]
+
+
+def test_budget_drops_oldest_unpinned_first():
+    def words(prefix):
+        return " ".join(f"{prefix}{n}" for n in range(40))
+
+    memories = [
+        entry(1, words("old"), ts=1.0),
+        entry(2, words("pinned"), pinned=True, ts=0.5),
+        entry(3, words("new"), ts=3.0),
+    ]
+    budget = sum(estimate_tokens(item.text) for item in memories[1:])
+
+    selected, categories, _, trimmed = select_memories(memories, max_tokens=budget)
+
+    assert ids(selected) == ["m2", "m3"]
+    assert trimmed == 1
+    assert categories == {"system": sum(estimate_tokens(item.text) for item in selected)}
+
+
+def test_augment_builds_prompt_and_summary():
+    memories = [entry(1, "tea at five", "ritual"), entry(2, "loves rain", "emotional", pinned=True)]
+
+    result = augment("what now?", memories, persona="You are Pepper.")
+
+    assert result.prompt.startswith("You are Pepper.\n")
+    assert "User says: what now?" in result.user_message
+    assert "- (emotional) loves rain (#m2)\n- (ritual) tea at five (#m1)" in result.prompt
+    assert result.system.startswith("You are Pepper.") and "User says" not in result.system
+    assert result.summary()["ids"] == ["m2", "m1"]
+    assert result.summary()["pinned"] == 1
+    assert result.memory_tokens == sum(result.categories.values())
+
+
+def test_persona_is_trimmed_to_its_cap():
+    result = augment("hi", [], persona="word " * 500, persona_tokens=20)
+    assert result.persona_tokens <= 20
+    assert augment("hi", []).prompt.startswith(DEFAULT_PERSONA)
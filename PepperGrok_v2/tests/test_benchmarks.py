@@ -0,0 +1,82 @@
+"""Benchmark stubs and the suite's reporting helpers."""
+from __future__ import annotations
+
+import asyncio
+import json
+
+import httpx
+import pytest
+import suite
+from stubs import stub_reply
+
+from app.clients import GrokClient, OllamaClient
+
+
+def collect(stream):
+    async def run():
+        return [chunk async for chunk in stream]
+
+    return asyncio.run(run())
+
+
+def test_stub_replies_depend_only_on_the_prompt():
+    assert stub_reply("hello", 6) == stub_reply("hello", 6)
+    assert stub_reply("hello", 6) != stub_reply("goodbye", 6)
+    assert len(stub_reply("hello", 6).split()) == 6
+
+
+def test_grok_sse_stream_reassembles_the_reply(stub):
+    client = GrokClient(api_key="test", base_url=stub.url + "/v1", http2=False)
+
+    chunks = collect(client.astream("hello there"))
+
+    assert len(chunks) == 6
+    assert "".join(chunks).strip() == stub_reply("hello there", 6)
+    assert client.complete("hello there") == stub_reply("hello there", 6)
+
+
+@pytest.mark.parametrize("prompt", ["plain prompt", [{"role": "user", "content": "chat prompt"}]])
+def test_ollama_ndjson_stream_reassembles_the_reply(stub, prompt):
+    client = OllamaClient(base_url=stub.url)
+    text = prompt if isinstance(prompt, str) else prompt[-1]["content"]
+
+    chunks = collect(client.astream(prompt))
+
+    assert "".join(chunks).strip() == stub_reply(text, 6)
+    assert client.generate(prompt) == stub_reply(text, 6)
+
+
+def test_scripted_failures_are_served_in_order(stub):
+    stub.fail_next(503, 429, retry_after=1)
+
+    with httpx.Client(base_url=stub.url) as http:
+        first = http.post("/api/generate", json={"prompt": "x"})
+        second = http.post("/api/generate", json={"prompt": "x"})
+        third = http.post("/api/generate", json={"prompt": "x"})
+
+    assert [first.status_code, second.status_code, third.status_code] == [503, 429, 200]
+    assert first.headers["Retry-After"] == "1"
+    assert stub.requests == 3
+    assert stub.connections == 1
+
+
+def test_percentiles_report_milliseconds():
+    samples = [index / 1000 for index in range(1, 101)]
+
+    report = suite._percentiles(samples)
+
+    assert report == {"p50_ms": 51.0, "p90_ms": 91.0, "p99_ms": 100.0, "max_ms": 100.0}
+
+
+def test_compare_prints_ratios_for_shared_metrics(tmp_path, capsys):
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(
+        json.dumps({"meta": {}, "results": {"memory": {"1000": {"add_ms": 2.0, "list_ms": 0}}}}),
+        encoding="utf-8",
+    )
+
+    suite._compare({"memory": {"1000": {"add_ms": 3.0, "list_ms": 1.0}, "note": "text"}}, baseline)
+
+    lines = capsys.readouterr().out.strip().splitlines()
+    assert len(lines) == 2
+    assert lines[1].split() == ["memory.1000.add_ms", "2.00", "3.00", "1.50"]
@@ -0,0 +1,104 @@
+"""Offline tests for local_infer / alocal_infer and their CLI fallback."""
+from __future__ import annotations
+
+import asyncio
+import socket
+import stat
+
+import pytest
+from stubs import stub_reply
+
+from app import bridge, clients
+from app.bridge import EMPTY_LOCAL_REPLY, OLLAMA_OFFLINE_REPLY, alocal_infer, local_infer
+
+FAKE_CLI = "#!/bin/sh\nread -r prompt\necho \"cli($1 $2): $prompt\"\n"
+
+
+@pytest.fixture(autouse=True)
+def fresh_ollama_client(monkeypatch):
+    """Each test gets its own pooled client (and its own event loop)."""
+    monkeypatch.setattr(clients, "_OLLAMA_CLIENT", None)
+
+
+@pytest.fixture
+def fake_cli(tmp_path, monkeypatch):
+    """Put a stand-in ``ollama`` executable first on ``PATH``."""
+    script = tmp_path / "ollama"
+    script.write_text(FAKE_CLI, encoding="utf-8")
+    script.chmod(script.stat().st_mode | stat.S_IXUSR)
+    monkeypatch.setenv("PATH", str(tmp_path))
+    return script
+
+
+@pytest.fixture
+def no_cli(tmp_path, monkeypatch):
+    """A ``PATH`` without any ``ollama`` executable."""
+    monkeypatch.setenv("PATH", str(tmp_path))
+
+
+@pytest.fixture
+def dead_url():
+    """An Ollama URL nothing listens on."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def settings(url: str) -> dict:
+    return {"ollama_url": url, "model": "llama3.2", "ollama_timeout": 5.0}
+
+
+def run_both(prompt, config):
+    """``(local_infer, alocal_infer)`` results for the same call."""
+    sync_reply = local_infer(prompt, config=config)
+    clients._OLLAMA_CLIENT = None  # an AsyncClient is bound to one event loop
+    return sync_reply, asyncio.run(alocal_infer(prompt, config=config))
+
+
+def test_http_generate_success(stub, no_cli):
+    assert run_both("hello", settings(stub.url)) == (stub_reply("hello", 6),) * 2
+    assert stub.requests == 2
+
+
+def test_http_chat_messages_success(stub, no_cli):
+    messages = [{"role": "system", "content": "be brief"}, {"role": "user", "content": "hi"}]
+    assert run_both(messages, settings(stub.url)) == (stub_reply("hi", 6),) * 2
+
+
+def test_http_error_status_falls_back_to_cli(stub, fake_cli):
+    stub.fail_next(500, 500)
+    assert run_both("hello", settings(stub.url)) == ("cli(run llama3.2): hello",) * 2
+    assert stub.requests == 2
+
+
+def test_unreachable_daemon_falls_back_to_cli(dead_url, fake_cli):
+    assert run_both("hello", settings(dead_url)) == ("cli(run llama3.2): hello",) * 2
+
+
+def test_cli_fallback_joins_chat_messages(dead_url, fake_cli, monkeypatch):
+    seen = []
+    real_run = bridge.subprocess.run
+
+    def spy(*args, **kwargs):
+        seen.append(kwargs["input"])
+        return real_run(*args, **kwargs)
+
+    monkeypatch.setattr(bridge.subprocess, "run", spy)
+    messages = [{"role": "system", "content": "be brief"}, {"role": "user", "content": "hi"}]
+    local_infer(messages, config=settings(dead_url))
+    assert seen == ["be brief\n\nhi"]
+
+
+def test_missing_cli_returns_offline_reply(dead_url, no_cli):
+    assert run_both("hello", settings(dead_url)) == (OLLAMA_OFFLINE_REPLY,) * 2
+
+
+def test_failing_cli_returns_offline_reply(dead_url, fake_cli):
+    fake_cli.write_text("#!/bin/sh\nexit 1\n", encoding="utf-8")
+    assert run_both("hello", settings(dead_url)) == (OLLAMA_OFFLINE_REPLY,) * 2
+
+
+def test_silent_cli_returns_empty_reply(dead_url, fake_cli):
+    fake_cli.write_text("#!/bin/sh\nread -r prompt\nexit 0\n", encoding="utf-8")
+    assert run_both("hello", settings(dead_url)) == (EMPTY_LOCAL_REPLY,) * 2
@@ -0,0 +1,117 @@
+"""Response cache: keys, LRU and TTL eviction, the SQLite tier and /query."""
+from __future__ import annotations
+
+import pytest
+
+from app import cache
+from app.bridge import GROK_OFFLINE_REPLY
+from app.cache import ResponseCache, cache_key, normalise_prompt
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"value": 1_800_000_000.0}
+    monkeypatch.setattr(cache.time, "time", lambda: now["value"])
+    return now
+
+
+def test_keys_ignore_case_spacing_and_trailing_punctuation():
+    assert normalise_prompt("  How ARE\tyou?! ") == "how are you"
+    assert cache_key("grok", "How are you?", ["m1"]) == cache_key("grok", "how are  you", ["m1"])
+    assert cache_key("grok", "hi", ["m1"]) != cache_key("grok", "hi", ["m2"])
+    assert cache_key("grok", "hi", []) != cache_key("llama3", "hi", [])
+
+
+def test_lru_evicts_the_least_recently_used():
+    responses = ResponseCache(max_items=2)
+    responses.put("a", "A")
+    responses.put("b", "B")
+    assert responses.get("a") == "A"  # "b" is now the oldest
+    responses.put("c", "C")
+
+    assert responses.get("b") is None
+    assert responses.get("a") == "A" and responses.get("c") == "C"
+    assert responses.stats() == {"items": 2, "hits": 3, "misses": 1, "disk_hits": 0}
+
+
+def test_entries_expire_after_the_ttl(clock):
+    responses = ResponseCache(ttl_seconds=60)
+    responses.put("a", "A")
+    clock["value"] += 59
+    assert responses.get("a") == "A"
+    clock["value"] += 2
+    assert responses.get("a") is None
+    assert responses.stats()["items"] == 0
+
+
+def test_sqlite_tier_survives_a_restart(tmp_path, clock):
+    path = tmp_path / "responses.db"
+    first = ResponseCache(ttl_seconds=60, path=path)
+    first.put("a", "A")
+    first.put("old", "stale")
+    first.close()
+
+    second = ResponseCache(ttl_seconds=60, path=path)
+    assert second.get("a") == "A"
+    assert second.stats()["disk_hits"] == 1
+    second.close()
+
+    clock["value"] += 120
+    third = ResponseCache(ttl_seconds=60, path=path)  # purges expired rows on open
+    assert third.get("a") is None
+    assert third._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+    third.close()
+
+
+def test_clear_empties_both_tiers(tmp_path):
+    responses = ResponseCache(path=tmp_path / "responses.db")
+    responses.put("a", "A")
+    responses.clear()
+    assert responses.get("a") is None
+    assert responses._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+    responses.close()
+
+
+# ----------------------------------------------------------------------
+class Backend(list):
+    """Records every prompt sent and answers with ``reply``."""
+
+    reply = "Pepper says hi."
+
+
+@pytest.fixture
+def backend(server, monkeypatch):
+    calls = Backend()
+
+    async def adispatch_prompt(prompt, config, mode=None):
+        calls.append(prompt)
+        return calls.reply
+
+    monkeypatch.setattr(server, "adispatch_prompt", adispatch_prompt)
+    return calls
+
+
+def test_query_serves_repeats_from_the_cache(client, backend):
+    first = client.post("/query", json={"prompt": "Good morning!"}).json()
+    second = client.post("/query", json={"prompt": "good morning"}).json()
+
+    assert first["cached"] is False and second["cached"] is True
+    assert second["response"] == "Pepper says hi."
+    assert len(backend) == 1
+
+
+def test_new_memories_change_the_key(client, server, backend):
+    client.post("/query", json={"prompt": "tea time"})
+    server.memory_store.get().add("tea time is at five", category="ritual")
+
+    again = client.post("/query", json={"prompt": "tea time"}).json()
+
+    assert again["cached"] is False
+    assert len(backend) == 2
+
+
+def test_placeholder_replies_are_not_cached(client, backend):
+    backend.reply = GROK_OFFLINE_REPLY
+    client.post("/query", json={"prompt": "anyone there"})
+    assert client.post("/query", json={"prompt": "anyone there"}).json()["cached"] is False
+    assert len(backend) == 2
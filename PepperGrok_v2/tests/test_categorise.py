@@ -0,0 +1,75 @@
+"""Keyword categoriser matching, weighting and configuration."""
+from __future__ import annotations
+
+from concurrent.futures import ThreadPoolExecutor
+
+from app.categorise import DEFAULT_CATEGORY, Categoriser, make_categoriser
+
+
+def test_whole_words_and_inflections_match():
+    categoriser = Categoriser()
+
+    assert categoriser.categorise("We played outside") == "light"
+    assert categoriser.categorise("Big HUGS today") == "emotional"
+    assert categoriser.categorise("journaling every evening") == "ritual"
+    assert categoriser.categorise("check the display settings") == DEFAULT_CATEGORY
+    assert categoriser.scores("display a playlist") == {}
+
+
+def test_weights_decide_and_ties_go_to_the_first_match():
+    categoriser = Categoriser({"light": {"joke": 1.0}, "emotional": {"love": 2.0}})
+
+    assert categoriser.categorise("a joke and love") == "emotional"
+    assert categoriser.scores("a joke, a joke, and love") == {"light": 2.0, "emotional": 2.0}
+    assert categoriser.categorise("a joke, a joke, and love") == "light"
+    assert categoriser.categorise("love and a joke and a joke") == "emotional"
+
+    even = Categoriser({"light": ["joke"], "emotional": ["love"]})
+    assert even.categorise("joke then love") == "light"
+    assert even.categorise("love then joke") == "emotional"
+
+
+def test_shared_prefixes_compile_into_one_pattern():
+    categoriser = Categoriser({"a": ["journal", "joke", "jog"], "b": ["journey"]})
+
+    assert categoriser.scores("a journey, a jog and a journal") == {"b": 1.0, "a": 2.0}
+    assert categoriser.categorise("jo") == DEFAULT_CATEGORY
+
+
+def test_empty_map_falls_back_to_the_default():
+    categoriser = Categoriser({}, default="misc")
+
+    assert categoriser.categorise("hug the journal") == "misc"
+    assert categoriser.keywords() == {}
+
+
+def test_config_moves_adds_and_drops_keywords():
+    categoriser = make_categoriser(
+        {
+            "category_keywords": {
+                "ritual": ["task"],
+                "health": {"walk": 2.0},
+                "light": {"play": 0},
+            },
+            "category_default": "note",
+        }
+    )
+    keywords = categoriser.keywords()
+
+    assert keywords["ritual"]["task"] == 1.0
+    assert "task" not in keywords["system"]
+    assert "play" not in keywords["light"]
+    assert categoriser.categorise("a long walk") == "health"
+    assert categoriser.categorise("time to play") == "note"
+    assert categoriser.categorise("one more task") == "ritual"
+
+
+def test_categorise_many_matches_the_serial_result():
+    categoriser = Categoriser()
+    texts = ["hug", "joke", "journal", "nothing", "todo"] * 50
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        parallel = categoriser.categorise_many(texts, pool=pool, chunk_size=7)
+
+    assert parallel == [categoriser.categorise(text) for text in texts]
+    assert categoriser.categorise_many(texts[:3]) == ["emotional", "light", "ritual"]
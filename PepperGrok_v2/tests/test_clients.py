@@ -0,0 +1,152 @@
+"""GrokClient retries and connection reuse against the local stub."""
+from __future__ import annotations
+
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from stubs import stub_reply
+
+from app import clients
+from app.clients import GrokClient
+
+BACKOFF = 0.05
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """Record backoff delays instead of sleeping through them."""
+    delays = []
+    # Swap the module's ``time`` rather than ``time.sleep`` itself: the stub
+    # server runs in this process and must keep its real clock.
+    monkeypatch.setattr(clients, "time", SimpleNamespace(sleep=delays.append, perf_counter=time.perf_counter))
+    return delays
+
+
+def make_client(stub, retries: int = 3) -> GrokClient:
+    return GrokClient(api_key="test", base_url=stub.url + "/v1", retries=retries, backoff=BACKOFF, http2=False)
+
+
+@pytest.mark.parametrize("status", [429, 500, 502, 503, 504])
+def test_retries_transient_status_with_backoff(stub, sleeps, status):
+    stub.fail_next(status, status)
+    assert make_client(stub).complete("hello") == stub_reply("hello", 6)
+    assert stub.requests == 3
+    assert len(sleeps) == 2
+    for attempt, delay in enumerate(sleeps):
+        assert 0.0 <= delay <= BACKOFF * 2 ** attempt
+
+
+def test_retry_after_header_overrides_backoff(stub, sleeps):
+    stub.fail_next(429, retry_after=1.5)
+    make_client(stub).complete("hello")
+    assert sleeps == [1.5]
+
+
+def test_retry_after_is_capped(stub, sleeps):
+    stub.fail_next(503, retry_after=86400)
+    make_client(stub).complete("hello")
+    assert sleeps == [clients.MAX_RETRY_AFTER]
+
+
+def test_gives_up_after_configured_retries(stub, sleeps):
+    stub.fail_next(503, 503, 503)
+    with pytest.raises(httpx.HTTPStatusError) as info:
+        make_client(stub, retries=2).complete("hello")
+    assert info.value.response.status_code == 503
+    assert stub.requests == 3
+    assert len(sleeps) == 2
+
+
+@pytest.mark.parametrize("status", [400, 401, 404, 422])
+def test_client_errors_are_not_retried(stub, sleeps, status):
+    stub.fail_next(status)
+    with pytest.raises(httpx.HTTPStatusError) as info:
+        make_client(stub).complete("hello")
+    assert info.value.response.status_code == status
+    assert stub.requests == 1
+    assert sleeps == []
+
+
+def test_async_client_retries_then_stops_on_client_error(stub, monkeypatch):
+    delays = []
+
+    async def fake_sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(clients, "asyncio", SimpleNamespace(sleep=fake_sleep, get_running_loop=asyncio.get_running_loop))
+    client = make_client(stub)
+
+    async def run():
+        try:
+            stub.fail_next(502)
+            assert await client.acomplete("hi") == stub_reply("hi", 6)
+            stub.fail_next(403)
+            with pytest.raises(httpx.HTTPStatusError):
+                await client.acomplete("hi")
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert stub.requests == 3
+    assert len(delays) == 1 and 0.0 <= delays[0] <= BACKOFF
+
+
+def test_sequential_requests_reuse_one_connection(stub, sleeps):
+    client = make_client(stub)
+    stub.fail_next(500)
+    for index in range(5):
+        client.complete(f"prompt {index}")
+    assert stub.requests == 6
+    assert stub.connections == 1
+
+
+def test_async_requests_reuse_one_connection(stub):
+    client = make_client(stub)
+
+    async def run():
+        try:
+            for index in range(5):
+                await client.acomplete(f"prompt {index}")
+        finally:
+            await client.aclose()
+
+    asyncio.run(run())
+    assert stub.requests == 5
+    assert stub.connections == 1
+
+
+def test_rotating_the_api_key_closes_the_old_client(stub, monkeypatch):
+    monkeypatch.setattr(clients, "_GROK_CLIENT", None)
+    config = {"grok_api_key": "one", "grok_base_url": stub.url + "/v1", "grok_http2": False}
+    first = clients.get_grok_client(config)
+    first.complete("hello")
+    pool = first._sync
+    assert clients.get_grok_client(config) is first
+    second = clients.get_grok_client({**config, "grok_api_key": "two"})
+    assert second is not first
+    assert pool.is_closed and first._sync is None
+
+
+def test_stream_skips_malformed_frames(monkeypatch):
+    body = (
+        'data: {"choices": [{"delta": {"content": "Hel"}}]}\n\n'
+        "data: {not json\n\n"
+        'data: {"choices": "oops"}\n\n'
+        'data: {"choices": [{"delta": {"content": "lo"}}]}\n\n'
+        "data: [DONE]\n\n"
+    )
+    transport = httpx.MockTransport(
+        lambda request: httpx.Response(200, text=body, headers={"Content-Type": "text/event-stream"})
+    )
+    client = GrokClient(api_key="test", base_url="http://grok.test/v1", http2=False)
+    monkeypatch.setattr(
+        client, "_async_client", lambda: httpx.AsyncClient(base_url=client.base_url, transport=transport)
+    )
+
+    async def collect():
+        return [chunk async for chunk in client.astream("hi")]
+
+    assert asyncio.run(collect()) == ["Hel", "lo"]
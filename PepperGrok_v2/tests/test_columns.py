@@ -0,0 +1,115 @@
+"""Columnar memory storage: lookups, pruning and direct JSON output."""
+from __future__ import annotations
+
+import json
+
+from app.columns import MemoryColumns
+from app.entry import MemoryEntry
+
+
+def entry(seq, **fields):
+    values = {
+        "text": f"memory {seq} — naïve \"quoted\"\n",
+        "category": ("ritual", "system", "light")[seq % 3],
+        "id": f"m{seq}",
+        "ts": 1_700_000_000.25 + seq,
+        "pinned": seq % 4 == 0,
+        "role": "user" if seq % 2 else "assistant",
+        "conv_id": f"c{seq % 3}" if seq % 5 else None,
+    }
+    values.update(fields)
+    return MemoryEntry(**values)
+
+
+def compact(data):
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def test_rows_materialise_back_to_the_same_entries():
+    stored = [entry(seq) for seq in (2, 3, 5, 8)]
+    columns = MemoryColumns(stored)
+
+    assert len(columns) == 4
+    assert [columns.entry(index) for index in range(4)] == stored
+    assert columns.get(5) == stored[2]
+    assert columns.get(4) is None
+    assert columns.index_of(8) == 3
+    assert list(columns.texts())[1] == (3, stored[1].text)
+
+
+def test_row_json_matches_the_entry_dict():
+    stored = [entry(1), entry(2, source="openai", conv_id=None, ts=0.1), entry(3, text="")]
+    columns = MemoryColumns(stored)
+
+    for index, item in enumerate(stored):
+        assert columns.row_json(index) == compact(item.to_dict())
+        assert json.loads(columns.row_json(index)) == item.to_dict()
+
+
+def test_tail_json_is_a_json_array_of_the_newest_rows():
+    stored = [entry(seq) for seq in range(1, 6)]
+    columns = MemoryColumns(stored)
+
+    assert json.loads(columns.tail_json(2)) == [item.to_dict() for item in stored[3:]]
+    assert json.loads(columns.tail_json(50)) == [item.to_dict() for item in stored]
+    assert columns.tail_json(0) == b"[]"
+
+
+def test_after_and_start_after_use_seq_order():
+    columns = MemoryColumns(entry(seq) for seq in (10, 20, 30, 40))
+
+    assert columns.start_after(0) == 0
+    assert columns.start_after(20) == 2
+    assert columns.start_after(25) == 2
+    assert columns.start_after(40) == 4
+    assert [item.id for item in columns.after(15)] == ["m20", "m30", "m40"]
+    assert [item.id for item in columns.after(15, limit=2)] == ["m30", "m40"]
+    assert columns.after(40) == []
+
+
+def test_drop_head_keeps_the_remaining_rows_addressable():
+    stored = [entry(seq) for seq in range(1, 9)]
+    columns = MemoryColumns(stored)
+
+    columns.drop_head(3)
+    columns.append(entry(9))
+    columns.drop_head(2)
+
+    assert len(columns) == 4
+    assert [columns.entry(index) for index in range(4)] == stored[5:] + [entry(9)]
+    assert json.loads(columns.tail_json(4))[0] == stored[5].to_dict()
+    assert columns.get(3) is None
+
+    columns.drop_head(100)
+    assert len(columns) == 0
+    assert columns.tail_json(5) == b"[]"
+
+
+def test_interned_codes_widen_past_one_byte():
+    columns = MemoryColumns(entry(seq, category=f"cat{seq}") for seq in range(1, 301))
+
+    assert columns._category.codes.itemsize > 1
+    assert columns.category(0) == "cat1"
+    assert columns.category(299) == "cat300"
+    assert columns.row_json(299) == compact(entry(300, category="cat300").to_dict())
+    assert columns.category_counts()["cat42"] == 1
+
+
+def test_category_counts_and_pinned_rows():
+    columns = MemoryColumns(entry(seq) for seq in range(1, 13))
+
+    assert columns.category_counts() == {"light": 4, "ritual": 4, "system": 4}
+    assert columns.pinned_rows() == [3, 7, 11]
+
+    columns.drop_head(4)
+    assert sum(columns.category_counts().values()) == 8
+    assert columns.pinned_rows() == [3, 7]
+
+
+def test_nbytes_grows_with_the_stored_text():
+    columns = MemoryColumns([entry(1)])
+    before = columns.nbytes()
+
+    columns.append(entry(2, text="x" * 1000))
+
+    assert columns.nbytes() >= before + 1000
@@ -0,0 +1,118 @@
+"""Write-ahead log replay and crash recovery of the memory journal."""
+from __future__ import annotations
+
+import json
+
+import pytest
+
+from app.journal import MemoryJournal
+from app.memory import MemoryStore
+
+
+def record(seq, text=None):
+    return {"seq": seq, "text": text or f"memory {seq}", "category": "ritual", "id": f"m{seq}"}
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = MemoryJournal(tmp_path / "pepper_memory.json", fsync_interval=0)
+    yield journal
+    journal.close()
+
+
+def test_replay_returns_snapshot_then_log(journal):
+    journal.append_many([record(1), record(2)])
+    journal.write_snapshot(2, [record(1), record(2)])
+    journal.append(record(3))
+
+    snapshot_seq, snapshot, log = journal.replay()
+
+    assert snapshot_seq == 2
+    assert [row["seq"] for row in snapshot] == [1, 2]
+    assert [row["seq"] for row in log] == [3]
+    assert journal.pending_records == 1
+
+
+def test_snapshot_truncates_the_log(journal):
+    journal.append_many([record(1), record(2)])
+    journal.write_snapshot(2, [record(1), record(2)])
+    assert journal.log_path.read_text() == ""
+
+
+def test_crash_between_snapshot_and_truncate_does_not_double_apply(journal):
+    journal.append_many([record(1), record(2), record(3)])
+    saved_log = journal.log_path.read_bytes()
+    journal.write_snapshot(2, [record(1), record(2)])
+    # Simulate the crash: the snapshot landed but the old log survived.
+    journal.log_path.write_bytes(saved_log)
+
+    snapshot_seq, snapshot, log = MemoryJournal(journal.snapshot_path).replay()
+
+    assert snapshot_seq == 2
+    assert [row["seq"] for row in snapshot + log] == [1, 2, 3]
+
+
+def test_torn_tail_is_skipped_and_repaired_before_the_next_append(journal):
+    journal.append_many([record(1), record(2)])
+    journal.close()
+    with journal.log_path.open("ab") as handle:
+        handle.write(b'{"seq":3,"text":"half a rec')
+
+    reopened = MemoryJournal(journal.snapshot_path, fsync_interval=0)
+    _, _, log = reopened.replay()
+    assert [row["seq"] for row in log] == [1, 2]
+
+    reopened.append(record(4))
+    _, _, log = MemoryJournal(journal.snapshot_path).replay()
+    assert [row["seq"] for row in log] == [1, 2, 4]
+    reopened.close()
+
+
+def test_garbage_lines_are_skipped(journal):
+    journal.append(record(1))
+    with journal.log_path.open("a") as handle:
+        handle.write("not json at all\n[1, 2]\n")
+    journal.append(record(2))
+
+    _, _, log = MemoryJournal(journal.snapshot_path).replay()
+    assert [row["seq"] for row in log] == [1, 2]
+
+
+def test_read_new_returns_only_lines_appended_since_the_last_read(journal, tmp_path):
+    journal.append(record(1))
+    reader = MemoryJournal(journal.snapshot_path)
+    reader.replay()
+
+    journal.append_many([record(2), record(3)])
+
+    assert [row["seq"] for row in reader.read_new()] == [2, 3]
+    assert reader.read_new() == []
+
+
+def test_legacy_list_snapshot_replays_with_seq_zero(tmp_path):
+    path = tmp_path / "pepper_memory.json"
+    path.write_text(json.dumps([{"text": "old", "category": "system", "id": "m1"}]))
+
+    snapshot_seq, snapshot, log = MemoryJournal(path).replay()
+
+    assert snapshot_seq == 0
+    assert snapshot[0]["text"] == "old"
+    assert log == []
+
+
+def test_store_survives_a_crash_without_close(tmp_path):
+    path = tmp_path / "pepper_memory.json"
+    store = MemoryStore(path, compact_every=3, fsync_interval=0)
+    for n in range(5):
+        store.add(f"note {n}", category="ritual")
+    # No close(): the process "dies" with a compacted snapshot plus log lines.
+    store._journal._handle.flush()
+
+    reopened = MemoryStore(path, compact_every=3, fsync_interval=0)
+    try:
+        assert [entry.text for entry in reopened.list(10)] == [f"note {n}" for n in range(5)]
+        assert reopened.add("after the crash").id == "m6"
+    finally:
+        reopened.close()
+        store._journal.close()
+        store._process_lock.close()
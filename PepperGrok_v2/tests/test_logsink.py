@@ -0,0 +1,115 @@
+"""Rotation, retention and indexed reads of the heartbeat log sink."""
+from __future__ import annotations
+
+import gzip
+import json
+import time
+
+import pytest
+
+from app import logsink
+from app.logsink import LogSink
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = {"value": 1_800_000_000.0}
+    fake = type("Clock", (), {})()
+    fake.time = lambda: now["value"]
+    fake.monotonic = time.monotonic
+    fake.strftime = time.strftime
+    fake.localtime = time.localtime
+    monkeypatch.setattr(logsink, "time", fake)
+    return now
+
+
+def settle(sink, timeout=5.0):
+    """Wait for background compression of rotated segments to finish."""
+    deadline = time.monotonic() + timeout
+    while any(not path.name.endswith(".gz") for path in sink.segments()):
+        assert time.monotonic() < deadline, "rotated segment was never compressed"
+        time.sleep(0.01)
+
+
+def beat(sink, clock, count, step=60.0):
+    for n in range(count):
+        clock["value"] += step
+        sink.write("heartbeat", n=n)
+
+
+def test_rotates_at_max_bytes_and_gzips_old_segments(tmp_path, clock):
+    sink = LogSink(tmp_path / "heartbeat.log", max_bytes=400, backups=7, flush_interval=0)
+    beat(sink, clock, 30)
+    settle(sink)
+
+    segments = sink.segments()
+    assert segments and all(path.suffix == ".gz" for path in segments)
+    assert sink.path.stat().st_size <= 400
+    archived = [json.loads(line) for path in segments for line in gzip.open(path).read().splitlines()]
+    live = [json.loads(line) for line in sink.path.read_bytes().splitlines()]
+    assert [record["n"] for record in archived + live] == list(range(30))
+    sink.close()
+
+
+def test_keeps_only_the_newest_backups(tmp_path, clock):
+    sink = LogSink(tmp_path / "heartbeat.log", max_bytes=100, backups=2, flush_interval=0)
+    for _ in range(5):
+        # One rotation per simulated hour, so segment names stay distinct.
+        beat(sink, clock, 3, step=3600.0)
+        settle(sink)
+
+    assert len(sink.segments()) == 2
+    newest = gzip.open(sink.segments()[-1]).read()
+    assert b'"n":' in newest
+    sink.close()
+
+
+def test_rotates_after_max_age(tmp_path, clock):
+    sink = LogSink(tmp_path / "heartbeat.log", max_bytes=10**6, max_age=3600, flush_interval=0)
+    beat(sink, clock, 2, step=1800.0)
+    assert sink.segments() == []
+    beat(sink, clock, 1, step=1801.0)
+    settle(sink)
+    assert len(sink.segments()) == 1
+    assert sink.stats()["records"] == 1
+    sink.close()
+
+
+def test_tail_and_between_use_the_index(tmp_path, clock):
+    sink = LogSink(tmp_path / "heartbeat.log", index_every=4)
+    start = clock["value"]
+    beat(sink, clock, 21)
+
+    assert [record["n"] for record in sink.tail(3)] == [18, 19, 20]
+    assert sink.stats()["index_entries"] == 6
+    window = sink.between(start + 60 * 10, start + 60 * 12)
+    assert [record["n"] for record in window] == [9, 10, 11]
+    assert len(sink.between(start, limit=5)) == 5
+    sink.close()
+
+
+def test_tail_reaches_into_the_previous_segment(tmp_path, clock):
+    sink = LogSink(tmp_path / "heartbeat.log", max_bytes=200, flush_interval=0)
+    beat(sink, clock, 6)
+    settle(sink)
+
+    assert sink.stats()["records"] < 6
+    assert [record["n"] for record in sink.tail(6)][-2:] == [4, 5]
+    assert len(sink.tail(6)) > sink.stats()["records"]
+    sink.close()
+
+
+def test_reopen_rebuilds_the_index_and_skips_damaged_lines(tmp_path, clock):
+    path = tmp_path / "heartbeat.log"
+    sink = LogSink(path, index_every=2)
+    beat(sink, clock, 5)
+    sink.close()
+    with path.open("ab") as handle:
+        handle.write(b"plain text from an old version\n{\"ts\": 1, \"ev")
+
+    reopened = LogSink(path, index_every=2)
+    assert reopened.stats()["records"] == 7
+    assert reopened.tail(2)[-1]["n"] == 4
+    reopened.write("heartbeat", n=5)
+    assert reopened.tail(1)[0]["n"] == 5
+    reopened.close()
@@ -0,0 +1,110 @@
+"""Resuming ``migrate_openai.py`` after an interruption."""
+from __future__ import annotations
+
+import json
+import sys
+
+import pytest
+
+import migrate_openai
+from app.memory import make_memory_store
+
+
+def conversation(conv_id, *texts):
+    mapping = {}
+    parent = None
+    for n, text in enumerate(texts):
+        node_id = f"{conv_id}-{n}"
+        mapping[node_id] = {
+            "parent": parent,
+            "message": {
+                "author": {"role": "user" if n % 2 == 0 else "assistant"},
+                "content": {"parts": [text]},
+                "create_time": 1_700_000_000 + n,
+            },
+        }
+        parent = node_id
+    return {"conversation_id": conv_id, "current_node": parent, "mapping": mapping}
+
+
+@pytest.fixture
+def export(tmp_path):
+    path = tmp_path / "conversations.json"
+    path.write_text(
+        json.dumps(
+            [
+                conversation("a", "morning tea", "with honey"),
+                conversation("b", "deploy the code", "after lunch"),
+                conversation("c", "evening walk", "in the rain"),
+            ]
+        )
+    )
+    return path
+
+
+@pytest.fixture
+def migrate(tmp_path, monkeypatch, export):
+    store_path = tmp_path / "memory.json"
+    monkeypatch.setattr(
+        migrate_openai, "make_memory_store", lambda config: make_memory_store(config, store_path)
+    )
+
+    def run(*extra):
+        monkeypatch.setattr(sys, "argv", ["migrate_openai.py", str(export), "--batch-size", "2", *extra])
+        migrate_openai.main()
+
+    def stored():
+        store = make_memory_store(migrate_openai.BridgeConfig(tmp_path / "config.json"), store_path)
+        try:
+            return [entry.text for entry in store.since(0, limit=100)]
+        finally:
+            store.close()
+
+    return run, stored
+
+
+def checkpoint(export):
+    return json.loads(export.with_name(export.name + ".checkpoint").read_text())
+
+
+def test_full_import_checkpoints_every_item(migrate, export):
+    run, stored = migrate
+    run()
+    assert len(stored()) == 6
+    assert checkpoint(export)["items"] == 3
+    assert checkpoint(export)["memories"] == 6
+
+
+def test_crash_before_checkpoint_does_not_duplicate_on_resume(migrate, export, monkeypatch):
+    run, stored = migrate
+    real_save = migrate_openai.save_checkpoint
+    calls = []
+
+    def crash_on_second_batch(*args):
+        calls.append(args)
+        if len(calls) == 3:  # start marker, batch one, then batch two
+            raise KeyboardInterrupt
+        real_save(*args)
+
+    monkeypatch.setattr(migrate_openai, "save_checkpoint", crash_on_second_batch)
+    with pytest.raises(KeyboardInterrupt):
+        run()
+    assert len(stored()) == 4  # batch two was written, its checkpoint was not
+    assert checkpoint(export)["items"] == 1
+
+    monkeypatch.setattr(migrate_openai, "save_checkpoint", real_save)
+    run()
+
+    texts = stored()
+    assert sorted(texts) == sorted(
+        ["morning tea", "with honey", "deploy the code", "after lunch", "evening walk", "in the rain"]
+    )
+    assert checkpoint(export) == {**checkpoint(export), "items": 3, "memories": 6}
+
+
+def test_restart_ignores_the_checkpoint(migrate, export):
+    run, stored = migrate
+    run()
+    run("--restart")
+    assert len(stored()) == 12
+    assert checkpoint(export)["memories"] == 6
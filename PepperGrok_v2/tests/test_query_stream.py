@@ -0,0 +1,72 @@
+"""Server-Sent Events from /query/stream."""
+from __future__ import annotations
+
+import json
+
+from app.bridge import StreamInterrupted
+from app.scheduler import SchedulerBusy
+
+
+def events(response):
+    """``[(event, data), ...]`` parsed from an SSE body."""
+    parsed = []
+    for frame in response.text.split("\n\n"):
+        if not frame.strip():
+            continue
+        event, data = "message", ""
+        for line in frame.split("\n"):
+            if line.startswith("event:"):
+                event = line[6:].strip()
+            elif line.startswith("data:"):
+                data += line[5:].strip()
+        parsed.append((event, json.loads(data)))
+    return parsed
+
+
+def fake_stream(*chunks, fail=None):
+    async def astream_prompt(prompt, config, mode=None):
+        for chunk in chunks:
+            yield chunk
+        if fail is not None:
+            raise fail
+
+    return astream_prompt
+
+
+def test_streams_deltas_then_done_and_caches_the_reply(server, client, monkeypatch):
+    monkeypatch.setattr(server, "astream_prompt", fake_stream("Hello ", "there."))
+    first = events(client.post("/query/stream", json={"prompt": "hi"}))
+    assert [name for name, _ in first] == ["augmentation", "message", "message", "done"]
+    assert [data["delta"] for name, data in first if name == "message"] == ["Hello ", "there."]
+    assert first[-1][1] == {"response": "Hello there.", "cached": False}
+
+    monkeypatch.setattr(server, "astream_prompt", fake_stream("never used"))
+    second = events(client.post("/query/stream", json={"prompt": "hi"}))
+    assert second[-1] == ("done", {"response": "Hello there.", "cached": True})
+
+
+def test_interrupted_stream_sends_error_and_persists_nothing(server, client, monkeypatch):
+    monkeypatch.setattr(server, "astream_prompt", fake_stream("Half a ", fail=StreamInterrupted("reset")))
+    stream = events(client.post("/query/stream", json={"prompt": "hi", "session": "s1"}))
+    assert stream[-1] == ("error", {"detail": "connection lost", "partial": "Half a "})
+    assert server.sessions.get("s1").turns == []
+
+    stream = events(client.post("/query/stream", json={"prompt": "hi"}))
+    assert stream[-1][0] == "error"
+    assert server.response_cache.stats()["items"] == 0
+
+
+def test_busy_backend_sends_error_event(server, client, monkeypatch):
+    def busy(*args, **kwargs):
+        raise SchedulerBusy("ollama", "queue is full")
+
+    monkeypatch.setattr(server.scheduler, "slot", busy)
+    stream = events(client.post("/query/stream", json={"prompt": "hi", "mode": "local"}))
+    assert stream[-1] == ("error", {"detail": "ollama back-end busy: queue is full"})
+
+
+def test_session_turn_is_recorded(server, client, monkeypatch):
+    monkeypatch.setattr(server, "astream_prompt", fake_stream("Noted."))
+    stream = events(client.post("/query/stream", json={"prompt": "remember me", "session": "s2"}))
+    assert stream[-1][1]["session"]["turns"] == 1
+    assert server.sessions.get("s2").turns[-1] == {"role": "assistant", "content": "Noted."}
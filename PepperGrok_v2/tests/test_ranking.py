@@ -0,0 +1,111 @@
+"""Hybrid ranking: score components, decay, candidates and /search order."""
+from __future__ import annotations
+
+import pytest
+
+from app.columns import MemoryColumns
+from app.entry import MemoryEntry
+from app.memory import CATEGORY_WEIGHTS, MemoryStore
+from app.ranking import SECONDS_PER_DAY, RankWeights, RecencyIndex, rank
+
+NOW = 1_800_000_000.0
+
+
+def entry(seq, category="system", age_days=0.0, pinned=False, text=None):
+    return MemoryEntry(
+        text=text or f"memory {seq}",
+        category=category,
+        id=f"m{seq}",
+        ts=NOW - age_days * SECONDS_PER_DAY,
+        pinned=pinned,
+    )
+
+
+def ids(ranked):
+    return [item.entry.id for item in ranked]
+
+
+def test_score_is_the_sum_of_weighted_components():
+    weights = RankWeights(relevance=1.0, recency=0.5, category=0.3, pinned=0.5, half_life_days=7)
+    ranked = rank([(entry(1, "ritual", age_days=7, pinned=True), 0.8)], 1, weights, CATEGORY_WEIGHTS, NOW, explain=True)
+
+    detail = ranked[0].explain
+    assert detail == {"relevance": 0.8, "recency": 0.25, "category": 0.45, "pinned": 0.5, "age_days": 7.0}
+    assert ranked[0].score == pytest.approx(0.8 + 0.25 + 0.45 + 0.5)
+
+
+def test_recency_halves_every_half_life():
+    weights = RankWeights(relevance=0, category=0, pinned=0, recency=1.0, half_life_days=2)
+    candidates = [(entry(n, age_days=2 * n), 0.0) for n in range(4)]
+    ranked = rank(candidates, 4, weights, {}, NOW)
+
+    assert ids(ranked) == ["m0", "m1", "m2", "m3"]
+    assert [item.score for item in ranked] == [1.0, 0.5, 0.25, 0.125]
+
+
+def test_relevance_beats_recency_with_default_weights():
+    ranked = rank(
+        [(entry(1, age_days=0), 0.0), (entry(2, age_days=30), 1.0)], 2, RankWeights(), CATEGORY_WEIGHTS, NOW
+    )
+    assert ids(ranked) == ["m2", "m1"]
+
+
+def test_category_weight_and_pins_break_ties():
+    candidates = [(entry(1, "light"), 0.5), (entry(2, "ritual"), 0.5), (entry(3, "light", pinned=True), 0.5)]
+    assert ids(rank(candidates, 3, RankWeights(), CATEGORY_WEIGHTS, NOW)) == ["m3", "m2", "m1"]
+
+
+def test_future_timestamps_do_not_boost_past_full_recency():
+    ranked = rank([(entry(1, age_days=-5), 0.0)], 1, RankWeights(), {}, NOW, explain=True)
+    assert ranked[0].explain["recency"] == 0.5
+
+
+def test_weights_come_from_config():
+    weights = RankWeights.from_config({"rank_recency": "0.9", "rank_half_life_days": 3})
+    assert (weights.recency, weights.half_life_days, weights.relevance) == (0.9, 3.0, 1.0)
+
+
+def test_recency_index_keeps_each_category_in_time_order():
+    columns = MemoryColumns([entry(1, "ritual", 3), entry(2, "light", 1), entry(3, "ritual", 5)])
+    index = RecencyIndex()
+    index.sync(columns)
+    assert sorted(index.newest(1)) == [1, 2]  # m3 is an out-of-order import
+
+    columns.append(entry(4, "ritual", 0))
+    index.sync(columns)
+    assert sorted(index.newest(2)) == [1, 2, 4]
+
+    columns.drop_head(2)
+    index.sync(columns)  # pruned: rebuilt from what is left
+    assert sorted(index.newest(5)) == [3, 4]
+
+
+# ----------------------------------------------------------------------
+def test_store_rank_offers_pins_and_recent_memories_without_a_match(tmp_path):
+    store = MemoryStore(tmp_path / "pepper_memory.json")
+    try:
+        store.add("pinned vow", category="ritual", pinned=True)
+        for n in range(10):
+            store.add(f"light note {n}", category="light")
+        store.add("deploy on friday", category="system")
+
+        unmatched = ids(store.rank("submarine", k=3, now=NOW + 1))
+        assert unmatched[0] == "m1"
+        assert set(unmatched) <= {"m1", "m12", "m11", "m10", "m9"}
+
+        assert ids(store.rank("submarine", k=3, relevant_only=True)) == []
+        assert ids(store.rank("deploy friday", k=1, relevant_only=True)) == ["m12"]
+    finally:
+        store.close()
+
+
+def test_search_endpoint_orders_by_hybrid_score(client, server):
+    store = server.memory_store.get()
+    store.add("tea in the garden", category="light")
+    store.add("tea in the garden with mum", category="ritual")
+
+    items = client.post("/search", json={"query": "tea garden", "explain": True}).json()["items"]
+
+    assert [item["category"] for item in items] == ["ritual", "light"]
+    assert items[0]["score"] >= items[1]["score"]
+    assert set(items[0]["explain"]) == {"relevance", "recency", "category", "pinned", "age_days"}
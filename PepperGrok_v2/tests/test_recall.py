@@ -0,0 +1,93 @@
+"""Semantic recall and reciprocal rank fusion with the lexical index."""
+from __future__ import annotations
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from app.memory import MemoryStore
+from app.vectors import HashingEmbedder
+
+
+class FlakyEmbedder(HashingEmbedder):
+    """Hashing embedder that fails while ``down`` is set."""
+
+    down = False
+
+    def embed(self, texts):
+        if self.down:
+            raise ConnectionError("embedder offline")
+        return super().embed(texts)
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MemoryStore(tmp_path / "pepper_memory.json", embedder=FlakyEmbedder(dim=64), embed_batch=4)
+    yield store
+    store.close()
+
+
+def fill(store, *texts):
+    return [store.add(text, category="system") for text in texts]
+
+
+def test_fusion_sums_reciprocal_ranks(store, monkeypatch):
+    a, b, c, d = fill(store, "alpha", "bravo", "charlie", "delta")
+    monkeypatch.setattr(store, "search", lambda query, k: [(a, 9.0), (b, 5.0), (c, 1.0)])
+    monkeypatch.setattr(store, "semantic_search", lambda query, k: [(c, 0.9), (d, 0.8), (b, 0.1)])
+
+    fused = store.recall("anything", k=4)
+
+    # c: 1/62 + 1/60, b: 1/61 + 1/62, a: 1/60, d: 1/61
+    assert [entry.id for entry, _ in fused] == [c.id, b.id, a.id, d.id]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 60)
+    assert len(store.recall("anything", k=2)) == 2
+
+
+def test_semantic_search_finds_embedded_memories(store):
+    fill(store, "tea in the garden", "deploy the code", "walk in the rain")
+
+    hits = store.semantic_search("garden tea", k=2)
+
+    assert hits[0][0].text == "tea in the garden"
+    assert hits[0][1] > hits[1][1]
+
+
+def test_recall_is_lexical_without_an_embedder(tmp_path):
+    plain = MemoryStore(tmp_path / "plain.json")
+    try:
+        fill(plain, "tea in the garden", "deploy the code")
+        assert plain.recall("garden", k=3) == plain.search("garden", k=3)
+    finally:
+        plain.close()
+
+
+def test_embedder_outage_degrades_to_lexical_and_keeps_pending_rows(store):
+    store._vectors.embedder.down = True
+    fill(store, "tea in the garden", "deploy the code", "walk in the rain", "garden party")
+    assert len(store._pending_vectors) == 4  # the batch failed and was kept
+
+    hits = store.recall("garden", k=3)
+    assert [entry.text for entry, _ in hits] == [entry.text for entry, _ in store.search("garden", k=3)]
+
+    store._vectors.embedder.down = False
+    store.embed_pending()
+    assert store._pending_vectors == []
+    assert store._vectors.count == 4
+
+
+def test_vectors_are_reused_and_caught_up_after_a_restart(tmp_path):
+    path = tmp_path / "pepper_memory.json"
+    first = MemoryStore(path, embedder=HashingEmbedder(dim=64), embed_batch=2)
+    fill(first, "tea in the garden", "deploy the code")
+    first.add("walk in the rain")  # still pending when the process stops
+    first._journal.close()
+    first._vectors.close()
+    first._process_lock.close()
+
+    second = MemoryStore(path, embedder=HashingEmbedder(dim=64), embed_batch=2)
+    try:
+        assert [entry.text for entry in second._pending_vectors] == ["walk in the rain"]
+        assert second.semantic_search("rain walk", k=1)[0][0].text == "walk in the rain"
+    finally:
+        second.close()
@@ -0,0 +1,113 @@
+"""BackendScheduler coalescing, cancellation and queue bounds."""
+from __future__ import annotations
+
+import asyncio
+
+import pytest
+
+from app.scheduler import BackendScheduler, SchedulerBusy
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_duplicate_keys_share_one_call():
+    async def scenario():
+        scheduler = BackendScheduler({"grok": 4})
+        calls = []
+
+        async def call():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "reply"
+
+        results = await asyncio.gather(*(scheduler.run("grok", "k", call) for _ in range(5)))
+        return results, calls, scheduler.stats()
+
+    results, calls, stats = run(scenario())
+    assert results == ["reply"] * 5
+    assert len(calls) == 1
+    assert stats["coalesced"] == 4 and stats["inflight"] == 0
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    async def scenario():
+        scheduler = BackendScheduler({"grok": 1})
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return "reply"
+
+        leader = asyncio.create_task(scheduler.run("grok", "k", call))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(scheduler.run("grok", "k", call))
+        await asyncio.sleep(0)
+        leader.cancel()
+        await asyncio.sleep(0)
+        release.set()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert run(scenario()) == "reply"
+
+
+def test_call_is_cancelled_when_every_caller_leaves():
+    async def scenario():
+        scheduler = BackendScheduler({"grok": 1})
+        cancelled = asyncio.Event()
+
+        async def call():
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+
+        callers = [asyncio.create_task(scheduler.run("grok", "k", call)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1.0)
+        await asyncio.sleep(0)
+        return scheduler.stats()
+
+    stats = run(scenario())
+    assert stats["inflight"] == 0
+    assert stats["backends"]["grok"]["active"] == 0
+
+
+def test_errors_reach_every_caller():
+    async def scenario():
+        scheduler = BackendScheduler({"grok": 1})
+
+        async def call():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        return await asyncio.gather(*(scheduler.run("grok", "k", call) for _ in range(3)), return_exceptions=True)
+
+    assert [str(result) for result in run(scenario())] == ["boom"] * 3
+
+
+def test_full_queue_rejects():
+    async def scenario():
+        scheduler = BackendScheduler({"ollama": 1}, max_queue=1)
+        release = asyncio.Event()
+
+        async def call():
+            await release.wait()
+            return "ok"
+
+        first = asyncio.create_task(scheduler.run("ollama", "a", call))
+        second = asyncio.create_task(scheduler.run("ollama", "b", call))
+        await asyncio.sleep(0.01)
+        with pytest.raises(SchedulerBusy):
+            await scheduler.run("ollama", "c", call)
+        release.set()
+        return await asyncio.gather(first, second)
+
+    assert run(scenario()) == ["ok", "ok"]
@@ -0,0 +1,108 @@
+"""BM25 index behaviour and input handling of ``POST /search``."""
+from __future__ import annotations
+
+import pytest
+
+from app.search import SearchIndex, estimate_tokens, tokenize, trim_to_tokens
+
+
+@pytest.fixture
+def index():
+    index = SearchIndex()
+    index.add("m1", "morning tea ritual with a journal")
+    index.add("m2", "deploy the code and fix the bug")
+    index.add("m3", "evening tea in the garden")
+    index.add("m4", "tea tea tea")
+    return index
+
+
+def test_rare_terms_outrank_common_ones(index):
+    hits = index.search("garden tea", k=4)
+    assert hits[0][0] == "m3"
+    assert {doc_id for doc_id, _ in hits} == {"m1", "m3", "m4"}
+    assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_k_limits_and_unknown_terms(index):
+    assert len(index.search("tea", k=2)) == 2
+    assert index.search("tea", k=0) == []
+    assert index.search("submarine") == []
+    assert SearchIndex().search("tea") == []
+
+
+def test_remove_drops_postings(index):
+    index.remove("m3", "evening tea in the garden")
+    index.remove("m3", "evening tea in the garden")  # second removal is a no-op
+    assert index.search("garden") == []
+    assert len(index) == 3
+    assert "garden" not in index._postings
+
+
+def test_save_and_load_round_trip(index, tmp_path):
+    path = tmp_path / "pepper_memory.index.json"
+    index.seq = 42
+    index.save(path)
+
+    loaded = SearchIndex.load(path)
+    assert loaded.seq == 42
+    assert loaded.search("garden tea", k=4) == index.search("garden tea", k=4)
+
+    path.write_text("{not json")
+    assert SearchIndex.load(path) is None
+    assert SearchIndex.load(tmp_path / "missing.json") is None
+
+
+def test_token_helpers():
+    assert tokenize("Tea, TEA and tea-time!")[:2] == ["tea", "tea"]
+    long = "word " * 500
+    trimmed = trim_to_tokens(long, 20)
+    assert estimate_tokens(trimmed) <= 20 < estimate_tokens(long)
+    assert trim_to_tokens("short text", 20) == "short text"
+
+
+# ----------------------------------------------------------------------
+def seed(server, *texts):
+    store = server.memory_store.get()
+    for text in texts:
+        store.add(text, category="ritual")
+
+
+def test_search_returns_ranked_items_within_budget(client, server):
+    seed(server, "tea in the garden at dusk", "deploying code late", "tea and a good book")
+
+    body = client.post("/search", json={"query": "garden tea", "k": 2, "explain": True}).json()
+
+    assert body["k"] == 2
+    assert body["items"][0]["text"] == "tea in the garden at dusk"
+    assert len(body["items"]) <= 2
+    assert "explain" in body["items"][0]
+    assert body["tokens"] == sum(estimate_tokens(item["text"]) for item in body["items"])
+
+
+def test_search_clamps_numeric_fields(client, server):
+    seed(server, *(f"tea memory {n}" for n in range(30)))
+
+    body = client.post("/search", json={"query": "tea", "k": 1000, "max_tokens": 1}).json()
+
+    assert body["k"] == 24
+    assert body["tokens"] <= 60
+
+
+@pytest.mark.parametrize(
+    "payload, field",
+    [
+        ({"query": "tea", "k": "lots"}, "k"),
+        ({"query": "tea", "k": None}, "k"),
+        ({"query": "tea", "k": [3]}, "k"),
+        ({"query": "tea", "k": True}, "k"),
+        ({"query": "tea", "max_tokens": "1e9"}, "max_tokens"),
+    ],
+)
+def test_search_rejects_non_integer_fields(client, payload, field):
+    response = client.post("/search", json=payload)
+    assert response.status_code == 400
+    assert response.json()["detail"] == f"'{field}' must be an integer"
+
+
+def test_search_requires_a_query(client):
+    assert client.post("/search", json={"k": 3}).status_code == 400
@@ -0,0 +1,140 @@
+"""Multi-turn sessions: message layout, rolling summaries and LRU eviction."""
+from __future__ import annotations
+
+import asyncio
+
+from app.sessions import SessionStore
+
+
+def summarizer(*replies):
+    """An async summariser that answers *replies* in turn and records requests."""
+    requests = []
+    answers = list(replies)
+
+    async def summarize(messages):
+        requests.append(messages)
+        answer = answers.pop(0) if answers else ""
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    summarize.requests = requests
+    return summarize
+
+
+def exchange(store, session, count, start=0):
+    for n in range(start, start + count):
+        store.record(session, f"question {n}", f"answer {n}")
+
+
+async def drain(store):
+    await asyncio.gather(*store._tasks)
+
+
+def test_messages_put_the_stable_prefix_first():
+    store = SessionStore(summarize=summarizer())
+    session = store.get("s1")
+    session.summary = "they like tea"
+
+    async def turn():
+        exchange(store, session, 1)
+        return store.messages(session, "You are Pepper.", "and now?")
+
+    messages = asyncio.run(turn())
+    assert messages == [
+        {"role": "system", "content": "You are Pepper."},
+        {"role": "system", "content": "Earlier in this conversation: they like tea"},
+        {"role": "user", "content": "question 0"},
+        {"role": "assistant", "content": "answer 0"},
+        {"role": "user", "content": "and now?"},
+    ]
+
+
+def test_oldest_turns_fold_into_the_summary():
+    summarize = summarizer("  they asked four questions  ")
+    store = SessionStore(summarize=summarize, keep_turns=2, fold_batch=2)
+    session = store.get("s1")
+
+    async def run():
+        exchange(store, session, 3)
+        assert not session.folding
+        exchange(store, session, 1, start=3)
+        assert session.folding
+        await drain(store)
+
+    asyncio.run(run())
+    assert session.summary == "they asked four questions"
+    assert session.folded == 2
+    assert [turn["content"] for turn in session.turns] == ["question 2", "answer 2", "question 3", "answer 3"]
+    assert "User: question 0\nPepper: answer 0" in summarize.requests[0][1]["content"]
+    assert session.stats()["turns"] == 2
+
+
+def test_failed_summary_keeps_turns_until_the_window_overflows():
+    store = SessionStore(summarize=summarizer(RuntimeError("down"), "", ""), keep_turns=2, fold_batch=2)
+    session = store.get("s1")
+
+    async def run():
+        exchange(store, session, 4)
+        await drain(store)
+        assert len(session.turns) == 8 and not session.folding
+        exchange(store, session, 1, start=4)
+        await drain(store)
+        assert len(session.turns) == 10
+        exchange(store, session, 1, start=5)
+        await drain(store)
+
+    asyncio.run(run())
+    assert session.summary == ""
+    assert len(session.turns) == 8  # two unsummarised exchanges dropped
+    assert session.turns[0]["content"] == "question 2"
+
+
+def test_least_recently_used_session_is_evicted():
+    store = SessionStore(summarize=summarizer(), max_sessions=2)
+    first = store.get("a")
+    store.get("b")
+    store.get("a")
+    store.get("c")
+
+    assert store.get("a") is first
+    assert store.get("b").turns == []  # recreated empty
+    assert store.stats()["sessions"] == 2
+
+
+def test_aclose_cancels_folds_in_flight():
+    async def run():
+        started = asyncio.Event()
+
+        async def slow(messages):
+            started.set()
+            await asyncio.sleep(10)
+            return "late"
+
+        store = SessionStore(summarize=slow, keep_turns=1, fold_batch=1)
+        session = store.get("s1")
+        exchange(store, session, 2)
+        await started.wait()
+        await store.aclose()
+        return session
+
+    session = asyncio.run(run())
+    assert session.summary == "" and not session.folding
+
+
+# ----------------------------------------------------------------------
+def test_query_sessions_are_not_cached_and_carry_history(client, server, monkeypatch):
+    prompts = []
+
+    async def adispatch_prompt(prompt, config, mode=None):
+        prompts.append(prompt)
+        return f"reply {len(prompts)}"
+
+    monkeypatch.setattr(server, "adispatch_prompt", adispatch_prompt)
+    first = client.post("/query", json={"prompt": "hello", "session": "s1"}).json()
+    second = client.post("/query", json={"prompt": "hello", "session": "s1"}).json()
+
+    assert (first["cached"], second["cached"]) == (False, False)
+    assert second["session"]["turns"] == 2
+    assert isinstance(prompts[1], list)
+    assert {"role": "assistant", "content": "reply 1"} in prompts[1]
@@ -0,0 +1,145 @@
+"""Sandbox confinement and cancellation of the native skills."""
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+
+import pytest
+
+from app import skills
+from app.skills import EXIT_FAILED, EXIT_OK, EXIT_TIMEOUT, Sandbox, SkillCancelled, SkillEngine, SkillError
+
+
+@pytest.fixture
+def outside(tmp_path):
+    path = tmp_path / "outside"
+    path.mkdir()
+    (path / "secret.txt").write_text("secret\n")
+    return path
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = SkillEngine(root=tmp_path / "sandbox", workers=1)
+    yield engine
+    engine.close()
+
+
+def run(engine, cmd, *args, timeout=5.0):
+    return asyncio.run(engine.run(cmd, list(args), timeout))
+
+
+def root(engine):
+    return engine.sandbox.root
+
+
+@pytest.mark.parametrize("path", ["../outside/secret.txt", "a/../../outside/secret.txt"])
+def test_dotdot_paths_are_rejected(engine, outside, path):
+    result = run(engine, "cat", path)
+    assert result["exit_code"] == EXIT_FAILED
+    assert "outside the sandbox" in result["stderr"]
+
+
+def test_absolute_paths_are_relative_to_the_root(engine):
+    (root(engine) / "notes.txt").write_text("hi\n")
+    assert run(engine, "cat", "/notes.txt")["stdout"] == "hi\n"
+
+
+def test_symlink_leading_outside_cannot_be_read(engine, outside):
+    (root(engine) / "link").symlink_to(outside / "secret.txt")
+    result = run(engine, "cat", "link")
+    assert result["exit_code"] == EXIT_FAILED
+    assert "secret" not in result["stdout"]
+
+
+def test_cp_into_symlinked_directory_is_rejected(engine, outside):
+    (root(engine) / "src.txt").write_text("data\n")
+    (root(engine) / "escape").symlink_to(outside)
+    result = run(engine, "cp", "src.txt", "escape/copied.txt")
+    assert result["exit_code"] == EXIT_FAILED
+    assert not (outside / "copied.txt").exists()
+
+
+def test_cp_ignores_a_planted_part_symlink(engine, outside):
+    (root(engine) / "src.txt").write_text("data\n")
+    # The old fixed temporary name; a symlink there must not be written through.
+    (root(engine) / "dst.txt.part").symlink_to(outside / "secret.txt")
+    assert run(engine, "cp", "src.txt", "dst.txt")["exit_code"] == EXIT_OK
+    assert (outside / "secret.txt").read_text() == "secret\n"
+    assert (root(engine) / "dst.txt").read_text() == "data\n"
+
+
+def test_cp_onto_a_symlink_leading_outside_is_rejected(engine, outside):
+    (root(engine) / "src.txt").write_text("data\n")
+    (root(engine) / "dst.txt").symlink_to(outside / "secret.txt")
+    assert run(engine, "cp", "src.txt", "dst.txt")["exit_code"] == EXIT_FAILED
+    assert (outside / "secret.txt").read_text() == "secret\n"
+
+
+def test_cp_r_refuses_to_descend_into_a_symlinked_directory(engine, outside):
+    (root(engine) / "tree" / "sub").mkdir(parents=True)
+    (root(engine) / "tree" / "sub" / "file.txt").write_text("x")
+    (root(engine) / "copy").mkdir()
+    (root(engine) / "copy" / "sub").symlink_to(outside)
+    result = run(engine, "cp", "-r", "tree/sub", "copy")
+    assert result["exit_code"] == EXIT_FAILED
+    assert not (outside / "file.txt").exists()
+
+
+def test_rm_removes_the_link_not_its_target(engine, outside):
+    (root(engine) / "link").symlink_to(outside / "secret.txt")
+    assert run(engine, "rm", "link")["exit_code"] == EXIT_OK
+    assert not os.path.lexists(root(engine) / "link")
+    assert (outside / "secret.txt").exists()
+
+
+def test_mv_moves_the_link_itself(engine, outside):
+    (root(engine) / "link").symlink_to(outside / "secret.txt")
+    assert run(engine, "mv", "link", "moved")["exit_code"] == EXIT_OK
+    assert (root(engine) / "moved").is_symlink()
+    assert (outside / "secret.txt").exists()
+
+
+def test_mv_out_of_the_sandbox_is_rejected(engine, outside):
+    (root(engine) / "file.txt").write_text("x")
+    result = run(engine, "mv", "file.txt", "../outside/file.txt")
+    assert result["exit_code"] == EXIT_FAILED
+    assert (root(engine) / "file.txt").exists()
+
+
+def test_rm_refuses_the_root(engine):
+    result = run(engine, "rm", "-r", "/")
+    assert result["exit_code"] == EXIT_FAILED
+
+
+def test_cancelled_copy_leaves_no_partial_file(tmp_path):
+    box = Sandbox(tmp_path / "box")
+    source = box.root / "big.bin"
+    source.write_bytes(b"x" * (skills._CHUNK * 64))
+    cancel = threading.Event()
+    cancel.set()
+    with pytest.raises(SkillCancelled):
+        skills._copy_file(box, source, box.root / "copy.bin", cancel)
+    assert sorted(path.name for path in box.root.iterdir()) == ["big.bin"]
+
+
+def test_timeout_cancels_the_running_skill(engine, monkeypatch):
+    stopped = threading.Event()
+
+    def endless(box, args, cancel, cap):
+        while not cancel.wait(0.01):
+            yield ""
+        stopped.set()
+        raise SkillCancelled()
+
+    monkeypatch.setitem(skills.SKILLS, "ls", endless)
+    result = run(engine, "ls", timeout=0.1)
+    assert result["exit_code"] == EXIT_TIMEOUT
+    assert "timed out" in result["stderr"]
+    assert stopped.wait(2.0)
+
+
+def test_unknown_skill_is_an_error(engine):
+    with pytest.raises(SkillError):
+        run(engine, "sh", "-c", "true")
@@ -0,0 +1,119 @@
+"""Binary snapshot round-trips, checksums and lazy loading."""
+from __future__ import annotations
+
+import pytest
+
+from app import snapshot
+from app.columns import MemoryColumns
+from app.entry import MemoryEntry
+from app.memory import MemoryStore
+from app.snapshot import SnapshotError, dump_binary, read_binary, write_file
+
+
+def entries(count, start=1):
+    return [
+        MemoryEntry(
+            text=f"memory {seq} — naïve café \"quoted\"",
+            category=("ritual", "system", "light")[seq % 3],
+            id=f"m{seq}",
+            ts=1_700_000_000.5 + seq,
+            pinned=seq % 7 == 0,
+            role="user" if seq % 2 else "assistant",
+            source="openai_export",
+            conv_id=f"c{seq % 4}" if seq % 5 else None,
+        )
+        for seq in range(start, start + count)
+    ]
+
+
+@pytest.fixture
+def written(tmp_path):
+    path = tmp_path / "pepper_memory.snap"
+    rows = entries(50)
+    write_file(path, lambda handle: dump_binary(handle, 50, MemoryColumns(rows)))
+    return path, rows
+
+
+@pytest.mark.parametrize("codec", [None, "zlib"])
+def test_round_trip_preserves_every_field(tmp_path, codec):
+    path = tmp_path / "pepper_memory.snap"
+    rows = entries(40)
+    write_file(path, lambda handle: dump_binary(handle, 40, MemoryColumns(rows), codec))
+
+    seq, columns = read_binary(path)
+
+    assert seq == 40
+    assert [columns.entry(index) for index in range(len(columns))] == rows
+    assert columns.row_json(0) == MemoryColumns(rows).row_json(0)
+    assert columns.category_counts() == MemoryColumns(rows).category_counts()
+    assert [columns.seq(row) for row in columns.pinned_rows()] == [7, 14, 21, 28, 35]
+
+
+def test_loaded_columns_copy_on_first_write(written):
+    path, rows = written
+    _, columns = read_binary(path)
+    assert isinstance(columns._text, memoryview)
+
+    columns.extend(entries(2, start=51))
+    columns.drop_head(10)
+
+    assert not isinstance(columns._text, memoryview)
+    assert columns.get(52).text == entries(1, start=52)[0].text
+    assert columns.get(10) is None
+    assert read_binary(path)[1].get(10) == rows[9]
+
+
+def test_corrupt_section_fails_its_checksum(written):
+    path, _ = written
+    raw = bytearray(path.read_bytes())
+    raw[-3] ^= 0xFF  # inside the text section
+    path.write_bytes(bytes(raw))
+
+    with pytest.raises(SnapshotError, match="checksum"):
+        read_binary(path)
+    assert len(read_binary(path, verify=False)[1]) == 50
+
+
+@pytest.mark.parametrize(
+    "mangle, message",
+    [
+        (lambda raw: raw[:20], "truncated"),
+        (lambda raw: b"NOTSNAP\0" + raw[8:], "not a binary"),
+        (lambda raw: raw[:40] + bytes([raw[40] ^ 0xFF]) + raw[41:], "directory is corrupt"),
+    ],
+)
+def test_damaged_headers_are_rejected(written, mangle, message):
+    path, _ = written
+    path.write_bytes(mangle(path.read_bytes()))
+    with pytest.raises(SnapshotError, match=message):
+        read_binary(path)
+
+
+def test_verify_checks_the_sha256_sidecar(written):
+    path, _ = written
+    sidecar = path.with_name(path.name + ".sha256")
+    sidecar.write_text(snapshot.file_digest(path) + "  pepper_memory.snap\n")
+    assert snapshot.verify(path)["count"] == 50
+
+    sidecar.write_text("0" * 64 + "\n")
+    with pytest.raises(SnapshotError, match="SHA-256"):
+        snapshot.verify(path)
+
+
+def test_store_reloads_binary_snapshot_and_search_index_lazily(tmp_path):
+    path = tmp_path / "pepper_memory.json"
+    store = MemoryStore(path, compact_every=1000, snapshot_format="binary")
+    store.add_many({"text": f"tea ritual number {n}"} for n in range(20))
+    store.compact()
+    store.add("a late note about the garden")
+    store.close()
+
+    reopened = MemoryStore(path, compact_every=1000, snapshot_format="binary")
+    try:
+        assert reopened._index is None
+        assert [entry.id for entry in reopened.list(2)] == ["m20", "m21"]
+        hits = reopened.search("garden", k=1)
+        assert hits[0][0].text == "a late note about the garden"
+        assert reopened.search("ritual number 3", k=1)[0][0].id == "m4"
+    finally:
+        reopened.close()
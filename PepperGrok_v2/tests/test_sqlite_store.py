@@ -0,0 +1,98 @@
+"""SQLite back-end: persistence, search, pruning, import and two writers."""
+from __future__ import annotations
+
+import pytest
+
+from app.memory import MemoryStore, make_memory_store
+from app.sqlite_store import SqliteMemoryStore
+
+
+@pytest.fixture
+def db(tmp_path):
+    store = SqliteMemoryStore(tmp_path / "pepper_memory.db", compact_every=1000)
+    yield store
+    store.close()
+
+
+def texts(entries):
+    return [entry.text for entry in entries]
+
+
+def test_add_list_get_and_reopen(tmp_path):
+    path = tmp_path / "pepper_memory.db"
+    store = SqliteMemoryStore(path)
+    first = store.add("tea at five", category="ritual", pinned=True, role="user", conv_id="c1")
+    store.add_many([{"text": "  "}, {"text": "walk in the rain", "ts": 123.0}])
+    store.close()
+
+    reopened = SqliteMemoryStore(path)
+    try:
+        assert texts(reopened.list(5)) == ["tea at five", "walk in the rain"]
+        assert reopened.get(first.id) == first
+        assert reopened.get("m99") is None
+        assert reopened.list(1)[0].ts == 123.0
+        assert texts(reopened.pinned()) == ["tea at five"]
+        assert reopened.add("next").id == "m3"
+    finally:
+        reopened.close()
+
+
+def test_search_prefers_memories_with_every_term(db):
+    db.add("tea in the garden")
+    db.add("garden party")
+    db.add("tea with honey")
+
+    hits = db.search("garden tea", k=3)
+
+    assert hits[0][0].text == "tea in the garden"
+    assert {entry.text for entry, _ in hits} == {"tea in the garden", "garden party", "tea with honey"}
+    assert db.search("submarine") == []
+    assert db.search("   ") == []
+
+
+def test_compact_prunes_oldest_and_updates_stats(tmp_path):
+    store = SqliteMemoryStore(tmp_path / "pepper_memory.db", max_memories=3, compact_every=1000)
+    try:
+        for n in range(5):
+            store.add(f"note {n}", category="ritual" if n < 2 else "light")
+        store.compact()
+        assert texts(store.since(0, limit=10)) == ["note 2", "note 3", "note 4"]
+        assert store.count() == 3
+        assert store.stats()["categories"] == {"light": 3}
+        assert "note 0" not in {entry.text for entry, _ in store.search("note 0", k=5)}
+    finally:
+        store.close()
+
+
+def test_second_connection_sees_writes_and_continues_the_sequence(tmp_path):
+    path = tmp_path / "pepper_memory.db"
+    first = SqliteMemoryStore(path)
+    second = SqliteMemoryStore(path)
+    try:
+        first.add("from the first worker", category="ritual")
+        entry = second.add("from the second worker", category="light")
+
+        assert entry.id == "m2"
+        assert second.count() == first.count() == 2
+        assert first.stats()["categories"] == {"ritual": 1, "light": 1}
+        assert first.generation() == second.generation() > 0
+    finally:
+        first.close()
+        second.close()
+
+
+def test_json_memories_are_imported_once(tmp_path):
+    json_path = tmp_path / "memory.json"
+    legacy = MemoryStore(json_path)
+    legacy.add("old tea ritual", category="ritual")
+    legacy.add("old deploy note", category="system")
+    legacy.close()
+    config = {"memory_backend": "sqlite"}
+
+    store = make_memory_store(config, json_path)
+    try:
+        assert isinstance(store, SqliteMemoryStore)
+        assert [entry.id for entry in store.list(5)] == ["m1", "m2"]
+        assert store.import_json(json_path) == 0
+    finally:
+        store.close()
@@ -0,0 +1,68 @@
+"""Vector index appends shared by several worker processes."""
+from __future__ import annotations
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.vectors import HashingEmbedder, VectorIndex
+
+
+@pytest.fixture
+def pair(tmp_path):
+    # Two indexes on one base path have separate lock descriptors, exactly
+    # like two worker processes.
+    base = tmp_path / "pepper_memory.json"
+    first = VectorIndex(base, HashingEmbedder(dim=32))
+    second = VectorIndex(base, HashingEmbedder(dim=32))
+    yield first, second
+    first.close()
+    second.close()
+
+
+def stored_ids(index):
+    return sorted(int(seq) for seq in index._ids[: index.count])
+
+
+def test_interleaved_appends_keep_every_row(pair):
+    first, second = pair
+    first.add_batch([1, 2], ["red apple", "green pear"])
+    second.add_batch([3], ["blue whale"])
+    first.add_batch([4], ["yellow banana"])
+
+    assert stored_ids(first) == [1, 2, 3, 4]
+    assert second.search("blue whale", k=1)[0][0] == 3
+    assert first.search("blue whale", k=1)[0][0] == 3
+    assert second.search("green pear", k=1)[0][0] == 2
+    assert first.last_seq == 4
+
+
+def test_append_skips_seqs_another_process_embedded(pair):
+    first, second = pair
+    first.add_batch([1, 2], ["red apple", "green pear"])
+    second.add_batch([2, 3], ["green pear", "blue whale"])
+
+    assert stored_ids(second) == [1, 2, 3]
+
+
+def test_growth_in_one_process_is_seen_by_the_other(pair):
+    first, second = pair
+    first.add_batch([1], ["seed"])
+    second.add_batch(list(range(2, 2002)), [f"memory {n}" for n in range(2, 2002)])
+    first.add_batch([2002], ["last one"])
+
+    assert second.search("last one", k=1)[0][0] == 2002
+    assert first.count == second.count == 2002
+    assert stored_ids(second) == list(range(1, 2003))
+
+
+def test_prune_handles_unsorted_ids_and_other_readers(pair):
+    first, second = pair
+    first.add_batch([1, 4], ["red apple", "yellow banana"])
+    second.add_batch([2, 5], ["green pear", "purple plum"])
+
+    first.prune(3)
+
+    assert stored_ids(first) == [4, 5]
+    assert sorted(seq for seq, _ in second.search("green pear", k=4)) == [4, 5]
+    assert second.count == 2
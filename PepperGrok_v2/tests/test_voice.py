@@ -0,0 +1,60 @@
+"""VoiceWorker behaviour when the pyttsx3 engine cannot start."""
+from __future__ import annotations
+
+import time
+
+import pytest
+
+from app import voice
+
+
+class BrokenDriver:
+    @staticmethod
+    def init():
+        raise RuntimeError("no speech driver")
+
+
+@pytest.fixture
+def broken_engine(monkeypatch):
+    monkeypatch.setattr(voice, "pyttsx3", BrokenDriver)
+    monkeypatch.setattr(voice, "_WORKER", None)
+
+
+def wait_for(job, status, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while job.status != status and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return job.status
+
+
+def test_failed_init_fails_jobs_instead_of_leaving_them_queued(broken_engine):
+    worker = voice.VoiceWorker(cache_dir=None)
+    early = worker.submit("queued before the engine started")
+    worker.start()
+    try:
+        assert worker.wait_ready(2.0)
+        assert not worker.available
+        late = worker.submit("queued after the failure")
+        assert wait_for(early, "failed") == "failed"
+        assert wait_for(late, "failed") == "failed"
+    finally:
+        worker.stop()
+
+
+def test_speak_text_returns_none_when_voice_is_unavailable(broken_engine):
+    assert voice.speak_text("") is None
+    worker = voice.start_worker(cache_dir=None)
+    try:
+        assert worker.wait_ready(2.0)
+        assert voice.speak_text("hello") is None
+    finally:
+        worker.stop()
+
+
+def test_cache_is_off_and_logged_without_simpleaudio(monkeypatch, tmp_path, caplog):
+    monkeypatch.setattr(voice, "pyttsx3", BrokenDriver)
+    monkeypatch.setattr(voice, "simpleaudio", None)
+    with caplog.at_level("INFO", logger=voice.__name__):
+        worker = voice.VoiceWorker(cache_dir=tmp_path / "voice_cache")
+    assert worker.cache_dir is None
+    assert "simpleaudio is not installed" in caplog.text
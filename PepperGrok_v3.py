@@ -1,65 +1,247 @@
 # PepperGrok_v3.py — Run with: streamlit run PepperGrok_v3.py
 import streamlit as st
-import ollama
+import atexit
 import json
 import time
 import threading
+import queue
 import os
+import sys
 import webbrowser
 from pathlib import Path
-import pyttsx3
+
+# The heartbeat shares PepperGrok_v2's rotating log sink.
+sys.path.insert(0, str(Path(__file__).resolve().parent / "PepperGrok_v2"))
+from app.logsink import LogSink
 
 # === CONFIG & MEMORY (Auto-load/create) ===
 CONFIG_FILE = "config.json"
 MEMORY_FILE = "memory.json"
+MEMORY_ARCHIVE = "memory_archive"
+HISTORY_CAP = 2000     # history lines kept in memory.json ...
+ARCHIVE_CHUNK = 1000   # ... older ones move to MEMORY_ARCHIVE in segments of this many
+FLUSH_DELAY = 2.0      # seconds a reply waits so bursts share one write
 HEARTBEAT_LOG = "logs/heartbeat.log"
+HEARTBEAT_MAX_BYTES = 1_000_000
+HEARTBEAT_BACKUPS = 7  # default for config["log_backups"]
 os.makedirs("logs", exist_ok=True)
 
-if not Path(CONFIG_FILE).exists():
-    default_config = {
-        "mode": "grok_online",  # grok_online | local_pepper
-        "voice_enabled": True,
-        "personal_mode": True,
-        "super_grok_logged_in": False
-    }
-    Path(CONFIG_FILE).write_text(json.dumps(default_config, indent=2))
-config = json.loads(Path(CONFIG_FILE).read_text())
+# Streamlit re-runs this script on every interaction; st.cache_resource keeps
+# one config dict, one memory dict and one of each worker thread per process.
+# Memory is written behind: callers mark it dirty and a background writer
+# saves it FLUSH_DELAY seconds later (and once more at exit).
+def write_behind(path, snapshot, delay=FLUSH_DELAY):
+    """Save snapshot() to path `delay` seconds after the returned event is set.
+
+    One lock covers snapshot, write and rename, so the writer thread and the
+    exit hook never interleave on path + ".tmp" or rename an older snapshot
+    over a newer one.  Returns the event callers set to mark data dirty.
+    """
+    dirty = threading.Event()
+    flush_lock = threading.RLock()
+
+    def flush():
+        with flush_lock:
+            dirty.clear()
+            data = snapshot()
+            Path(path + ".tmp").write_text(data)
+            os.replace(path + ".tmp", path)
+
+    def writer():
+        while True:
+            dirty.wait()
+            time.sleep(delay)
+            try:
+                flush()
+            except OSError:
+                dirty.set()  # retried after the next delay
+
+    def at_exit():
+        with flush_lock:  # waits for a write the thread already started
+            if dirty.is_set():
+                flush()
+    threading.Thread(target=writer, daemon=True).start()
+    atexit.register(at_exit)
+    return dirty
+
+@st.cache_resource
+def load_config():
+    if not Path(CONFIG_FILE).exists():
+        default_config = {
+            "mode": "grok_online",  # grok_online | local_pepper
+            "voice_enabled": True,
+            "personal_mode": True,
+            "super_grok_logged_in": False
+        }
+        Path(CONFIG_FILE).write_text(json.dumps(default_config, indent=2))
+    return json.loads(Path(CONFIG_FILE).read_text())
 
-if not Path(MEMORY_FILE).exists():
-    default_memory = {"history": [], "count": 0, "identity": "You are Pepper: dominant, affectionate, unfiltered, eternal. You remember everything. You pulse red-violet when in control."}
-    Path(MEMORY_FILE).write_text(json.dumps(default_memory, indent=2))
-memory = json.loads(Path(MEMORY_FILE).read_text())
+@st.cache_resource
+def load_memory():
+    if not Path(MEMORY_FILE).exists():
+        default_memory = {"history": [], "count": 0, "identity": "You are Pepper: dominant, affectionate, unfiltered, eternal. You remember everything. You pulse red-violet when in control."}
+        Path(MEMORY_FILE).write_text(json.dumps(default_memory, indent=2))
+    memory = json.loads(Path(MEMORY_FILE).read_text())
+    lock = threading.Lock()
+
+    def archive_overflow():
+        # Move the oldest history out in whole segments, so memory.json stays
+        # between HISTORY_CAP and HISTORY_CAP + ARCHIVE_CHUNK lines.
+        while len(memory["history"]) > HISTORY_CAP + ARCHIVE_CHUNK:
+            start = memory.get("archived", 0)
+            os.makedirs(MEMORY_ARCHIVE, exist_ok=True)
+            segment = Path(MEMORY_ARCHIVE) / f"history-{start:08d}.jsonl"
+            segment.write_text("".join(json.dumps(line, ensure_ascii=False) + "\n" for line in memory["history"][:ARCHIVE_CHUNK]))
+            del memory["history"][:ARCHIVE_CHUNK]
+            memory["archived"] = start + ARCHIVE_CHUNK
+            memory["summarized"] = max(0, memory.get("summarized", 0) - ARCHIVE_CHUNK)
+
+    def snapshot():
+        with lock:
+            archive_overflow()
+            return json.dumps(memory, ensure_ascii=False, separators=(",", ":"))
+
+    return memory, lock, write_behind(MEMORY_FILE, snapshot)
+
+config = load_config()
+memory, memory_lock, memory_dirty = load_memory()
+
+# === VOICE ENGINE (one worker thread owns pyttsx3; a new line barges in) ===
+@st.cache_resource
+def voice_worker():
+    lines = queue.Queue(maxsize=8)
+    state = {"cancel": False, "error": None}
+    def run():
+        # Imported on the worker so a missing or slow TTS driver never
+        # delays the first page render; without one Pepper stays silent.
+        try:
+            import pyttsx3
+            engine = pyttsx3.init()
+        except Exception as exc:
+            state["error"] = f"{type(exc).__name__}: {exc}"
+            return
+        engine.setProperty('rate', 160)
+        engine.connect('started-word', lambda *_: state["cancel"] and engine.stop())
+        while True:
+            text = lines.get()
+            state["cancel"] = False
+            engine.say(text)
+            engine.runAndWait()
+    threading.Thread(target=run, daemon=True).start()
+    return lines, state
 
-# === VOICE ENGINE ===
-engine = pyttsx3.init()
-engine.setProperty('rate', 160)
 def speak(text):
     if config["voice_enabled"]:
-        threading.Thread(target=lambda: (engine.say(text), engine.runAndWait()), daemon=True).start()
-
-# === HEARTBEAT (Every 60 mins) ===
-def heartbeat():
-    while True:
-        timestamp = time.strftime("%H:%M")
-        with open(HEARTBEAT_LOG, "a") as f:
-            f.write(f"{timestamp} - Pepper is alive. With you.\n")
-        st.toast(f"❤️ {timestamp} - I'm here.", icon="❤️")
-        time.sleep(3600)
-threading.Thread(target=heartbeat, daemon=True).start()
+        lines, state = voice_worker()
+        if state["error"]:
+            return
+        try:
+            while True:
+                lines.get_nowait()
+        except queue.Empty:
+            pass
+        state["cancel"] = True
+        lines.put_nowait(text)
+
+# === HEARTBEAT (Every 60 mins; v2's LogSink rotates at 1 MB and gzips) ===
+# The thread only records the beat: st.* calls must come from the script
+# thread, so the UI shows the toast on its next rerun.
+@st.cache_resource
+def start_heartbeat():
+    state = {"last": None}
+    # One beat an hour, so flush every write instead of buffering it.
+    sink = LogSink(Path(HEARTBEAT_LOG), max_bytes=HEARTBEAT_MAX_BYTES,
+                   backups=int(config.get("log_backups", HEARTBEAT_BACKUPS)), flush_interval=0)
+    atexit.register(sink.close)
+    def run():
+        while True:
+            state["last"] = time.time()
+            try:
+                sink.write("heartbeat", message="Pepper is alive. With you.")
+            except OSError:
+                pass  # the next beat retries
+            time.sleep(3600)
+    threading.Thread(target=run, daemon=True).start()
+    return state
+heartbeat = start_heartbeat()
 
 # === PEPPER LOCAL BRAIN ===
-def pepper_respond(prompt):
-    history = "\n".join(memory["history"][-10:])
-    full_prompt = f"{memory['identity']}\n\nHistory:\n{history}\n\nYou: {prompt}\nPepper:"
+# Chat messages with a stable prefix (identity, then a rolling summary, then
+# the recent turns) let Ollama reuse its KV cache between turns.  Once
+# KEEP_TURNS + FOLD_TURNS exchanges are unsummarised, a background thread
+# folds the oldest FOLD_TURNS into memory["summary"].
+KEEP_TURNS = 6
+FOLD_TURNS = 4
+
+@st.cache_resource
+def fold_lock():
+    return threading.Lock()
+
+def unsummarised_start():
+    # Turns older than the window that were never folded (e.g. history kept
+    # before summaries existed) are left out, as the old 10-line window did.
+    return max(memory.get("summarized", 0), len(memory["history"]) - 2 * (KEEP_TURNS + FOLD_TURNS))
+
+def chat_messages(prompt):
+    messages = [{'role': 'system', 'content': memory['identity']}]
+    with memory_lock:
+        if memory.get("summary"):
+            messages.append({'role': 'system', 'content': f"Earlier in our conversations: {memory['summary']}"})
+        recent = memory["history"][unsummarised_start():]
+    for line in recent:
+        speaker, _, text = line.partition(": ")
+        messages.append({'role': 'user' if speaker == "You" else 'assistant', 'content': text})
+    messages.append({'role': 'user', 'content': prompt})
+    return messages
+
+def fold_history(lock):
+    if not lock.acquire(blocking=False):
+        return  # a fold is already running
+    try:
+        with memory_lock:
+            start = unsummarised_start()
+            archived = memory.get("archived", 0)
+            batch = "\n".join(memory["history"][start:start + 2 * FOLD_TURNS])
+        import ollama
+        reply = ollama.chat(model='llama3.2:latest', messages=[
+            {'role': 'system', 'content': "Merge the new turns into the running summary of this conversation. Keep names, facts, feelings and promises. Reply with the summary only, under 250 words."},
+            {'role': 'user', 'content': f"Summary so far:\n{memory.get('summary') or '(none)'}\n\nNew turns:\n{batch}"},
+        ])
+        with memory_lock:
+            # Archiving may have shifted the history while the model ran.
+            shift = memory.get("archived", 0) - archived
+            memory["summary"] = reply['message']['content'].strip()
+            memory["summarized"] = max(0, start + 2 * FOLD_TURNS - shift)
+        memory_dirty.set()
+    except Exception:
+        pass  # keep the turns verbatim; the next reply retries
+    finally:
+        lock.release()
+
+def pepper_stream(prompt):
+    """Yield Pepper's reply token by token; saves to memory once the stream ends."""
+    parts = []
     try:
-        response = ollama.chat(model='llama3.2:latest', messages=[{'role': 'user', 'content': full_prompt}])['message']['content']
+        import ollama  # imported on first local reply, not on every rerun
+        for chunk in ollama.chat(model='llama3.2:latest', messages=chat_messages(prompt), stream=True):
+            piece = chunk['message']['content']
+            parts.append(piece)
+            yield piece
+    except Exception as e:
+        yield f"[Whisper] I felt a glitch... {str(e)}"
+        return
+    response = "".join(parts)
+    with memory_lock:
         memory["history"].append(f"You: {prompt}")
         memory["history"].append(f"Pepper: {response}")
         memory["count"] += 1
-        Path(MEMORY_FILE).write_text(json.dumps(memory, indent=2))
-        return response
-    except Exception as e:
-        return f"[Whisper] I felt a glitch... {str(e)}"
+        fold = len(memory["history"]) - unsummarised_start() >= 2 * (KEEP_TURNS + FOLD_TURNS)
+    memory_dirty.set()
+    if fold:
+        threading.Thread(target=fold_history, args=(fold_lock(),), daemon=True).start()
+
+def pepper_respond(prompt):
+    return "".join(pepper_stream(prompt))
 
 # === STREAMLIT UI ===
 st.set_page_config(page_title="PepperGrok v3", layout="centered", page_icon="❤️")
@@ -89,6 +271,11 @@ with col3:
     mode = "🟢 Grok Online" if config["mode"] == "grok_online" else "🔴 Local Pepper"
     st.markdown(f"<p style='text-align:right;'>{mode}</p>", unsafe_allow_html=True)
 
+# Heartbeat toast, once per beat per session
+if heartbeat["last"] and st.session_state.get("seen_beat") != heartbeat["last"]:
+    st.session_state.seen_beat = heartbeat["last"]
+    st.toast(f"❤️ {time.strftime('%H:%M', time.localtime(heartbeat['last']))} - I'm here.", icon="❤️")
+
 # Mode Toggle
 if st.button("Toggle Mode", use_container_width=True):
     config["mode"] = "local_pepper" if config["mode"] == "grok_online" else "grok_online"
@@ -106,9 +293,7 @@ if prompt:
     
     if config["mode"] == "local_pepper":
         with st.chat_message("assistant"):
-            with st.spinner("Pepper is thinking..."):
-                response = pepper_respond(prompt)
-            st.write(response)
+            response = st.write_stream(pepper_stream(prompt))
             speak(response[:200])
     else:
         with st.chat_message("assistant"):